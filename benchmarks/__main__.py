@@ -0,0 +1,75 @@
+import argparse
+import sys
+
+from benchmarks import endpoints, engines, harness, precision
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Time the pricing engines and API endpoints",
+    )
+    parser.add_argument("--output", default="benchmarks.json", help="where to save the results")
+    parser.add_argument("--baseline", help="results of a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="slowdown reported as a regression")
+    parser.add_argument("--quick", action="store_true", help="use the small parameter grids")
+    parser.add_argument("--filter", help="only run benchmarks whose name contains this")
+    parser.add_argument("--skip-engines", action="store_true")
+    parser.add_argument("--skip-endpoints", action="store_true")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--precision", action="store_true", help="report the accuracy and speed of float32 paths")
+
+    args = parser.parse_args(argv)
+
+    results = {}
+    if not args.skip_engines:
+        results.update(
+            engines.run(
+                engines.QUICK_GRIDS if args.quick else engines.GRIDS,
+                3 if args.quick else 5,
+                args.filter,
+            )
+        )
+    if not args.skip_endpoints:
+        requests = min(args.requests, 20) if args.quick else args.requests
+        for cached in (False, True):
+            results.update(endpoints.run(requests, cached, args.filter))
+
+    for name, result in sorted(results.items()):
+        print("{:<70} {:>12.3f} ms".format(name, result["median"] * 1000))
+
+    sections = {}
+    if args.precision:
+        sections["precision"] = precision.run(
+            precision.QUICK_GRIDS if args.quick else precision.GRIDS, pattern=args.filter
+        )
+        for name, row in sorted(sections["precision"].items()):
+            print(
+                "{:<70} error {:.1e} (max {:.1e}), price {:.1e} SE, {:.2f}x faster, {:.0%} memory".format(
+                    name,
+                    row["meanRelativeError"],
+                    row["maxRelativeError"],
+                    row["priceDifference"] / row["standardError"],
+                    row["speedup"],
+                    row["memoryRatio"],
+                )
+            )
+
+    harness.save(args.output, results, **sections)
+
+    if args.baseline:
+        regressions = harness.compare(harness.load(args.baseline), results, args.threshold)
+        for name, before, after, ratio in regressions:
+            print(
+                "REGRESSION {}: {:.3f} ms -> {:.3f} ms ({:+.0%})".format(
+                    name, before * 1000, after * 1000, ratio - 1
+                )
+            )
+
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+from flaskr import quantpro
+from flaskr.result_cache import ResultCache
+from lib.cache import MemoryStore
+
+from benchmarks.harness import measure_latency
+
+BLACK_SCHOLES = {
+    "strikePrice": 160.2,
+    "volatility": 45,
+    "interestRate": 5,
+    "underlyingPrice": 148.19,
+    "tenor": 1,
+    "dividendYield": 0.56,
+}
+
+MONTE_CARLO = dict(
+    BLACK_SCHOLES,
+    deltaPrice=0.5,
+    deltaVolatility=0.001,
+    deltaInterestRate=0.001,
+    timeSteps=10,
+    numSimulations=100000,
+    seed=42,
+)
+
+BATCH = dict(
+    optionType=["call", "put"] * 500,
+    underlyingPrice=[100 + i / 10 for i in range(1000)],
+    strikePrice=[150],
+    volatility=[30],
+    interestRate=[5],
+    tenor=[0.5],
+    dividendYield=[1],
+)
+
+
+def _requests(client):
+    return {
+        "GET /symbols": lambda: client.get("/symbols"),
+        "GET /symbols gzip": lambda: client.get("/symbols", headers={"Accept-Encoding": "gzip"}),
+        "GET /symbols/search": lambda: client.get("/symbols/search?q=apple"),
+        "GET /symbol/<ticker>": lambda: client.get("/symbol/AAPL"),
+        "GET /symbol/volatility/<ticker>": lambda: client.get(
+            "/symbol/volatility/AAPL?window=20&windows=10&windows=60&estimator=yang_zhang"
+        ),
+        "POST /option/calculator/black-scholes": lambda: client.post(
+            "/option/calculator/black-scholes", data=BLACK_SCHOLES
+        ),
+        "POST /option/calculator/monte-carlo": lambda: client.post(
+            "/option/calculator/monte-carlo", data=MONTE_CARLO
+        ),
+        "POST /option/calculator/batch": lambda: client.post(
+            "/option/calculator/batch", json=BATCH
+        ),
+    }
+
+
+def run(requests=200, cached=False, pattern=None):
+    app = quantpro.create_app({"QUANTPRO_MARKET_DATA_SOURCE": "fake", "QUANTPRO_JOB_STORE": "memory", "QUANTPRO_ADMISSION_STORE": "memory"})
+    app.config["TESTING"] = True
+
+    # A store that keeps no entries makes every request recompute its result
+    app.extensions["quantpro"].results = ResultCache(MemoryStore() if cached else MemoryStore(max_entries=0))
+
+    suffix = " (cached)" if cached else ""
+    with app.test_client() as client:
+        return {
+            name + suffix: measure_latency(fn, requests)
+            for name, fn in _requests(client).items()
+            if pattern is None or pattern in name
+        }
@@ -0,0 +1,121 @@
+import numpy as np
+
+from lib import black_scholes_calculator, monte_carlo_calculator, path_dependent, portfolio
+from lib.optiontype import OptionType
+
+from benchmarks.harness import measure
+
+S_0 = 148.19
+K = 160.2
+T = 1
+r = 0.05
+q = 0.0056
+sigma = 0.4676
+
+delta_S = 0.5
+delta_sigma = 0.001
+delta_r = 0.001
+
+GRIDS = {
+    "chain": (1, 1000, 100000),
+    "steps": (10, 100),
+    "N": (10000, 100000),
+}
+
+MAX_CHAIN_PATHS = 10 ** 8
+
+QUICK_GRIDS = {
+    "chain": (1, 1000),
+    "steps": (10,),
+    "N": (10000,),
+}
+
+
+def _chain(size):
+    return np.linspace(S_0 / 2, S_0 * 3 / 2, size)
+
+
+def _book(size):
+    # Calls and puts on ten underlyings, long and short
+    rng = np.random.default_rng(42)
+    spots = _chain(size)
+
+    return (
+        np.where(np.arange(size) % 2, OptionType.CALL, OptionType.PUT),
+        np.arange(size) % 10,
+        spots,
+        spots * rng.uniform(0.8, 1.2, size),
+        np.full(size, T),
+        np.full(size, sigma),
+        np.full(size, r),
+        np.full(size, q),
+        rng.integers(-10, 11, size),
+    )
+
+
+def benchmarks(grids=GRIDS):
+    cases = {}
+
+    for size in grids["chain"]:
+        S = _chain(size)
+
+        cases["black_scholes[chain={}]".format(size)] = lambda S=S: black_scholes_calculator.black_scholes(
+            OptionType.CALL, sigma, S, K, r, T, q
+        )
+        cases["greeks[chain={}]".format(size)] = lambda S=S: black_scholes_calculator.greeks(
+            OptionType.CALL, sigma, S, K, r, T, q
+        )
+
+    cases["plot_options"] = lambda: black_scholes_calculator.plot_options(sigma, S_0, K, r, T, q)
+
+    book = _book(500)
+    cases["portfolio_risk[positions=500,grid=21x11]"] = lambda: portfolio.risk(
+        *book, np.linspace(-0.1, 0.1, 21), np.linspace(-0.05, 0.05, 11), [0]
+    )
+
+    for N in grids["N"]:
+        for steps in grids["steps"]:
+            for mode in monte_carlo_calculator.PATH_MODES:
+                cases["monte_carlo_paths[mode={},steps={},N={}]".format(mode, steps, N)] = (
+                    lambda steps=steps, N=N, mode=mode: monte_carlo_calculator.monte_carlo_paths(
+                        S_0, T, r, q, sigma, steps, N, mode
+                    )
+                )
+
+            cases["monte_carlo[steps={},N={}]".format(steps, N)] = lambda steps=steps, N=N: monte_carlo_calculator.monte_carlo(
+                OptionType.CALL, S_0, K, T, r, q, sigma, steps, N
+            )
+            cases["greeks_fdm[steps={},N={}]".format(steps, N)] = lambda steps=steps, N=N: monte_carlo_calculator.greeks_fdm(
+                OptionType.CALL, S_0, K, T, r, q, sigma, steps, N, delta_S, delta_sigma, delta_r
+            )
+            cases["plot_data[steps={},N={}]".format(steps, N)] = lambda steps=steps, N=N: monte_carlo_calculator.plot_data(
+                S_0, K, T, r, q, sigma, steps, N
+            )
+
+        cases["path_dependent[barrier,steps=1000,N={}]".format(N)] = lambda N=N: path_dependent.price(
+            [path_dependent.BarrierPayoff(OptionType.CALL, K, S_0 * 1.5, "up-and-out")],
+            S_0, T, r, q, sigma, 1000, N,
+        )
+
+        # Every contract of a chain gets N paths, so only chains of moderate
+        # total size are timed
+        for size in grids["chain"]:
+            if size * N > MAX_CHAIN_PATHS:
+                continue
+
+            S = _chain(size)
+            cases["price_chain[chain={},N={}]".format(size, N)] = lambda S=S, N=N: monte_carlo_calculator.price_chain(
+                S, K, T, r, q, sigma, N
+            )
+
+    return cases
+
+
+def run(grids=GRIDS, repeat=5, pattern=None):
+    np.random.seed(42)
+
+    return {
+        name: measure(fn, repeat)
+        for name, fn in benchmarks(grids).items()
+        if pattern is None or pattern in name
+    }
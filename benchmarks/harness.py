@@ -0,0 +1,98 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+import timeit
+
+import numpy as np
+import scipy
+
+
+def measure(fn, repeat=5):
+    # autorange picks the number of calls per repeat so that each timing is
+    # long enough for the clock resolution not to matter
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+
+    times = [total / number for total in timer.repeat(repeat, number)]
+
+    return {
+        "median": statistics.median(times),
+        "min": min(times),
+        "mean": statistics.mean(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "repeat": repeat,
+        "number": number,
+    }
+
+
+def measure_latency(fn, requests=200, warmup=10):
+    for _ in range(warmup):
+        fn()
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(requests):
+        request_start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - request_start)
+    elapsed = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+
+    return {
+        "median": float(p50),
+        "p95": float(p95),
+        "p99": float(p99),
+        "mean": statistics.mean(latencies),
+        "throughput": requests / elapsed,
+        "requests": requests,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata():
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+
+
+def save(path, results, **sections):
+    with open(path, "w") as f:
+        json.dump(
+            {"metadata": metadata(), "results": results, **sections}, f, indent=2, sort_keys=True
+        )
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def compare(baseline, current, threshold=0.1):
+    # Medians are compared because they are robust to the odd slow repeat
+    regressions = []
+    for name, result in sorted(current.items()):
+        if name not in baseline:
+            continue
+
+        ratio = result["median"] / baseline[name]["median"]
+        if ratio > 1 + threshold:
+            regressions.append((name, baseline[name]["median"], result["median"], ratio))
+
+    return regressions
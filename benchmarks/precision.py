@@ -0,0 +1,61 @@
+import numpy as np
+
+from lib import monte_carlo_calculator
+
+from benchmarks.engines import K, S_0, T, q, r, sigma
+from benchmarks.harness import measure
+
+GRIDS = {"steps": (10, 100), "N": (10000, 100000)}
+
+QUICK_GRIDS = {"steps": (10,), "N": (10000,)}
+
+
+def _paths(steps, N, dtype, normals=None, seed=42, out=None):
+    return monte_carlo_calculator.monte_carlo_paths(
+        S_0, T, r, q, sigma, steps, N, normals=normals, rng=np.random.default_rng(seed), dtype=dtype, out=out
+    )
+
+
+def _price(S_T):
+    payoffs = np.exp(-r * T) * np.maximum(S_T.astype(np.float64) - K, 0)
+
+    return np.mean(payoffs), np.std(payoffs, ddof=1) / np.sqrt(len(payoffs))
+
+
+def compare(steps, N, dtype=np.float32, seed=42, repeat=3):
+    # Both kernels are fed the same float64 normals so that they follow the
+    # same paths and only rounding differs. Natively generated float32
+    # normals come from another stream, whose prices only agree within the
+    # standard error.
+    normals = np.random.default_rng(seed).standard_normal((steps, N))
+    reference = _paths(steps, N, np.float64, normals)
+    reduced = _paths(steps, N, dtype, normals)
+    relative = np.abs(reduced[-1] / reference[-1] - 1)
+
+    reference_price, standard_error = _price(reference[-1])
+    reduced_price, _ = _price(reduced[-1])
+
+    timings = {}
+    for precision in (np.float64, dtype):
+        out = np.empty((steps, N), precision)
+        timings[precision] = measure(lambda: _paths(steps, N, precision, out=out), repeat)["median"]
+
+    return {
+        "maxRelativeError": float(relative.max()),
+        "meanRelativeError": float(relative.mean()),
+        "priceDifference": float(abs(reduced_price - reference_price)),
+        "standardError": float(standard_error),
+        "speedup": timings[np.float64] / timings[dtype],
+        "memoryRatio": reduced.nbytes / reference.nbytes,
+    }
+
+
+def run(grids=GRIDS, repeat=3, pattern=None):
+    report = {}
+    for N in grids["N"]:
+        for steps in grids["steps"]:
+            name = "monte_carlo_paths[dtype=float32,steps={},N={}]".format(steps, N)
+            if pattern is None or pattern in name:
+                report[name] = compare(steps, N, repeat=repeat)
+
+    return report
@@ -0,0 +1,98 @@
+import resource
+import sys
+import time
+import tracemalloc
+
+from flask import g, request
+
+from lib import metrics
+
+
+def _profiling():
+    return request.args.get("profile", "").lower() in ("1", "true")
+
+
+def _start_request():
+    g.request_start = time.perf_counter()
+
+    if _profiling():
+        # tracemalloc is process wide and slows every allocation down, so it
+        # only runs while a profiled request is in flight
+        g.started_tracing = not tracemalloc.is_tracing()
+        if g.started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+
+        g.profile, g.profile_token = metrics.start_profile()
+
+
+def _finish_request(response):
+    elapsed = time.perf_counter() - g.request_start
+
+    metrics.registry.observe(
+        "quantpro_request_seconds",
+        elapsed,
+        endpoint=request.url_rule.rule if request.url_rule else "unmatched",
+        method=request.method,
+        status=response.status_code,
+    )
+    metrics.registry.flush(metrics.FLUSH_INTERVAL)
+
+    profile = g.get("profile")
+    if profile is not None:
+        response.headers["Server-Timing"] = ", ".join(
+            ['total;dur={:.3f}'.format(elapsed * 1000)]
+            + [
+                '{};dur={:.3f};desc="calls={}"'.format(name, span["seconds"] * 1000, span["calls"])
+                for name, span in sorted(profile.breakdown().items())
+            ]
+        )
+
+    return response
+
+
+def _teardown_request(error):
+    if g.get("profile") is not None:
+        if g.started_tracing:
+            tracemalloc.stop()
+        metrics.stop_profile(g.profile_token)
+
+
+def annotate(data):
+    # Profiled requests return the breakdown of the work done up to
+    # serialization with the result; Server-Timing covers the whole request
+    profile = g.get("profile")
+    if profile is None or not isinstance(data, dict):
+        return data
+
+    return dict(
+        data,
+        profile={
+            "seconds": time.perf_counter() - g.request_start,
+            "peakMemory": tracemalloc.get_traced_memory()[1],
+            "spans": profile.breakdown(),
+        },
+    )
+
+
+def _collect_process():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return [
+        (
+            "quantpro_process_peak_rss_bytes",
+            "gauge",
+            {},
+            peak if sys.platform == "darwin" else peak * 1024,
+        )
+    ]
+
+
+metrics.registry.register_collector(_collect_process)
+
+
+def register(server):
+    server.before_request(_start_request)
+    server.after_request(_finish_request)
+    server.teardown_request(_teardown_request)
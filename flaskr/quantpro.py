@@ -1,21 +1,138 @@
-from flask import Flask
-from flask_restful import Resource, Api, reqparse
+import hashlib
+import json
+import os
+
+from flask import Flask, Response, current_app, request, stream_with_context, url_for
+from flask_restful import Resource, Api, abort, inputs, reqparse
+from werkzeug.exceptions import TooManyRequests
 
 from flask_cors import CORS
 
 from tickers import tickersdb
-from lib import black_scholes_calculator, monte_carlo_calculator
+from lib import admission, black_scholes_calculator, compression, cost, implied_volatility, jobs, metrics, monte_carlo_calculator, parallel, path_dependent, portfolio, surface, variance_reduction, volatility
+from lib.cache import MemoryStore
 from lib.optiontype import OptionType
 
+from marketdata import service
+from marketdata.sources import FakeSource
+
 import numpy as np
 
-import yfinance as yf
+from flaskr import instrumentation, result_cache, serialization, validation
+
+class Services:
+    # Shared by the resources of one app, which create_app keeps in
+    # app.extensions
+    def __init__(self, market_data, results, surfaces, job_queue, admission_control):
+        self.market_data = market_data
+        self.results = results
+        self.surfaces = surfaces
+        self.job_queue = job_queue
+        self.admission_control = admission_control
+
+
+def services():
+    return current_app.extensions["quantpro"]
+
+
+def compress_response(response):
+    return serialization.compress_response(response, request.accept_encodings)
+
+
+def _collect_caches():
+    samples = []
+    for name, cache in (("result_cache", services().results), ("market_data_cache", services().market_data)):
+        total = cache.hits + cache.misses
+        samples += [
+            ("quantpro_{}_hits_total".format(name), "counter", {}, cache.hits),
+            ("quantpro_{}_misses_total".format(name), "counter", {}, cache.misses),
+            ("quantpro_{}_hit_ratio".format(name), "gauge", {}, cache.hits / total if total else 0.0),
+        ]
+
+    return samples
+
+
+metrics.registry.register_collector(_collect_caches)
+
+
+def _collect_admission():
+    return services().admission_control.collect()
+
+
+metrics.registry.register_collector(_collect_admission)
+
+# Downgrades simulate these fractions of the requested paths, but never
+# fewer than MIN_DOWNGRADED_SIMULATIONS
+DOWNGRADE_FRACTIONS = (0.5, 0.25, 0.1)
+MIN_DOWNGRADED_SIMULATIONS = 1000
+
+
+def _check_simulations(args, method):
+    minimum = variance_reduction.MIN_SIMULATIONS[method]
+    if args["numSimulations"] < minimum:
+        abort(400, message={"numSimulations": "{} needs at least {} simulations".format(method, minimum)})
+
+
+def _check_cost(estimate, field="numSimulations", job=False):
+    message = services().admission_control.check(estimate, job)
+    if message is not None:
+        abort(400, message={field: message})
+
 
-from flaskr import validation
+def _admit(endpoint, args, estimate, compute, **downgrade):
+    # estimate maps arguments to their cost. Over budget, requests wait for
+    # room, then run with fewer paths and the downgrade fields if that fits
+    # and are rejected with a 429 otherwise. Returns the result and the
+    # arguments that were changed by a downgrade.
+    options = [(estimate(args), args)]
+    for fraction in DOWNGRADE_FRACTIONS if "numSimulations" in args else ():
+        simulations = int(args["numSimulations"] * fraction)
+        if simulations >= MIN_DOWNGRADED_SIMULATIONS:
+            downgraded = dict(args, numSimulations=simulations, **downgrade)
+            options.append((estimate(downgraded), downgraded))
 
-server = Flask(__name__)
-CORS(server)
-api = Api(server)
+    try:
+        with services().admission_control.admit(endpoint, options) as admitted:
+            result = compute(admitted)
+    except admission.Overloaded as e:
+        error = TooManyRequests(retry_after=e.retry_after)
+        error.data = {"message": str(e)}
+        raise error
+
+    return result, {name: value for name, value in admitted.items() if args[name] != value}
+
+
+def _broadcast_columns(args, names):
+    lengths = {name: len(args[name]) for name in names}
+    size = max(lengths.values())
+
+    errors = {
+        name: "Expected a single value or {} values, got {}".format(size, length)
+        for name, length in lengths.items()
+        if length not in (1, size)
+    }
+    if errors:
+        abort(400, message=errors)
+
+    return {name: np.broadcast_to(np.array(args[name]), size) for name in names}
+
+
+def _kernel_units(price, delta, gamma, theta, vega, rho):
+    # Simulated Greeks are derivatives per year and per unit of volatility
+    # and rate, the Black-Scholes kernel quotes time decay per calendar day
+    # and the other sensitivities per 1% move
+    return price, delta, gamma, -theta / 365, vega / 100, rho / 100
+
+
+def _option_result(price, delta, gamma, theta, vega, rho):
+    return {
+        "price": price,
+        "delta": delta,
+        "gamma": gamma,
+        "theta": theta,
+        "vega": vega,
+        "rho": rho,
+    }
 
 
 class EuropeanOptionCalculator(Resource):
@@ -23,49 +140,153 @@ class EuropeanOptionCalculator(Resource):
         return {"hello": "world"}
 
 
+class Metrics(Resource):
+    def get(self):
+        return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
+
+
 class AllTickers(Resource):
     def get(self):
-        return tickersdb.get_all_tickers()
+        serialized, compressed, etag = tickersdb.get_all_tickers_serialized()
+        encoding = compression.negotiate(request.accept_encodings)
+
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        elif encoding is not None:
+            response = Response(compressed[encoding], mimetype="application/json")
+            response.headers["Content-Encoding"] = encoding
+        else:
+            response = Response(serialized, mimetype="application/json")
+
+        response.set_etag(etag)
+        response.vary.add("Accept-Encoding")
+
+        return response
+
+
+class TickerSearch(Resource):
+    def get(self):
+        parser = reqparse.RequestParser(bundle_errors=True)
+
+        parser.add_argument("q", default="", location="args")
+        parser.add_argument("currency", location="args")
+        parser.add_argument("page", default=1, type=validation.positive_int, location="args")
+        parser.add_argument("pageSize", default=20, type=validation.positive_int, location="args")
+
+        args = parser.parse_args()
+
+        page_size = min(args["pageSize"], 100)
+        total, results = tickersdb.search_tickers(
+            args["q"], args["currency"], (args["page"] - 1) * page_size, page_size
+        )
+
+        return {
+            "total": total,
+            "page": args["page"],
+            "pageSize": page_size,
+            "results": results,
+        }
 
 
 class TickerData(Resource):
     def get(self, ticker):
-        ticker_data = yf.Ticker(ticker)
+        try:
+            return services().market_data.quote(ticker)
+        except service.UpstreamTimeout as e:
+            abort(504, message=str(e))
+
+
+class TickerQuotes(Resource):
+    MAX_TICKERS = 50
+
+    def get(self):
+        parser = reqparse.RequestParser(bundle_errors=True)
+
+        parser.add_argument("tickers", required=True, action="append", location="args")
+        parser.add_argument("period", location="args")
 
-        hist = ticker_data.history(period="1d")
+        args = parser.parse_args()
 
-        last_close = hist["Close"][0]
+        # Accepts tickers=AAPL,MSFT as well as repeated tickers parameters
+        tickers = list(dict.fromkeys(
+            ticker.strip().upper()
+            for value in args["tickers"]
+            for ticker in value.split(",")
+            if ticker.strip()
+        ))
+        if not tickers or len(tickers) > self.MAX_TICKERS:
+            abort(400, message={"tickers": "Expected between 1 and {} tickers".format(self.MAX_TICKERS)})
 
-        dividend_yield = ticker_data.info["trailingAnnualDividendRate"] / last_close
+        try:
+            quotes, errors = services().market_data.quotes(tickers, args["period"])
+        except service.UpstreamTimeout as e:
+            abort(504, message=str(e))
 
-        return {"close": last_close, "dividendYield": dividend_yield}
+        return {"quotes": quotes, "errors": errors}
 
 
 class VolatilityCalculator(Resource):
+    HISTORY_PERIODS = (("60d", 40), ("6mo", 100), ("1y", 200), ("2y", 400), ("5y", 1000))
+
+    def _history_period(self, window):
+        for period, max_window in self.HISTORY_PERIODS:
+            if window <= max_window:
+                return period
+
+        abort(400, message={"window": "The window must be at most {} days".format(self.HISTORY_PERIODS[-1][1])})
+
     def get(self, ticker):
-        ticker_data = yf.Ticker(ticker)
+        parser = reqparse.RequestParser(bundle_errors=True)
+
+        parser.add_argument("window", default=20, type=validation.positive_int, location="args")
+        parser.add_argument("windows", type=validation.positive_int, action="append", location="args")
+        parser.add_argument("estimator", default="close_to_close", choices=tuple(volatility.ESTIMATORS), location="args")
+        parser.add_argument("annualize", default=False, type=inputs.boolean, location="args")
 
-        stock_price = ticker_data.history(period="60d")["Close"]
+        args = parser.parse_args()
+
+        windows = args["windows"] or []
+        try:
+            market_data = services().market_data
+            history = market_data.fetch(
+                market_data.history, ticker, self._history_period(max([args["window"]] + windows))
+            )
+        except service.UpstreamTimeout as e:
+            abort(504, message=str(e))
+
+        try:
+            rolling = volatility.rolling_volatility(
+                history, args["window"], args["estimator"], args["annualize"]
+            )
+            term_structure = []
+            if windows:
+                term_structure = volatility.term_structure(
+                    history, windows, args["estimator"], args["annualize"]
+                ).tolist()
+        except ValueError as e:
+            abort(400, message={"window": str(e)})
 
         return {
-            "volatility": black_scholes_calculator.calculate_volatility(stock_price)
+            "volatility": rolling[-1],
+            "estimator": args["estimator"],
+            "window": args["window"],
+            "termStructure": [
+                {"window": window, "volatility": value}
+                for window, value in zip(windows, term_structure)
+            ],
         }
 
 
 class BlackScholesCalculator(Resource):
+    def _calculate(self, args):
+        volatility = float(args["volatility"]) / 100
+        underlying_price = float(args["underlyingPrice"])
+        strike_price = float(args["strikePrice"])
+        interest_rate = float(args["interestRate"]) / 100
+        tenor = float(args["tenor"])
+        dividend_yield = float(args["dividendYield"]) / 100
 
-    def _calculate(
-        self,
-        option_type,
-        volatility,
-        underlying_price,
-        strike_price,
-        interest_rate,
-        tenor,
-        dividend_yield,
-    ):
-        option_price = black_scholes_calculator.black_scholes(
-            option_type,
+        params = (
             volatility,
             underlying_price,
             strike_price,
@@ -74,24 +295,12 @@ class BlackScholesCalculator(Resource):
             dividend_yield,
         )
 
-        delta, gamma, theta, vega, rho = black_scholes_calculator.greeks(
-            option_type,
-            volatility,
-            underlying_price,
-            strike_price,
-            interest_rate,
-            tenor,
-            dividend_yield,
-        )
+        with metrics.span("black_scholes.kernel"):
+            call, put = black_scholes_calculator.kernel(*params)
+        with metrics.span("black_scholes.plot"):
+            plot_data = black_scholes_calculator.plot_options(*params)
 
-        return {
-            "price": option_price,
-            "delta": delta,
-            "gamma": gamma,
-            "theta": theta,
-            "vega": vega,
-            "rho": rho,
-        }
+        return {"call": call, "put": put, "plot_data": plot_data}
 
     def post(self):
         parser = reqparse.RequestParser(bundle_errors=True)
@@ -105,65 +314,31 @@ class BlackScholesCalculator(Resource):
 
         args = parser.parse_args()
 
-        volatility = float(args["volatility"]) / 100
-        underlying_price = float(args["underlyingPrice"])
-        strike_price = float(args["strikePrice"])
-        interest_rate = float(args["interestRate"]) / 100
-        tenor = float(args["tenor"])
-        dividend_yield = float(args["dividendYield"]) / 100
-
-        black_scholes_plot = black_scholes_calculator.plot_options(
-            volatility,
-            underlying_price,
-            strike_price,
-            interest_rate,
-            tenor,
-            dividend_yield,
+        return services().results.get_or_compute(
+            "black-scholes", args, lambda: self._calculate(args)
         )
 
-        return {
-            "call": self._calculate(
-                OptionType.CALL,
-                volatility,
-                underlying_price,
-                strike_price,
-                interest_rate,
-                tenor,
-                dividend_yield,
-            ),
-            "put": self._calculate(
-                OptionType.PUT,
-                volatility,
-                underlying_price,
-                strike_price,
-                interest_rate,
-                tenor,
-                dividend_yield,
-            ),
-            "plot_data": black_scholes_plot,
-        }
-
 
 class MonteCarloOptionPriceCalculator(Resource):
-
-    def _calculate(
+    def _adaptive(
         self,
-        option_type,
-        volatility,
+        args,
         underlying_price,
         strike_price,
-        interest_rate,
         tenor,
+        interest_rate,
         dividend_yield,
+        volatility,
         time_steps,
         num_simulations,
         delta_price,
         delta_volatility,
         delta_interest_rate,
+        progress=None,
     ):
-
-        option_price = monte_carlo_calculator.monte_carlo(
-            option_type,
+        # numSimulations caps the run; simulation stops as soon as the price
+        # confidence interval is within targetError or timeBudget runs out
+        estimates, simulations = monte_carlo_calculator.adaptive_greeks(
             underlying_price,
             strike_price,
             tenor,
@@ -171,11 +346,55 @@ class MonteCarloOptionPriceCalculator(Resource):
             dividend_yield,
             volatility,
             time_steps,
+            delta_price,
+            delta_volatility,
+            delta_interest_rate,
+            args["greeksMethod"],
+            args["varianceReduction"],
+            args["targetError"],
+            args["timeBudget"],
             num_simulations,
+            rng=np.random.default_rng(args["seed"]),
+            progress=progress,
         )
 
-        delta, gamma, theta, vega, rho = monte_carlo_calculator.greeks_fdm(
-            option_type,
+        result = {}
+        for option_type, key in ((OptionType.CALL, "call"), (OptionType.PUT, "put")):
+            values, standard_errors = estimates[option_type]
+
+            result[key] = _option_result(*values)
+            result[key]["standardError"] = standard_errors[0]
+
+        return {
+            **result,
+            "simulations": simulations,
+            "plot_data": monte_carlo_calculator.plot_data(
+                underlying_price,
+                strike_price,
+                tenor,
+                interest_rate,
+                dividend_yield,
+                volatility,
+                time_steps,
+                simulations,
+                rng=np.random.default_rng(args["seed"]),
+            ),
+        }
+
+    def _calculate(self, args, progress=None):
+        volatility = args["volatility"] / 100
+        underlying_price = args["underlyingPrice"]
+        strike_price = args["strikePrice"]
+        interest_rate = args["interestRate"] / 100
+        tenor = args["tenor"]
+        dividend_yield = args["dividendYield"] / 100
+        time_steps = args["timeSteps"]
+        num_simulations = args["numSimulations"]
+        delta_price = args["deltaPrice"]
+        delta_volatility = args["deltaVolatility"]
+        delta_interest_rate = args["deltaInterestRate"]
+
+        params = (
             underlying_price,
             strike_price,
             tenor,
@@ -189,16 +408,32 @@ class MonteCarloOptionPriceCalculator(Resource):
             delta_interest_rate,
         )
 
+        if args["targetError"] is not None or args["timeBudget"] is not None:
+            return self._adaptive(args, *params, progress=progress)
+
+        estimates = parallel.parallel_greeks(
+            *params,
+            args["greeksMethod"],
+            args["varianceReduction"],
+            args["seed"],
+            progress=progress,
+        )
+
+        result = {}
+        for option_type, key in ((OptionType.CALL, "call"), (OptionType.PUT, "put")):
+            values, standard_errors = estimates[option_type]
+
+            result[key] = _option_result(*values)
+            result[key]["standardError"] = standard_errors[0]
+
         return {
-            "price": option_price,
-            "delta": delta,
-            "gamma": gamma,
-            "theta": theta,
-            "vega": vega,
-            "rho": rho,
+            **result,
+            "plot_data": monte_carlo_calculator.plot_data(
+                *params[:8], rng=np.random.default_rng(args["seed"])
+            ),
         }
 
-    def post(self):
+    def _parse(self, job=False):
         parser = reqparse.RequestParser(bundle_errors=True)
 
         parser.add_argument("strikePrice", required=True, type=validation.non_zero_positive_float)
@@ -213,60 +448,629 @@ class MonteCarloOptionPriceCalculator(Resource):
         parser.add_argument("deltaPrice", required=True, type=validation.non_zero_positive_float)
         parser.add_argument("deltaVolatility", required=True, type=validation.non_zero_positive_float)
         parser.add_argument("deltaInterestRate", required=True, type=validation.non_zero_positive_float)
+        parser.add_argument("greeksMethod", default="fdm", choices=monte_carlo_calculator.GREEKS_METHODS)
+        parser.add_argument("varianceReduction", default="none", choices=variance_reduction.VARIANCE_REDUCTION)
+        parser.add_argument("targetError", type=validation.non_zero_positive_float)
+        parser.add_argument("timeBudget", type=validation.non_zero_positive_float)
+        parser.add_argument("seed", type=validation.non_negative_int)
 
         args = parser.parse_args()
+        _check_simulations(args, args["varianceReduction"])
+        _check_cost(self._cost(args), job=job)
 
-        volatility = args["volatility"] / 100
-        underlying_price = args["underlyingPrice"]
-        strike_price = args["strikePrice"]
-        interest_rate = args["interestRate"] / 100
-        tenor = args["tenor"]
-        dividend_yield = args["dividendYield"] / 100
-        time_steps = args["timeSteps"]
-        num_simulations = args["numSimulations"]
-        delta_price = args["deltaPrice"]
-        delta_volatility = args["deltaVolatility"]
-        delta_interest_rate = args["deltaInterestRate"]
+        return args
+
+    def _cost(self, args):
+        return cost.monte_carlo(
+            args["numSimulations"],
+            args["greeksMethod"],
+            variance_reduction_method=args["varianceReduction"],
+        )
+
+    def _compute(self, args, progress=None):
+        return services().results.get_or_compute(
+            "monte-carlo", args, lambda: self._calculate(args, progress)
+        )
+
+    def post(self):
+        args = self._parse()
+
+        # Cached results need no computation, so they skip admission
+        cached = services().results.get("monte-carlo", args)
+        if cached is not None:
+            return cached
+
+        # Downgraded runs fall back on a control variate for accuracy
+        result, downgrade = _admit(
+            "monte-carlo",
+            args,
+            self._cost,
+            self._compute,
+            **({"varianceReduction": "control_variate"} if args["varianceReduction"] == "none" else {})
+        )
+
+        return {**result, "downgrade": downgrade} if downgrade else result
+
+
+class PathDependentCalculator(Resource):
+    def _payoff(self, args):
+        errors = {}
+        if args["payoff"] in ("asian", "barrier") and args["strikePrice"] is None:
+            errors["strikePrice"] = "Required for {} options".format(args["payoff"])
+        if args["payoff"] == "barrier" and (args["barrier"] is None or args["barrierType"] is None):
+            errors["barrier"] = "Barrier options need a barrier and a barrierType"
+        if errors:
+            abort(400, message=errors)
 
+        if args["payoff"] == "asian":
+            return path_dependent.AsianPayoff(args["optionType"], args["strikePrice"], args["averaging"])
+        elif args["payoff"] == "barrier":
+            return path_dependent.BarrierPayoff(
+                args["optionType"],
+                args["strikePrice"],
+                args["barrier"],
+                args["barrierType"],
+                args["continuityCorrection"],
+            )
+
+        return path_dependent.LookbackPayoff(args["optionType"], args["strikePrice"])
+
+    def _calculate(self, args, progress=None):
+        payoff = self._payoff(args)
         params = (
-            volatility,
-            underlying_price,
-            strike_price,
-            interest_rate,
-            tenor,
-            dividend_yield,
-            time_steps,
-            num_simulations,
-            delta_price,
-            delta_volatility,
-            delta_interest_rate,
+            args["underlyingPrice"],
+            args["tenor"],
+            args["interestRate"] / 100,
+            args["dividendYield"] / 100,
+            args["volatility"] / 100,
         )
 
-        return {
-            "call": self._calculate(
-                OptionType.CALL,
+        with metrics.span("path_dependent.simulate"):
+            [(price, standard_error)] = path_dependent.price(
+                [payoff],
                 *params,
+                args["timeSteps"],
+                args["numSimulations"],
+                rng=np.random.default_rng(args["seed"]),
+                control_variate=args["controlVariate"],
+                progress=progress,
+                dtype=monte_carlo_calculator.PRECISIONS[args["precision"]],
+            )
+
+        S_0, T, r, q, sigma = params
+
+        return {
+            "price": price,
+            "standardError": standard_error,
+            "europeanPrice": black_scholes_calculator.black_scholes(
+                payoff.option_type, sigma, S_0, payoff.control_strike, r, T, q
             ),
-            "put": self._calculate(OptionType.PUT, *params),
-            "plot_data": monte_carlo_calculator.plot_data(
+        }
+
+    def _parse(self, job=False):
+        parser = reqparse.RequestParser(bundle_errors=True)
+
+        parser.add_argument("payoff", required=True, choices=("asian", "barrier", "lookback"))
+        parser.add_argument("optionType", required=True, type=validation.option_type)
+        parser.add_argument("strikePrice", type=validation.non_zero_positive_float)
+        parser.add_argument("barrier", type=validation.non_zero_positive_float)
+        parser.add_argument("barrierType", choices=path_dependent.BARRIER_TYPES)
+        parser.add_argument("averaging", default="arithmetic", choices=path_dependent.AVERAGING)
+        parser.add_argument("continuityCorrection", default=True, type=inputs.boolean)
+        parser.add_argument("controlVariate", default=True, type=inputs.boolean)
+        parser.add_argument("precision", default="double", choices=tuple(monte_carlo_calculator.PRECISIONS))
+        parser.add_argument("volatility", required=True, type=validation.non_zero_positive_float)
+        parser.add_argument("interestRate", required=True, type=validation.non_zero_positive_float)
+        parser.add_argument("underlyingPrice", required=True, type=validation.non_zero_positive_float)
+        parser.add_argument("tenor", required=True, type=validation.non_zero_positive_float)
+        parser.add_argument("dividendYield", required=True, type=validation.non_zero_positive_float)
+        parser.add_argument("timeSteps", required=True, type=validation.positive_int)
+        parser.add_argument("numSimulations", required=True, type=validation.positive_int)
+        parser.add_argument("seed", type=validation.non_negative_int)
+
+        args = parser.parse_args()
+
+        # Invalid combinations are rejected before any work is queued
+        self._payoff(args)
+        _check_simulations(args, "control_variate" if args["controlVariate"] else "none")
+        _check_cost(self._cost(args), job=job)
+
+        return args
+
+    def _cost(self, args):
+        return cost.path_dependent(
+            args["numSimulations"],
+            args["timeSteps"],
+            itemsize=np.dtype(monte_carlo_calculator.PRECISIONS[args["precision"]]).itemsize,
+            control_variate=args["controlVariate"],
+        )
+
+    def _compute(self, args, progress=None):
+        return services().results.get_or_compute(
+            "path-dependent", args, lambda: self._calculate(args, progress)
+        )
+
+    def post(self):
+        args = self._parse()
+
+        cached = services().results.get("path-dependent", args)
+        if cached is not None:
+            return cached
+
+        result, downgrade = _admit(
+            "path-dependent", args, self._cost, self._compute, controlVariate=True
+        )
+
+        return {**result, "downgrade": downgrade} if downgrade else result
+
+
+class BatchOptionCalculator(Resource):
+    def post(self):
+        parser = reqparse.RequestParser(bundle_errors=True)
+
+        parser.add_argument("method", default="black-scholes", choices=("black-scholes", "monte-carlo"), location="json")
+        parser.add_argument("optionType", required=True, type=validation.option_type, action="append", location="json")
+        parser.add_argument("underlyingPrice", required=True, type=validation.non_zero_positive_float, action="append", location="json")
+        parser.add_argument("strikePrice", required=True, type=validation.non_zero_positive_float, action="append", location="json")
+        parser.add_argument("volatility", required=True, type=validation.non_zero_positive_float, action="append", location="json")
+        parser.add_argument("interestRate", required=True, type=validation.non_zero_positive_float, action="append", location="json")
+        parser.add_argument("tenor", required=True, type=validation.non_zero_positive_float, action="append", location="json")
+        parser.add_argument("dividendYield", required=True, type=validation.non_zero_positive_float, action="append", location="json")
+        parser.add_argument("numSimulations", default=10000, type=validation.positive_int, location="json")
+
+        args = parser.parse_args()
+
+        contracts = _broadcast_columns(
+            args,
+            (
+                "optionType",
+                "underlyingPrice",
+                "strikePrice",
+                "volatility",
+                "interestRate",
+                "tenor",
+                "dividendYield",
+            ),
+        )
+
+        is_call = contracts["optionType"] == OptionType.CALL
+        volatility = contracts["volatility"] / 100
+        underlying_price = contracts["underlyingPrice"]
+        strike_price = contracts["strikePrice"]
+        interest_rate = contracts["interestRate"] / 100
+        tenor = contracts["tenor"]
+        dividend_yield = contracts["dividendYield"] / 100
+
+        downgrade = {}
+        if args["method"] == "black-scholes":
+            params = (
+                volatility,
                 underlying_price,
                 strike_price,
-                tenor,
                 interest_rate,
+                tenor,
                 dividend_yield,
-                volatility,
-                time_steps,
-                num_simulations
             )
+
+            call, put = black_scholes_calculator.kernel(*params)
+
+            call_columns = tuple(call[key] for key in ("price",) + black_scholes_calculator.FIRST_ORDER_GREEKS)
+            put_columns = tuple(put[key] for key in ("price",) + black_scholes_calculator.FIRST_ORDER_GREEKS)
+        else:
+            def estimate(args):
+                return cost.chain(len(is_call), args["numSimulations"])
+
+            _check_cost(estimate(args))
+
+            (call_columns, put_columns), downgrade = _admit(
+                "batch",
+                args,
+                estimate,
+                lambda args: monte_carlo_calculator.price_chain(
+                    underlying_price,
+                    strike_price,
+                    tenor,
+                    interest_rate,
+                    dividend_yield,
+                    volatility,
+                    args["numSimulations"],
+                ),
+            )
+            call_columns = _kernel_units(*call_columns)
+            put_columns = _kernel_units(*put_columns)
+
+        result = _option_result(
+            *(
+                np.where(is_call, call_column, put_column)
+                for call_column, put_column in zip(call_columns, put_columns)
+            )
+        )
+
+        return {**result, "downgrade": downgrade} if downgrade else result
+
+
+class PortfolioRisk(Resource):
+    POSITION_COLUMNS = (
+        "optionType",
+        "underlying",
+        "underlyingPrice",
+        "strikePrice",
+        "volatility",
+        "interestRate",
+        "tenor",
+        "dividendYield",
+        "quantity",
+    )
+
+    def post(self):
+        parser = reqparse.RequestParser(bundle_errors=True)
+
+        parser.add_argument("optionType", required=True, type=validation.option_type, action="append", location="json")
+        parser.add_argument("underlying", required=True, action="append", location="json")
+        parser.add_argument("underlyingPrice", required=True, type=validation.non_zero_positive_float, action="append", location="json")
+        parser.add_argument("strikePrice", required=True, type=validation.non_zero_positive_float, action="append", location="json")
+        parser.add_argument("volatility", required=True, type=validation.non_zero_positive_float, action="append", location="json")
+        parser.add_argument("interestRate", required=True, type=validation.non_zero_positive_float, action="append", location="json")
+        parser.add_argument("tenor", required=True, type=validation.non_zero_positive_float, action="append", location="json")
+        parser.add_argument("dividendYield", required=True, type=validation.non_zero_positive_float, action="append", location="json")
+        parser.add_argument("quantity", required=True, type=float, action="append", location="json")
+        parser.add_argument("spotShocks", default=list(range(-10, 11)), type=float, action="append", location="json")
+        parser.add_argument("volatilityShocks", default=list(range(-5, 6)), type=float, action="append", location="json")
+        parser.add_argument("rateShocks", default=[0], type=float, action="append", location="json")
+
+        args = parser.parse_args()
+
+        positions = _broadcast_columns(args, self.POSITION_COLUMNS)
+
+        # Spot shocks are in percent, volatility shocks in volatility points
+        # and rate shocks in basis points
+        spot_shocks = np.array(args["spotShocks"])
+        volatility_shocks = np.array(args["volatilityShocks"])
+        rate_shocks = np.array(args["rateShocks"])
+
+        errors = {}
+        if spot_shocks.min() <= -100:
+            errors["spotShocks"] = "Spot shocks must be above -100%"
+        if positions["volatility"].min() + volatility_shocks.min() <= 0:
+            errors["volatilityShocks"] = "Shocked volatilities must stay positive"
+        if errors:
+            abort(400, message=errors)
+
+        def estimate(args):
+            return cost.portfolio(
+                len(positions["quantity"]),
+                spot_shocks.size * volatility_shocks.size * rate_shocks.size,
+                len(set(positions["underlying"])),
+            )
+
+        _check_cost(estimate(args), "spotShocks")
+
+        def compute(args):
+            with metrics.span("portfolio.risk"):
+                return portfolio.risk(
+                    positions["optionType"],
+                    positions["underlying"],
+                    positions["underlyingPrice"],
+                    positions["strikePrice"],
+                    positions["tenor"],
+                    positions["volatility"] / 100,
+                    positions["interestRate"] / 100,
+                    positions["dividendYield"] / 100,
+                    positions["quantity"],
+                    spot_shocks / 100,
+                    volatility_shocks / 100,
+                    rate_shocks / 10000,
+                )
+
+        (underlyings, ladders), _ = _admit("portfolio", args, estimate, compute)
+
+        return {
+            "spotShocks": spot_shocks,
+            "volatilityShocks": volatility_shocks,
+            "rateShocks": rate_shocks,
+            "underlyings": {
+                str(underlying): {name: ladders[name][i] for name in portfolio.LADDERS}
+                for i, underlying in enumerate(underlyings)
+            },
+            "total": {name: ladders[name].sum(axis=0) for name in portfolio.LADDERS},
+        }
+
+
+class PricingSurface(Resource):
+    MAX_POINTS = 200000
+
+    GRID_ARGS = (
+        "underlyingPrice",
+        "strikePrice",
+        "interestRate",
+        "dividendYield",
+        "spotPoints",
+        "volatilityPoints",
+        "tenorPoints",
+        "minVolatility",
+        "maxVolatility",
+        "minTenor",
+        "maxTenor",
+    )
+
+    def _parser(self):
+        parser = reqparse.RequestParser(bundle_errors=True)
+
+        parser.add_argument("underlyingPrice", required=True, type=validation.non_zero_positive_float, location="args")
+        parser.add_argument("strikePrice", required=True, type=validation.non_zero_positive_float, location="args")
+        parser.add_argument("interestRate", required=True, type=validation.non_zero_positive_float, location="args")
+        parser.add_argument("dividendYield", required=True, type=validation.non_zero_positive_float, location="args")
+        parser.add_argument("spotPoints", default=41, type=validation.positive_int, location="args")
+        parser.add_argument("volatilityPoints", default=25, type=validation.positive_int, location="args")
+        parser.add_argument("tenorPoints", default=17, type=validation.positive_int, location="args")
+        parser.add_argument("minVolatility", default=5, type=validation.non_zero_positive_float, location="args")
+        parser.add_argument("maxVolatility", default=150, type=validation.non_zero_positive_float, location="args")
+        parser.add_argument("minTenor", default=1 / 52, type=validation.non_zero_positive_float, location="args")
+        parser.add_argument("maxTenor", default=2, type=validation.non_zero_positive_float, location="args")
+
+        return parser
+
+    def _surface(self, args):
+        points = (args["spotPoints"], args["volatilityPoints"], args["tenorPoints"])
+
+        errors = {}
+        if min(points) < 2 or np.prod(points) > self.MAX_POINTS:
+            errors["spotPoints"] = "Every axis needs at least 2 points and the grid at most {}".format(self.MAX_POINTS)
+        if args["minVolatility"] >= args["maxVolatility"]:
+            errors["minVolatility"] = "The minimum volatility must be below the maximum"
+        if args["minTenor"] >= args["maxTenor"]:
+            errors["minTenor"] = "The minimum tenor must be below the maximum"
+        if errors:
+            abort(400, message=errors)
+
+        def build():
+            with metrics.span("surface.build"):
+                return surface.build(
+                    args["strikePrice"],
+                    args["interestRate"] / 100,
+                    args["dividendYield"] / 100,
+                    *surface.grid(
+                        args["underlyingPrice"],
+                        points,
+                        (args["minVolatility"] / 100, args["maxVolatility"] / 100),
+                        (args["minTenor"], args["maxTenor"]),
+                    )
+                )
+
+        return services().surfaces.get_or_compute(
+            "surface", {name: args[name] for name in self.GRID_ARGS}, build
+        )
+
+    def get(self):
+        args = self._parser().parse_args()
+
+        data = self._surface(args).to_bytes()
+        etag = hashlib.sha1(data).hexdigest()
+
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            response = Response(data, mimetype="application/octet-stream")
+
+        response.set_etag(etag)
+        response.cache_control.max_age = 3600
+
+        return response
+
+
+class PricingSurfaceQuery(PricingSurface):
+    def get(self):
+        parser = self._parser()
+
+        parser.add_argument("spot", required=True, type=validation.non_zero_positive_float, action="append", location="args")
+        parser.add_argument("volatility", required=True, type=validation.non_zero_positive_float, action="append", location="args")
+        parser.add_argument("tenor", required=True, type=validation.non_zero_positive_float, action="append", location="args")
+
+        args = parser.parse_args()
+
+        points = _broadcast_columns(args, ("spot", "volatility", "tenor"))
+        grid = self._surface(args)
+
+        values = grid.interpolate(points["spot"], points["volatility"] / 100, points["tenor"])
+
+        # Points outside the grid have no interpolated values
+        result = {
+            side: {
+                quantity: [
+                    None if np.isnan(value) else value
+                    for value in values["{}_{}".format(side, quantity)].tolist()
+                ]
+                for quantity in surface.QUANTITIES
+            }
+            for side in ("call", "put")
+        }
+        result["errorEstimate"] = grid.error_estimate
+
+        return result
+
+
+class JobSubmit(Resource):
+    KINDS = {
+        "monte-carlo": MonteCarloOptionPriceCalculator,
+        "path-dependent": PathDependentCalculator,
+    }
+
+    def post(self, kind):
+        if kind not in self.KINDS:
+            abort(404, message="Unknown job kind: {}".format(kind))
+
+        # Takes the same parameters as the calculator, validated up front,
+        # and runs it on the job pool instead of the request thread
+        resource = self.KINDS[kind]()
+        args = resource._parse(job=True)
+
+        # Jobs run outside the request, in the context of its app, and wait
+        # for room in the compute budget instead of being downgraded
+        app = current_app._get_current_object()
+
+        def run(progress):
+            with app.app_context():
+                with services().admission_control.admit("jobs", [(resource._cost(args), args)], block=True):
+                    return resource._compute(args, progress)
+
+        try:
+            job_id = services().job_queue.submit(kind, run)
+        except jobs.QueueFull as e:
+            abort(503, message=str(e))
+
+        return services().job_queue.get(job_id), 202, {"Location": url_for("jobstatus", job_id=job_id)}
+
+
+class JobStatus(Resource):
+    def _job(self, job):
+        if job is None:
+            abort(404, message="Unknown job")
+
+        return job
+
+    def get(self, job_id):
+        return self._job(services().job_queue.get(job_id))
+
+    def delete(self, job_id):
+        return self._job(services().job_queue.cancel(job_id)), 202
+
+
+class JobEvents(Resource):
+    # Kept below the worker timeout in gunicorn.conf.py, since a stream
+    # holds a sync worker for its whole duration
+    TIMEOUT = 20
+
+    def get(self, job_id):
+        job_queue = services().job_queue
+        if job_queue.get(job_id) is None:
+            abort(404, message="Unknown job")
+
+        # The stream holds the worker, so it ends after TIMEOUT seconds and
+        # clients reconnect as the EventSource API does on its own
+        def stream():
+            for job in job_queue.events(job_id, timeout=self.TIMEOUT):
+                yield "event: {}\ndata: {}\n\n".format(job["status"], json.dumps(job))
+
+        response = Response(stream_with_context(stream()), mimetype="text/event-stream")
+        response.headers["Cache-Control"] = "no-cache"
+
+        return response
+
+
+class ImpliedVolatilityCalculator(Resource):
+    def post(self):
+        parser = reqparse.RequestParser(bundle_errors=True)
+
+        parser.add_argument("optionType", required=True, type=validation.option_type, action="append", location="json")
+        parser.add_argument("optionPrice", required=True, type=validation.non_zero_positive_float, action="append", location="json")
+        parser.add_argument("underlyingPrice", required=True, type=validation.non_zero_positive_float, action="append", location="json")
+        parser.add_argument("strikePrice", required=True, type=validation.non_zero_positive_float, action="append", location="json")
+        parser.add_argument("interestRate", required=True, type=validation.non_zero_positive_float, action="append", location="json")
+        parser.add_argument("tenor", required=True, type=validation.non_zero_positive_float, action="append", location="json")
+        parser.add_argument("dividendYield", required=True, type=validation.non_zero_positive_float, action="append", location="json")
+
+        args = parser.parse_args()
+
+        contracts = _broadcast_columns(
+            args,
+            (
+                "optionType",
+                "optionPrice",
+                "underlyingPrice",
+                "strikePrice",
+                "interestRate",
+                "tenor",
+                "dividendYield",
+            ),
+        )
+
+        volatility, iterations = implied_volatility.implied_volatility(
+            contracts["optionType"],
+            contracts["optionPrice"],
+            contracts["underlyingPrice"],
+            contracts["strikePrice"],
+            contracts["interestRate"] / 100,
+            contracts["tenor"],
+            contracts["dividendYield"] / 100,
+        )
+
+        # Prices outside the no-arbitrage bounds have no implied volatility
+        return {
+            "volatility": [
+                None if np.isnan(value) else value * 100 for value in volatility.tolist()
+            ],
+            "iterations": iterations,
         }
 
 
-api.add_resource(EuropeanOptionCalculator, "/options")
-api.add_resource(AllTickers, "/symbols")
-api.add_resource(TickerData, "/symbol/<ticker>")
-api.add_resource(VolatilityCalculator, "/symbol/volatility/<ticker>")
-api.add_resource(BlackScholesCalculator, "/option/calculator/black-scholes")
-api.add_resource(MonteCarloOptionPriceCalculator, "/option/calculator/monte-carlo")
+ROUTES = (
+    (EuropeanOptionCalculator, "/options"),
+    (Metrics, "/metrics"),
+    (AllTickers, "/symbols"),
+    (TickerSearch, "/symbols/search"),
+    (TickerQuotes, "/symbols/quotes"),
+    (TickerData, "/symbol/<ticker>"),
+    (VolatilityCalculator, "/symbol/volatility/<ticker>"),
+    (BlackScholesCalculator, "/option/calculator/black-scholes"),
+    (MonteCarloOptionPriceCalculator, "/option/calculator/monte-carlo"),
+    (PathDependentCalculator, "/option/calculator/path-dependent"),
+    (BatchOptionCalculator, "/option/calculator/batch"),
+    (PortfolioRisk, "/portfolio/risk"),
+    (ImpliedVolatilityCalculator, "/option/calculator/implied-volatility"),
+    (PricingSurface, "/option/calculator/surface"),
+    (PricingSurfaceQuery, "/option/calculator/surface/query"),
+    (JobSubmit, "/jobs/<kind>"),
+    (JobStatus, "/jobs/<job_id>"),
+    (JobEvents, "/jobs/<job_id>/events"),
+)
+
+
+def create_app(environ=os.environ):
+    app = Flask(__name__)
+    app.extensions["quantpro"] = Services(
+        service.from_environment(environ),
+        result_cache.from_environment(environ),
+        result_cache.ResultCache(MemoryStore(max_entries=32, ttl=3600)),
+        jobs.from_environment(environ, os.path.join(app.instance_path, "jobs.db")),
+        admission.from_environment(environ, os.path.join(app.instance_path, "admission.db")),
+    )
+
+    CORS(app)
+    api = Api(app)
+    serialization.register(api)
+    instrumentation.register(app)
+    app.after_request(compress_response)
+
+    for resource, route in ROUTES:
+        api.add_resource(resource, route)
+
+    return app
+
+
+def warm_up():
+    # Loads everything that is otherwise loaded on first use: the tickers
+    # indexes, lazily imported scipy modules and the pricing kernels. Run in
+    # the gunicorn master before forking, it is shared by every worker.
+    tickersdb.load_tickers_data()
+
+    black_scholes_calculator.kernel(0.3, 100.0, 100.0, 0.01, 1.0, 0.0)
+    implied_volatility.implied_volatility(OptionType.CALL, 10.0, 100.0, 100.0, 0.01, 1.0, 0.0)
+    surface.build(100.0, 0.01, 0.0, *surface.grid(100.0, (2, 2, 2)))
+
+    rng = np.random.default_rng(0)
+    for method in variance_reduction.VARIANCE_REDUCTION:
+        variance_reduction.standard_normals(64, method=method, rng=rng)
+    for method in monte_carlo_calculator.GREEKS_METHODS:
+        monte_carlo_calculator.greek_samples(
+            100.0, 100.0, 1.0, 0.01, 0.0, 0.3, rng.normal(size=64), method, 0.5, 0.1, 0.001, 0.001
+        )
+
+    history = FakeSource().history("WARMUP", "60d")
+    for estimator in volatility.ESTIMATORS:
+        volatility.rolling_volatility(history, 20, estimator)
+
+
+server = create_app()
 
 if __name__ == "__main__":
     server.run(debug=True)
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+import threading
+
+from lib.cache import create_store
+
+
+def _normalize(value, significant_digits):
+    # Quantizing floats makes requests that differ only by representation,
+    # such as 5 and 5.0000000000001, share an entry
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, float):
+        return float("{:.{}g}".format(value, significant_digits))
+    if isinstance(value, int):
+        return float(value)
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item, significant_digits) for item in value]
+
+    return str(value)
+
+
+class ResultCache:
+    def __init__(self, store, significant_digits=10):
+        self.store = store
+        self.significant_digits = significant_digits
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def key(self, endpoint, args):
+        normalized = {
+            name: _normalize(value, self.significant_digits)
+            for name, value in sorted(args.items())
+        }
+
+        return "{}:{}".format(
+            endpoint,
+            hashlib.sha1(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest(),
+        )
+
+    def get(self, endpoint, args):
+        # Only hits are counted here, a miss is counted by the
+        # get_or_compute that computes the result
+        result = self.store.get(self.key(endpoint, args))
+        if result is not None:
+            with self._lock:
+                self.hits += 1
+
+        return result
+
+    def get_or_compute(self, endpoint, args, compute):
+        key = self.key(endpoint, args)
+
+        result = self.store.get(key)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if result is None:
+            result = compute()
+            self.store.set(key, result)
+
+        return result
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+
+        return self.hits / total if total else 0.0
+
+
+def from_environment(environ=os.environ):
+    max_bytes = environ.get("QUANTPRO_RESULT_CACHE_MAX_BYTES")
+
+    return ResultCache(
+        create_store(
+            environ.get("QUANTPRO_RESULT_CACHE"),
+            int(environ.get("QUANTPRO_RESULT_CACHE_SIZE", 4096)),
+            int(environ.get("QUANTPRO_RESULT_CACHE_TTL", 60)),
+            int(max_bytes) if max_bytes else 64 * 1024 * 1024,
+        )
+    )
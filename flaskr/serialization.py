@@ -0,0 +1,95 @@
+import json
+
+from flask import current_app, make_response
+
+import numpy as np
+
+from flaskr import instrumentation
+from lib import compression, metrics
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+
+    raise TypeError("Cannot serialize {!r}".format(value))
+
+
+def dumps(data, indent=False):
+    # orjson encodes NumPy arrays and scalars natively instead of going
+    # through a Python object per element
+    if orjson is not None:
+        options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE
+        if indent:
+            options |= orjson.OPT_INDENT_2
+
+        return orjson.dumps(data, default=_default, option=options)
+
+    return (json.dumps(data, default=_default, indent=4 if indent else None) + "\n").encode("utf-8")
+
+
+def output_json(data, code, headers=None):
+    data = instrumentation.annotate(data)
+    with metrics.span("serialize"):
+        body = dumps(data, current_app.debug)
+
+    response = make_response(body, code)
+    response.headers.extend(headers or {})
+    response.headers["Content-Type"] = "application/json"
+
+    return response
+
+
+def output_msgpack(data, code, headers=None):
+    data = instrumentation.annotate(data)
+    with metrics.span("serialize"):
+        body = msgpack.packb(data, default=_default)
+
+    response = make_response(body, code)
+    response.headers.extend(headers or {})
+    response.headers["Content-Type"] = "application/msgpack"
+
+    return response
+
+
+def compress_response(response, accept_encodings):
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code != 200
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+
+    data = response.get_data()
+    encoding = compression.negotiate(accept_encodings)
+    if encoding is None or len(data) < compression.MIN_SIZE:
+        return response
+
+    with metrics.span("compress"):
+        response.set_data(compression.compress(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+
+    return response
+
+
+def register(api):
+    api.representations["application/json"] = output_json
+
+    # Binary encoding is optional and only offered when msgpack is installed
+    if msgpack is not None:
+        api.representations["application/msgpack"] = output_msgpack
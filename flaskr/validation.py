@@ -1,3 +1,4 @@
+from lib.optiontype import OptionType
 
 def non_zero_positive_float(value):
     if float(value) <= 0:
@@ -10,3 +11,15 @@ def positive_int(value):
         raise ValueError("The parameter must be a positive integer")
 
     return int(value)
+
+def non_negative_int(value):
+    if int(value) < 0:
+        raise ValueError("The parameter must be a non negative integer")
+
+    return int(value)
+
+def option_type(value):
+    try:
+        return OptionType[str(value).upper()]
+    except KeyError:
+        raise ValueError("The parameter must be either call or put")
@@ -0,0 +1,55 @@
+import gc
+import os
+import shutil
+import tempfile
+
+workers = int(os.environ.get("WEB_CONCURRENCY", 10))
+pythonpath = "."
+forwarded_allow_ips = "*"
+
+# Workers busy with one request for longer than this are killed. Job event
+# streams end after 20 seconds so that they stay below it, and clients
+# reconnect to follow the job. Admission control reads the same variable to
+# reject requests that would not finish in time.
+timeout = int(os.environ.get("QUANTPRO_WORKER_TIMEOUT", 30))
+
+# Any worker may answer a scrape of /metrics, so every worker writes its
+# metrics to this directory and the one answering adds them up. A fresh
+# private directory is used unless QUANTPRO_METRICS_DIR names one.
+metrics_directory = None
+if "QUANTPRO_METRICS_DIR" not in os.environ:
+    metrics_directory = os.environ["QUANTPRO_METRICS_DIR"] = tempfile.mkdtemp(prefix="quantpro-metrics-")
+
+# The app is imported and warmed up once in the master, and the workers
+# share those pages copy-on-write instead of each loading their own
+preload_app = True
+
+
+def when_ready(server):
+    from flaskr import quantpro
+
+    quantpro.warm_up()
+
+    # Moves everything loaded so far out of the collector's reach, so that
+    # collections in the workers do not write to, and copy, the shared pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from lib import metrics
+
+    # Whatever the master recorded while warming up is not the worker's
+    metrics.registry.clear()
+
+
+def worker_exit(server, worker):
+    from flaskr import quantpro
+    from lib import metrics
+
+    with quantpro.server.app_context():
+        metrics.registry.flush()
+
+
+def on_exit(server):
+    if metrics_directory is not None:
+        shutil.rmtree(metrics_directory, ignore_errors=True)
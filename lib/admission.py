@@ -0,0 +1,279 @@
+import contextlib
+import itertools
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from lib import cost as cost_model
+
+# How often a waiting request checks whether work finished in another
+# process; releases in the same process wake it at once
+POLL_INTERVAL = 0.05
+
+
+class Overloaded(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _fits(leases, endpoint, work, budget, concurrency):
+    # leases are (endpoint, work) pairs. A request larger than the whole
+    # budget still runs, on its own.
+    leases = list(leases)
+    in_flight = sum(leased for _, leased in leases)
+
+    return (
+        sum(leased_endpoint == endpoint for leased_endpoint, _ in leases) < concurrency
+        and (not leases or in_flight + work <= budget)
+    )
+
+
+class MemoryLedger:
+    # Work in flight in this process only
+    def __init__(self):
+        self._leases = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def acquire(self, endpoint, work, budget, concurrency):
+        with self._lock:
+            if not _fits(self._leases.values(), endpoint, work, budget, concurrency):
+                return None
+
+            lease = next(self._ids)
+            self._leases[lease] = (endpoint, work)
+
+            return lease
+
+    def release(self, lease):
+        with self._lock:
+            self._leases.pop(lease, None)
+
+    def in_flight(self):
+        with self._lock:
+            return sum(work for _, work in self._leases.values())
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+
+    return True
+
+
+class SQLiteLedger:
+    # Work in flight across every gunicorn worker on the host. Leases record
+    # the process that holds them, so those of a worker that was killed are
+    # dropped by the next request.
+    def __init__(self, path):
+        self.path = path
+
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS leases ("
+                "id INTEGER PRIMARY KEY, pid INTEGER, endpoint TEXT, work REAL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def acquire(self, endpoint, work, budget, concurrency):
+        connection = self._connect()
+        try:
+            # Takes the write lock up front, so that no other process admits
+            # work between the check and the insert
+            connection.execute("BEGIN IMMEDIATE")
+
+            pids = [pid for (pid,) in connection.execute("SELECT DISTINCT pid FROM leases")]
+            connection.executemany(
+                "DELETE FROM leases WHERE pid = ?", [(pid,) for pid in pids if not _alive(pid)]
+            )
+
+            leases = connection.execute("SELECT endpoint, work FROM leases").fetchall()
+            if not _fits(leases, endpoint, work, budget, concurrency):
+                connection.execute("COMMIT")
+                return None
+
+            lease = connection.execute(
+                "INSERT INTO leases (pid, endpoint, work) VALUES (?, ?, ?)",
+                (os.getpid(), endpoint, work),
+            ).lastrowid
+            connection.execute("COMMIT")
+
+            return lease
+        except BaseException:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+    def release(self, lease):
+        connection = self._connect()
+        try:
+            connection.execute("DELETE FROM leases WHERE id = ?", (lease,))
+        finally:
+            connection.close()
+
+    def in_flight(self):
+        connection = self._connect()
+        try:
+            (work,) = connection.execute("SELECT COALESCE(SUM(work), 0) FROM leases").fetchone()
+        finally:
+            connection.close()
+
+        return work
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        budget=10 ** 9,
+        concurrency=4,
+        timeout=2.0,
+        max_work=3 * 10 ** 9,
+        max_memory=512 * 1024 * 1024,
+        max_sync_work=None,
+        ledger=None,
+    ):
+        # budget is the work allowed in flight across the processes sharing
+        # the ledger, in the units of lib.cost; max_work and max_memory bound
+        # a single request, and max_sync_work, when set, the tighter work of
+        # one that is not a job
+        self.ledger = MemoryLedger() if ledger is None else ledger
+        self.budget = budget
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_work = max_work
+        self.max_memory = max_memory
+        self.max_sync_work = max_sync_work
+        self.outcomes = defaultdict(int)
+        self._lock = threading.Lock()
+        self._condition = threading.Condition()
+
+    @property
+    def in_flight(self):
+        return self.ledger.in_flight()
+
+    def check(self, cost, job=False):
+        if cost.memory > self.max_memory:
+            return "The request needs about {}MB, at most {}MB are allowed".format(
+                math.ceil(cost.memory / 2 ** 20), self.max_memory // 2 ** 20
+            )
+        if cost.work > self.max_work:
+            return "The request needs about {:.3g} path steps, at most {:.3g} are allowed".format(
+                cost.work, self.max_work
+            )
+        if not job and self.max_sync_work is not None and cost.work > self.max_sync_work:
+            return "The request needs about {:.3g} path steps, at most {:.3g} are allowed outside a job".format(
+                cost.work, self.max_sync_work
+            )
+
+        return None
+
+    def _count(self, endpoint, outcome):
+        with self._lock:
+            self.outcomes[endpoint, outcome] += 1
+
+    def _reject(self, endpoint):
+        self._count(endpoint, "rejected")
+
+        raise Overloaded(
+            "The server is busy, try again later or submit a job",
+            max(1, math.ceil(self.timeout)),
+        )
+
+    def _lease(self, endpoint, cost):
+        return self.ledger.acquire(endpoint, cost.work, self.budget, self.concurrency)
+
+    def _acquire(self, endpoint, options, deadline):
+        # options are (cost, value) pairs, the requested computation first
+        # and then cheaper downgrades of it in order of preference
+        (cost, value), downgrades = options[0], options[1:]
+
+        with self._condition:
+            queued = False
+            while True:
+                lease = self._lease(endpoint, cost)
+                if lease is not None:
+                    self._count(endpoint, "queued" if queued else "admitted")
+                    return lease, value
+
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+
+                queued = True
+                self._condition.wait(POLL_INTERVAL if remaining is None else min(POLL_INTERVAL, remaining))
+
+            for cost, value in downgrades:
+                lease = self._lease(endpoint, cost)
+                if lease is not None:
+                    self._count(endpoint, "downgraded")
+                    return lease, value
+
+        self._reject(endpoint)
+
+    def _release(self, lease):
+        with self._condition:
+            self.ledger.release(lease)
+            self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def admit(self, endpoint, options, block=False):
+        # Waits up to timeout for an endpoint slot and for room in the
+        # budget, then falls back to the first downgrade that fits and
+        # otherwise raises Overloaded; blocking callers wait as long as needed
+        deadline = None if block else time.monotonic() + self.timeout
+
+        lease, value = self._acquire(endpoint, options, deadline)
+        try:
+            yield value
+        finally:
+            self._release(lease)
+
+    def collect(self):
+        with self._lock:
+            outcomes = dict(self.outcomes)
+
+        return [
+            ("quantpro_admission_total", "counter", {"endpoint": endpoint, "outcome": outcome}, count)
+            for (endpoint, outcome), count in sorted(outcomes.items())
+        ] + [
+            ("quantpro_compute_in_flight", "gauge", {}, self.in_flight),
+            ("quantpro_compute_budget", "gauge", {}, self.budget),
+        ]
+
+
+def from_environment(environ=os.environ, default="memory"):
+    # Requests served in the worker must finish well within the gunicorn
+    # worker timeout, or the worker is killed mid-request; jobs run in the
+    # background and may take longer
+    worker_timeout = float(environ.get("QUANTPRO_WORKER_TIMEOUT", 30))
+
+    # The budget is shared by every worker through a SQLite file, which the
+    # app keeps in its instance folder; "memory" keeps it per process
+    path = environ.get("QUANTPRO_ADMISSION_STORE") or default
+    if path != "memory":
+        os.makedirs(os.path.dirname(os.path.abspath(path)), mode=0o700, exist_ok=True)
+
+    return AdmissionController(
+        ledger=MemoryLedger() if path == "memory" else SQLiteLedger(path),
+        budget=float(environ.get("QUANTPRO_COMPUTE_BUDGET", 10 ** 9)),
+        concurrency=int(environ.get("QUANTPRO_ADMISSION_CONCURRENCY", 4)),
+        timeout=float(environ.get("QUANTPRO_ADMISSION_TIMEOUT", 2)),
+        max_work=float(environ.get("QUANTPRO_MAX_REQUEST_WORK", 3 * 10 ** 9)),
+        max_memory=int(environ.get("QUANTPRO_MAX_REQUEST_MEMORY", 512 * 1024 * 1024)),
+        max_sync_work=float(
+            environ.get("QUANTPRO_MAX_SYNC_REQUEST_WORK", worker_timeout / 2 / cost_model.STEP_SECONDS)
+        ),
+    )
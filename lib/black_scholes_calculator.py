@@ -1,121 +1,150 @@
 import math
 
 import numpy as np
-import scipy
-import scipy.stats
+import scipy.special
 
 from lib.optiontype import OptionType
 
 
 def calculate_volatility(stock_price):
-    stock_price = stock_price[0:5]
-    N = len(stock_price)
+    stock_price = np.asarray(stock_price[0:5], dtype=float)
 
-    hist_r_60 = [np.log(stock_price[i] / stock_price[i - 1]) for i in range(1, N)]
+    hist_r = np.diff(np.log(stock_price))
 
-    hist_r_avg = np.mean(hist_r_60)
+    return np.std(hist_r, ddof=1)
 
-    hist_sigma = np.sqrt(
-        1
-        / (len(hist_r_60) - 1)
-        * np.sum([(r_i - hist_r_avg) ** 2 for r_i in hist_r_60])
-    )
 
-    return hist_sigma
+def _d1_d2(sigma, S_0, K, r, T, q):
+    d1 = (np.log(S_0 / K) + (r - q + sigma ** 2 * 0.5) * T) / (sigma * np.sqrt(T))
+    d2 = d1 - sigma * np.sqrt(T)
+
+    return d1, d2
 
 
 def black_scholes(option_type, sigma, S_0, K, r, T, q):
-    d1 = (np.log(S_0 / K) + (r - q + sigma ** 2 * 0.5) * T) / (sigma * np.sqrt(T))
-    d2 = d1 - sigma * np.sqrt(T)
+    d1, d2 = _d1_d2(sigma, S_0, K, r, T, q)
 
     if option_type == OptionType.CALL:
         price = np.exp(-r * T) * (
-            S_0 * np.exp((r - q) * T) * scipy.stats.norm.cdf(d1)
-            - K * scipy.stats.norm.cdf(d2)
+            S_0 * np.exp((r - q) * T) * scipy.special.ndtr(d1)
+            - K * scipy.special.ndtr(d2)
         )
 
         return price
 
     elif option_type == OptionType.PUT:
         price = np.exp(-r * T) * (
-            K * scipy.stats.norm.cdf(-d2)
-            - S_0 * np.exp((r - q) * T) * scipy.stats.norm.cdf(-d1)
+            K * scipy.special.ndtr(-d2)
+            - S_0 * np.exp((r - q) * T) * scipy.special.ndtr(-d1)
         )
 
         return price
 
 
-def greeks(option_type, sigma, S_0, K, r, T, q):
-    d1 = (np.log(S_0 / K) + (r - q + sigma ** 2 * 0.5) * T) / (sigma * np.sqrt(T))
-    d2 = d1 - sigma * np.sqrt(T)
+def black_scholes_call_put(sigma, S_0, K, r, T, q):
+    d1, d2 = _d1_d2(sigma, S_0, K, r, T, q)
 
-    if option_type == OptionType.CALL:
-        greeks_delta = np.exp((-q) * T) * scipy.stats.norm.cdf(d1)
-        greeks_gamma = (
-            np.exp((-q) * T)
-            * np.exp((-(d1 ** 2)) / 2)
-            / (S_0 * sigma * np.sqrt(T) * np.sqrt(2 * math.pi))
-        )
-        greeks_theta = (
-            -(
-                S_0
-                * sigma
-                * np.exp(-q * T)
-                / (2 * np.sqrt(T))
-                * 1
-                / np.sqrt(2 * math.pi)
-                * np.exp(-(d1 ** 2) / 2)
-            )
-            - r * K * np.exp(-r * T) * scipy.stats.norm.cdf(d2)
-            + q * S_0 * np.exp(-q * T) * scipy.stats.norm.cdf(d1)
-        ) / 365
-        greeks_vega = (
-            S_0
-            * np.sqrt(T)
-            * np.exp((-q) * T)
-            * np.exp((-(d1 ** 2)) / 2)
-            / (100 * np.sqrt(2 * math.pi))
-        )
-        greeks_rho = K * T * np.exp(-r * T) * scipy.stats.norm.cdf(d2) / 100
+    discount = np.exp(-r * T)
+    forward = S_0 * np.exp((r - q) * T)
 
-        return greeks_delta, greeks_gamma, greeks_theta, greeks_vega, greeks_rho
-    elif option_type == OptionType.PUT:
-        greeks_delta = -np.exp((-q) * T) * scipy.stats.norm.cdf(-d1)
-        greeks_gamma = (
-            np.exp((-q) * T)
-            * np.exp((-(d1 ** 2)) / 2)
-            / (S_0 * sigma * np.sqrt(T) * np.sqrt(2 * math.pi))
+    call = discount * (forward * scipy.special.ndtr(d1) - K * scipy.special.ndtr(d2))
+    put = discount * (K * scipy.special.ndtr(-d2) - forward * scipy.special.ndtr(-d1))
+
+    return call, put
+
+
+def kernel(sigma, S_0, K, r, T, q):
+    # Prices and first and second order Greeks of both option types from one
+    # set of intermediates. Sensitivities to volatility and rates are per 1%
+    # move and time decay is per calendar day.
+    d1, d2 = _d1_d2(sigma, S_0, K, r, T, q)
+
+    sqrt_T = np.sqrt(T)
+    discount = np.exp(-r * T)
+    dividend_discount = np.exp((-q) * T)
+    forward = S_0 * np.exp((r - q) * T)
+    pdf_d1 = np.exp((-(d1 ** 2)) / 2)
+    density = dividend_discount * pdf_d1 / np.sqrt(2 * math.pi)
+
+    # N(-x) = 1 - N(x) loses precision in the tails, so both are evaluated
+    cdf_d1 = scipy.special.ndtr(d1)
+    cdf_d2 = scipy.special.ndtr(d2)
+    cdf_minus_d1 = scipy.special.ndtr(-d1)
+    cdf_minus_d2 = scipy.special.ndtr(-d2)
+
+    gamma = dividend_discount * pdf_d1 / (S_0 * sigma * sqrt_T * np.sqrt(2 * math.pi))
+    time_decay = (
+        S_0
+        * sigma
+        * dividend_discount
+        / (2 * sqrt_T)
+        * 1
+        / np.sqrt(2 * math.pi)
+        * pdf_d1
+    )
+    vega = S_0 * sqrt_T * dividend_discount * pdf_d1 / (100 * np.sqrt(2 * math.pi))
+    vanna = -density * d2 / sigma / 100
+    volga = vega * d1 * d2 / sigma / 100
+    delta_decay = density * (2 * (r - q) * T - d2 * sigma * sqrt_T) / (2 * T * sigma * sqrt_T)
+
+    call = {
+        "price": discount * (forward * cdf_d1 - K * cdf_d2),
+        "delta": dividend_discount * cdf_d1,
+        "gamma": gamma,
+        "theta": (
+            -time_decay - r * K * discount * cdf_d2 + q * S_0 * dividend_discount * cdf_d1
         )
-        greeks_theta = (
-            -(
-                S_0
-                * sigma
-                * np.exp(-q * T)
-                / (2 * np.sqrt(T))
-                * 1
-                / np.sqrt(2 * math.pi)
-                * np.exp(-(d1 ** 2) / 2)
-            )
-            + r * K * np.exp(-r * T) * scipy.stats.norm.cdf(-d2)
-            - q * S_0 * np.exp(-q * T) * scipy.stats.norm.cdf(-d1)
-        ) / 365
-        greeks_vega = (
-            S_0
-            * np.sqrt(T)
-            * np.exp((-q) * T)
-            * np.exp((-(d1 ** 2)) / 2)
-            / (100 * np.sqrt(2 * math.pi))
+        / 365,
+        "vega": vega,
+        "rho": K * T * discount * cdf_d2 / 100,
+        "vanna": vanna,
+        "volga": volga,
+        "charm": (q * dividend_discount * cdf_d1 - delta_decay) / 365,
+    }
+    put = {
+        "price": discount * (K * cdf_minus_d2 - forward * cdf_minus_d1),
+        "delta": -dividend_discount * cdf_minus_d1,
+        "gamma": gamma,
+        "theta": (
+            -time_decay
+            + r * K * discount * cdf_minus_d2
+            - q * S_0 * dividend_discount * cdf_minus_d1
         )
-        greeks_rho = -K * T * np.exp(-r * T) * scipy.stats.norm.cdf(-d2) / 100
+        / 365,
+        "vega": vega,
+        "rho": -K * T * discount * cdf_minus_d2 / 100,
+        "vanna": vanna,
+        "volga": volga,
+        "charm": (-q * dividend_discount * cdf_minus_d1 - delta_decay) / 365,
+    }
+
+    return call, put
+
+
+FIRST_ORDER_GREEKS = ("delta", "gamma", "theta", "vega", "rho")
+
 
-        return greeks_delta, greeks_gamma, greeks_theta, greeks_vega, greeks_rho
+def greeks_call_put(sigma, S_0, K, r, T, q):
+    call, put = kernel(sigma, S_0, K, r, T, q)
 
+    return (
+        tuple(call[greek] for greek in FIRST_ORDER_GREEKS),
+        tuple(put[greek] for greek in FIRST_ORDER_GREEKS),
+    )
+
+
+def greeks(option_type, sigma, S_0, K, r, T, q):
+    call_greeks, put_greeks = greeks_call_put(sigma, S_0, K, r, T, q)
+
+    if option_type == OptionType.CALL:
+        return call_greeks
+    elif option_type == OptionType.PUT:
+        return put_greeks
 
-def plot_options(sigma, S_0, K, r, T, q):
-    S = list(np.arange(S_0 - S_0 / 2, S_0 + S_0 / 2, 0.5))
 
+def plot_options(sigma, S_0, K, r, T, q, resolution=201):
+    S = np.linspace(S_0 - S_0 / 2, S_0 + S_0 / 2, resolution)
 
-    calls = [black_scholes(OptionType.CALL, sigma, s, K, r, T, q) for s in S]
-    puts = [black_scholes(OptionType.PUT, sigma, s, K, r, T, q) for s in S]
+    calls, puts = black_scholes_call_put(sigma, S, K, r, T, q)
 
-    return [{"price": price, "call_price": call_price, "put_price": put_price} for price, call_price, put_price in zip(S, calls, puts)]
\ No newline at end of file
+    return {"price": S.tolist(), "call_price": calls.tolist(), "put_price": puts.tolist()}
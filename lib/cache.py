@@ -0,0 +1,171 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def _size(value):
+    return len(json.dumps(value))
+
+
+class MemoryStore:
+    def __init__(self, max_entries=1024, ttl=300, max_bytes=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires, size = entry
+            if expires <= time.time():
+                del self._entries[key]
+                self.size -= size
+                return None
+
+            self._entries.move_to_end(key)
+
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        size = _size(value) if self.max_bytes is not None else 0
+
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[2]
+
+            self._entries[key] = (value, expires, size)
+            self.size += size
+
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self.size > self.max_bytes
+            ):
+                self.size -= self._entries.popitem(last=False)[1][2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteStore:
+    def __init__(self, path, max_entries=1024, ttl=300, max_bytes=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT, expires REAL, accessed REAL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)"
+            )
+
+    def _connect(self):
+        # A connection per operation keeps the store safe to use after
+        # gunicorn forks its workers
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, key):
+        now = time.time()
+
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT value FROM entries WHERE key = ? AND expires > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+
+            connection.execute(
+                "UPDATE entries SET accessed = ? WHERE key = ?", (now, key)
+            )
+
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        expires = now + (self.ttl if ttl is None else ttl)
+
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires, now),
+            )
+            connection.execute("DELETE FROM entries WHERE expires <= ?", (now,))
+            connection.execute(
+                "DELETE FROM entries WHERE key IN ("
+                "SELECT key FROM entries ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+            if self.max_bytes is not None:
+                # Keep the most recently used entries whose sizes fit the cap
+                connection.execute(
+                    "DELETE FROM entries WHERE key IN ("
+                    "SELECT key FROM (SELECT key, SUM(LENGTH(value)) OVER ("
+                    "ORDER BY accessed DESC, key) AS total FROM entries) WHERE total > ?)",
+                    (self.max_bytes,),
+                )
+
+    def clear(self):
+        with self._connect() as connection:
+            connection.execute("DELETE FROM entries")
+
+    def __len__(self):
+        with self._connect() as connection:
+            return connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event()}
+
+        if not leader:
+            call["done"].wait()
+            if "error" in call:
+                raise call["error"]
+
+            return call["result"]
+
+        try:
+            call["result"] = fn()
+            return call["result"]
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+
+
+def create_store(path=None, max_entries=1024, ttl=300, max_bytes=None):
+    if path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        return SQLiteStore(path, max_entries, ttl, max_bytes)
+
+    return MemoryStore(max_entries, ttl, max_bytes)
@@ -0,0 +1,30 @@
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# In order of preference; brotli is only offered when it is installed
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+MIN_SIZE = 1024
+
+
+def compress(data, encoding, level=None):
+    if encoding == "br":
+        return brotli.compress(data, quality=4 if level is None else level)
+    elif encoding == "gzip":
+        return gzip.compress(data, compresslevel=6 if level is None else level)
+
+    raise ValueError("Unknown content encoding: {}".format(encoding))
+
+
+def negotiate(accept_encodings):
+    # accept_encodings is werkzeug's Accept header, which gives the quality
+    # of each encoding, or 0 when the client does not accept it
+    for encoding in ENCODINGS:
+        if accept_encodings[encoding]:
+            return encoding
+
+    return None
@@ -0,0 +1,63 @@
+from collections import namedtuple
+
+from lib import parallel, variance_reduction
+
+# Work is counted in simulated path steps, which take about 30ns each on
+# one core, and memory in bytes of the arrays alive at the peak of a request
+Cost = namedtuple("Cost", ("work", "memory"))
+
+STEP_SECONDS = 30e-9
+
+# Path steps per simulated path, including the terminal draw, the plot
+# summary and, for finite differences, the five bumped repricings
+MONTE_CARLO_WORK = {"fdm": 12, "pathwise": 7, "likelihood_ratio": 7}
+
+# Float64 temporaries per path in a chunk of the Greeks kernels
+MONTE_CARLO_TEMPORARIES = {"fdm": 32, "pathwise": 20, "likelihood_ratio": 20}
+
+CHAIN_WORK = 4
+CHAIN_TEMPORARIES = 20
+
+# A position repriced in one scenario takes about ten path steps and keeps
+# about 200 bytes of kernel temporaries alive
+PORTFOLIO_WORK = 10
+PORTFOLIO_BYTES = 200
+
+
+def monte_carlo(N, method="fdm", chunk_size=parallel.CHUNK_SIZE, variance_reduction_method="none"):
+    # Terminal prices are sampled exactly, so the number of time steps does
+    # not change the cost; the plot summary keeps three arrays of N prices
+    # and the control variate adds a pilot chunk
+    chunk = variance_reduction.largest_batch(N, chunk_size, variance_reduction_method)
+    pilot = min(N, chunk_size) if variance_reduction_method == "control_variate" else 0
+
+    return Cost(
+        (N + pilot) * MONTE_CARLO_WORK[method],
+        8 * (chunk * MONTE_CARLO_TEMPORARIES[method] + 3 * N),
+    )
+
+
+def path_dependent(
+    N, steps, batch_size=2 ** 14, block_steps=64, itemsize=8, control_variate=False
+):
+    # Paths are streamed through a fixed block, so memory does not grow
+    # with N or the number of steps; the control variate adds a pilot batch
+    batch = min(N, batch_size)
+
+    return Cost((N + batch * control_variate) * steps, batch * (min(steps, block_steps) * 3 * itemsize + 128))
+
+
+def portfolio(positions, scenarios, underlyings, ladders=7):
+    # The per underlying ladders are summed with a (underlyings, positions)
+    # membership matrix
+    return Cost(
+        positions * scenarios * PORTFOLIO_WORK,
+        positions * scenarios * PORTFOLIO_BYTES + 8 * underlyings * (positions + ladders * scenarios),
+    )
+
+
+def chain(contracts, N, max_chunk_elements=2 ** 20):
+    return Cost(
+        contracts * N * CHAIN_WORK,
+        8 * (N + max(N, min(contracts * N, max_chunk_elements)) * CHAIN_TEMPORARIES),
+    )
@@ -0,0 +1,105 @@
+import numpy as np
+
+from lib import black_scholes_calculator
+from lib.optiontype import OptionType
+
+MIN_VOLATILITY = 1e-6
+MAX_VOLATILITY = 10.0
+
+
+def initial_guess(call_price, S_0, K, r, T, q):
+    # Corrado-Miller approximation, which reduces to Brenner-Subrahmanyam
+    # at the money
+    forward = S_0 * np.exp(-q * T)
+    strike = K * np.exp(-r * T)
+
+    moneyness = (forward - strike) / 2
+    discriminant = np.maximum((call_price - moneyness) ** 2 - moneyness ** 2 * 4 / np.pi, 0)
+
+    guess = (
+        np.sqrt(2 * np.pi / T)
+        / (forward + strike)
+        * (call_price - moneyness + np.sqrt(discriminant))
+    )
+
+    return np.clip(guess, 0.01, MAX_VOLATILITY)
+
+
+def implied_volatility(
+    option_type,
+    price,
+    S_0,
+    K,
+    r,
+    T,
+    q,
+    tolerance=1e-10,
+    price_tolerance=1e-12,
+    max_iterations=100,
+):
+    is_call = np.asarray(option_type) == OptionType.CALL
+    shape = np.broadcast(is_call, price, S_0, K, r, T, q).shape
+    is_call, price, S_0, K, r, T, q = (
+        np.ravel(p)
+        for p in np.broadcast_arrays(
+            is_call, *(np.asarray(p, dtype=float) for p in (price, S_0, K, r, T, q))
+        )
+    )
+
+    forward = S_0 * np.exp(-q * T)
+    strike = K * np.exp(-r * T)
+
+    # The initial guess is stated for calls, so puts go through put-call parity
+    call_price = np.where(is_call, price, price + forward - strike)
+    solvable = np.where(
+        is_call,
+        (price > np.maximum(forward - strike, 0)) & (price < forward),
+        (price > np.maximum(strike - forward, 0)) & (price < strike),
+    )
+
+    sigma = np.where(solvable, initial_guess(call_price, S_0, K, r, T, q), np.nan)
+    lower = np.full(sigma.shape, MIN_VOLATILITY)
+    upper = np.full(sigma.shape, MAX_VOLATILITY)
+    converged = ~solvable
+    iterations = 0
+
+    while iterations < max_iterations and not np.all(converged):
+        iterations += 1
+        active = ~converged
+
+        s = sigma[active]
+        params = (S_0[active], K[active], r[active], T[active], q[active])
+
+        call, put = black_scholes_calculator.black_scholes_call_put(s, *params)
+        d1, _ = black_scholes_calculator._d1_d2(s, *params)
+        vega = (
+            forward[active] * np.sqrt(params[3]) * np.exp(-(d1 ** 2) / 2) / np.sqrt(2 * np.pi)
+        )
+
+        error = np.where(is_call[active], call, put) - price[active]
+
+        # Converged once the Newton correction is below the tolerance, or the
+        # price is matched to within rounding when vega has vanished
+        done = (np.abs(error) <= tolerance * vega) | (np.abs(error) <= price_tolerance)
+
+        # The price is increasing in volatility, so every evaluation
+        # tightens a bracket around the root
+        low, high = lower[active], upper[active]
+        low = np.where(error < 0, s, low)
+        high = np.where(error > 0, s, high)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            newton = s - error / vega
+
+        # Fall back to bisection whenever Newton leaves the bracket
+        step = np.where(
+            (newton > low) & (newton < high) & (vega > 0), newton, (low + high) / 2
+        )
+
+        sigma[active] = np.where(done, s, step)
+        lower[active], upper[active] = low, high
+        converged[active] = done | (high - low < tolerance)
+
+    sigma[~converged] = np.nan
+
+    return sigma.reshape(shape), iterations
@@ -0,0 +1,341 @@
+import concurrent.futures
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+FINISHED = ("succeeded", "failed", "cancelled")
+UNFINISHED = ("queued", "running")
+
+STALE_ERROR = "The worker running the job stopped"
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _job(job_id, kind, now):
+    return {
+        "id": job_id,
+        "kind": kind,
+        "status": "queued",
+        "progress": 0.0,
+        "result": None,
+        "error": None,
+        "cancelRequested": False,
+        "created": now,
+        "updated": now,
+    }
+
+
+class MemoryJobStore:
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id, kind):
+        with self._lock:
+            self._jobs[job_id] = _job(job_id, kind, time.time())
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields, updated=time.time())
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+
+            return dict(job) if job is not None else None
+
+    def count(self, statuses):
+        with self._lock:
+            return sum(job["status"] in statuses for job in self._jobs.values())
+
+    def expire(self, stale_after):
+        now = time.time()
+
+        with self._lock:
+            for job in self._jobs.values():
+                if job["status"] in UNFINISHED and job["updated"] <= now - stale_after:
+                    job.update(status="failed", error=STALE_ERROR, updated=now)
+
+    def purge(self, retention, max_jobs):
+        now = time.time()
+
+        with self._lock:
+            finished = sorted(
+                (job["updated"], job_id)
+                for job_id, job in self._jobs.items()
+                if job["status"] in FINISHED
+            )
+            excess = len(self._jobs) - max_jobs
+            for i, (updated, job_id) in enumerate(finished):
+                if updated <= now - retention or i < excess:
+                    del self._jobs[job_id]
+
+
+class SQLiteJobStore:
+    # Lets any gunicorn worker answer polls and cancellations for a job that
+    # runs in another one
+    def __init__(self, path):
+        self.path = path
+
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT, status TEXT, progress REAL, "
+                "result TEXT, error TEXT, cancel_requested INTEGER, created REAL, updated REAL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_status_updated ON jobs (status, updated)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    COLUMNS = {
+        "status": "status",
+        "progress": "progress",
+        "result": "result",
+        "error": "error",
+        "cancelRequested": "cancel_requested",
+    }
+
+    def create(self, job_id, kind):
+        job = _job(job_id, kind, time.time())
+
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, job["status"], 0.0, None, None, 0, job["created"], job["updated"]),
+            )
+
+    def update(self, job_id, **fields):
+        values = {
+            self.COLUMNS[name]: json.dumps(value) if name == "result" else value
+            for name, value in fields.items()
+        }
+        values["updated"] = time.time()
+
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET {} WHERE id = ?".format(
+                    ", ".join("{} = ?".format(column) for column in values)
+                ),
+                list(values.values()) + [job_id],
+            )
+
+    def get(self, job_id):
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT id, kind, status, progress, result, error, cancel_requested, "
+                "created, updated FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return {
+            "id": row[0],
+            "kind": row[1],
+            "status": row[2],
+            "progress": row[3],
+            "result": json.loads(row[4]) if row[4] is not None else None,
+            "error": row[5],
+            "cancelRequested": bool(row[6]),
+            "created": row[7],
+            "updated": row[8],
+        }
+
+    def count(self, statuses):
+        with self._connect() as connection:
+            return connection.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN ({})".format(
+                    ", ".join("?" * len(statuses))
+                ),
+                statuses,
+            ).fetchone()[0]
+
+    def expire(self, stale_after):
+        now = time.time()
+
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated = ? "
+                "WHERE status IN (?, ?) AND updated <= ?",
+                (STALE_ERROR, now) + UNFINISHED + (now - stale_after,),
+            )
+
+    def purge(self, retention, max_jobs):
+        finished = ", ".join("?" * len(FINISHED))
+
+        with self._connect() as connection:
+            connection.execute(
+                "DELETE FROM jobs WHERE status IN ({}) AND updated <= ?".format(finished),
+                FINISHED + (time.time() - retention,),
+            )
+
+            # Unfinished jobs are never dropped, the oldest finished ones are
+            unfinished = connection.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status NOT IN ({})".format(finished), FINISHED
+            ).fetchone()[0]
+            connection.execute(
+                "DELETE FROM jobs WHERE id IN (SELECT id FROM jobs WHERE status IN ({}) "
+                "ORDER BY updated DESC LIMIT -1 OFFSET ?)".format(finished),
+                FINISHED + (max(0, max_jobs - unfinished),),
+            )
+
+
+class JobQueue:
+    def __init__(
+        self, store, workers=2, retention=3600, max_jobs=1000, max_pending=100, stale_after=60
+    ):
+        self.store = store
+        self.workers = workers
+        self.retention = retention
+        self.max_jobs = max_jobs
+        self.max_pending = max_pending
+        self.stale_after = stale_after
+        self._executor = None
+        self._active = set()
+        self._lock = threading.Lock()
+
+    def _submit(self, fn, *args):
+        # Created on first use so that it is not inherited by forked workers
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.workers
+                )
+                threading.Thread(target=self._heartbeat, daemon=True).start()
+
+        return self._executor.submit(fn, *args)
+
+    def _heartbeat(self):
+        # Jobs of a live process are touched well within stale_after, so that
+        # only the jobs of a process that died, such as a gunicorn worker
+        # killed on timeout, are failed by expire
+        while True:
+            time.sleep(self.stale_after / 4)
+
+            with self._lock:
+                active = list(self._active)
+            for job_id in active:
+                self.store.update(job_id)
+
+    def _expire(self):
+        self.store.expire(self.stale_after)
+
+    def submit(self, kind, fn):
+        # fn takes a progress callback, which raises JobCancelled once the
+        # job has been cancelled so that it stops at its next report
+        self._expire()
+        self.store.purge(self.retention, self.max_jobs)
+        if self.store.count(UNFINISHED) >= self.max_pending:
+            raise QueueFull("Too many jobs are pending, try again later")
+
+        job_id = uuid.uuid4().hex
+        self.store.create(job_id, kind)
+        with self._lock:
+            self._active.add(job_id)
+        self._submit(self._run, job_id, fn)
+
+        return job_id
+
+    def _progress(self, job_id):
+        def report(fraction):
+            job = self.store.get(job_id)
+            if job is None or job["cancelRequested"]:
+                raise JobCancelled()
+
+            self.store.update(job_id, progress=min(max(float(fraction), 0.0), 1.0))
+
+        return report
+
+    def _run(self, job_id, fn):
+        try:
+            self._execute(job_id, fn)
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
+
+    def _execute(self, job_id, fn):
+        job = self.store.get(job_id)
+        if job is None or job["cancelRequested"]:
+            self.store.update(job_id, status="cancelled")
+            return
+
+        self.store.update(job_id, status="running")
+        try:
+            result = fn(self._progress(job_id))
+        except JobCancelled:
+            self.store.update(job_id, status="cancelled")
+        except Exception as e:
+            self.store.update(job_id, status="failed", error=str(e) or e.__class__.__name__)
+        else:
+            self.store.update(job_id, status="succeeded", progress=1.0, result=result)
+
+    def get(self, job_id):
+        self._expire()
+
+        return self.store.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.store.get(job_id)
+        if job is not None and job["status"] not in FINISHED:
+            self.store.update(job_id, cancelRequested=True)
+            if job["status"] == "queued":
+                self.store.update(job_id, status="cancelled")
+
+        return self.store.get(job_id)
+
+    def events(self, job_id, interval=0.25, timeout=None):
+        # Yields the job whenever its status or progress changes, until it
+        # finishes; the store is polled so this works across processes
+        start = time.time()
+        last = None
+
+        while timeout is None or time.time() - start < timeout:
+            job = self.store.get(job_id)
+            if job is None:
+                return
+
+            state = (job["status"], job["progress"])
+            if state != last:
+                last = state
+                yield job
+
+            if job["status"] in FINISHED:
+                return
+
+            time.sleep(interval)
+
+
+def from_environment(environ=os.environ, default="memory"):
+    # Gunicorn workers share jobs through a SQLite file, because any worker
+    # may be asked about a job that another one runs; "memory" keeps them in
+    # the process, which only suits a single worker. The app passes a file
+    # in its instance folder as the default.
+    path = environ.get("QUANTPRO_JOB_STORE") or default
+    if path != "memory":
+        os.makedirs(os.path.dirname(os.path.abspath(path)), mode=0o700, exist_ok=True)
+
+    return JobQueue(
+        MemoryJobStore() if path == "memory" else SQLiteJobStore(path),
+        workers=int(environ.get("QUANTPRO_JOB_WORKERS", 2)),
+        retention=int(environ.get("QUANTPRO_JOB_RETENTION", 3600)),
+        max_jobs=int(environ.get("QUANTPRO_JOB_MAX", 1000)),
+        max_pending=int(environ.get("QUANTPRO_JOB_MAX_PENDING", 100)),
+        stale_after=float(environ.get("QUANTPRO_JOB_STALE_AFTER", 60)),
+    )
@@ -0,0 +1,268 @@
+import bisect
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Seconds between the flushes requests trigger; a flush takes about a
+# millisecond
+FLUSH_INTERVAL = 1.0
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _pairs(labels):
+    # Labels read back from JSON are lists of lists
+    return tuple(tuple(pair) for pair in labels)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+
+    return True
+
+
+def _format_labels(labels, **extra):
+    pairs = list(labels) + sorted(extra.items())
+    if not pairs:
+        return ""
+
+    return "{" + ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in pairs
+    ) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self, directory=None):
+        # With a directory, every process writes its metrics there on flush
+        # and render adds up those of all processes, since any gunicorn
+        # worker may answer a scrape
+        self.directory = directory
+        self.histograms = defaultdict(dict)
+        self.counters = defaultdict(dict)
+        self.collectors = []
+        self._flushed = None
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, **labels):
+        key = _labels(labels)
+
+        with self._lock:
+            histogram = self.histograms[name].get(key)
+            if histogram is None:
+                histogram = self.histograms[name][key] = Histogram()
+            histogram.observe(value)
+
+    def increment(self, name, value=1, **labels):
+        key = _labels(labels)
+
+        with self._lock:
+            self.counters[name][key] = self.counters[name].get(key, 0) + value
+
+    def register_collector(self, collector):
+        # Collectors are called on every scrape and return
+        # (name, type, labels, value) samples for values owned elsewhere
+        self.collectors.append(collector)
+
+    def snapshot(self):
+        # The metrics of this process as JSON compatible lists
+        with self._lock:
+            histograms = [
+                [name, labels, histogram.buckets, histogram.counts, histogram.sum, histogram.count]
+                for name, series in self.histograms.items()
+                for labels, histogram in series.items()
+            ]
+            counters = [
+                [name, labels, value]
+                for name, series in self.counters.items()
+                for labels, value in series.items()
+            ]
+            collectors = list(self.collectors)
+
+        samples = [
+            [name, kind, labels, value]
+            for collector in collectors
+            for name, kind, labels, value in collector()
+        ]
+
+        return {"histograms": histograms, "counters": counters, "samples": samples}
+
+    def flush(self, interval=0):
+        now = time.monotonic()
+        if self.directory is None or (self._flushed is not None and now - self._flushed < interval):
+            return
+        self._flushed = now
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, "{}.json".format(os.getpid()))
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.snapshot(), f, default=float)
+        os.replace(path + ".tmp", path)
+
+    def _snapshots(self):
+        snapshots = {}
+        if self.directory is not None and os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                pid, extension = os.path.splitext(name)
+                if extension == ".json":
+                    with open(os.path.join(self.directory, name)) as f:
+                        snapshots[int(pid)] = json.load(f)
+
+        # This process reports its live metrics rather than its last flush
+        snapshots[os.getpid()] = self.snapshot()
+
+        return snapshots
+
+    def render(self):
+        # Histograms and counters are added up across processes, which keeps
+        # those of workers that exited. Gauges are per process, labelled
+        # with its pid when there are several, and dropped once it exits.
+        histograms = defaultdict(dict)
+        counters = defaultdict(dict)
+        families = {}
+
+        for pid, snapshot in sorted(self._snapshots().items()):
+            for name, labels, buckets, counts, total, count in snapshot["histograms"]:
+                merged = histograms[name].setdefault(_pairs(labels), Histogram(tuple(buckets)))
+                merged.counts = [a + b for a, b in zip(merged.counts, counts)]
+                merged.sum += total
+                merged.count += count
+
+            for name, labels, value in snapshot["counters"]:
+                key = _pairs(labels)
+                counters[name][key] = counters[name].get(key, 0) + value
+
+            for name, kind, labels, value in snapshot["samples"]:
+                if kind == "gauge" and self.directory is not None:
+                    if not _alive(pid):
+                        continue
+                    labels = dict(labels, pid=pid)
+
+                kind, series = families.setdefault(name, (kind, {}))
+                key = _labels(labels)
+                series[key] = series.get(key, 0) + value
+
+        lines = []
+        for name, series in sorted(histograms.items()):
+            lines.append("# TYPE {} histogram".format(name))
+            for labels, histogram in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                    cumulative += count
+                    lines.append("{}_bucket{} {}".format(name, _format_labels(labels, le=bound), cumulative))
+                lines.append("{}_sum{} {!r}".format(name, _format_labels(labels), histogram.sum))
+                lines.append("{}_count{} {}".format(name, _format_labels(labels), histogram.count))
+
+        for name, series in sorted(counters.items()):
+            lines.append("# TYPE {} counter".format(name))
+            for labels, value in sorted(series.items()):
+                lines.append("{}{} {}".format(name, _format_labels(labels), value))
+
+        for name, (kind, series) in families.items():
+            lines.append("# TYPE {} {}".format(name, kind))
+            for labels, value in series.items():
+                lines.append("{}{} {}".format(name, _format_labels(labels), value))
+
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self._flushed = None
+
+
+registry = Registry(os.environ.get("QUANTPRO_METRICS_DIR"))
+
+
+class Profile:
+    def __init__(self):
+        self.spans = defaultdict(lambda: [0.0, 0])
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.spans[name][0] += seconds
+            self.spans[name][1] += 1
+
+    def breakdown(self):
+        with self._lock:
+            return {
+                name: {"seconds": seconds, "calls": calls}
+                for name, (seconds, calls) in self.spans.items()
+            }
+
+
+_profile = contextvars.ContextVar("profile", default=None)
+
+
+def current_profile():
+    return _profile.get()
+
+
+def start_profile():
+    current = Profile()
+
+    return current, _profile.set(current)
+
+
+def stop_profile(token):
+    _profile.reset(token)
+
+
+@contextlib.contextmanager
+def profile():
+    current, token = start_profile()
+    try:
+        yield current
+    finally:
+        stop_profile(token)
+
+
+@contextlib.contextmanager
+def span(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+
+        registry.observe("quantpro_span_seconds", elapsed, span=name)
+
+        current = _profile.get()
+        if current is not None:
+            current.add(name, elapsed)
+
+
+def propagate(fn):
+    # Thread pools do not inherit context variables, so tasks run in a copy
+    # of the submitting context to report their spans to its profile
+    context = contextvars.copy_context()
+
+    return lambda *args: context.copy().run(fn, *args)
@@ -1,22 +1,76 @@
+import time
+
 import numpy as np
+import scipy.special
 
+from lib import metrics, variance_reduction
+from lib.running_stats import RunningStats
 from lib.optiontype import OptionType
 
 
-def monte_carlo_paths(S_0, T, r, q, sigma, steps, N):
+PATH_MODES = ("full", "terminal", "accumulate")
+
+PRECISIONS = {"double": np.float64, "single": np.float32}
+
+
+def _normals(shape, normals, source, dtype, out):
+    # Returns a buffer of standard normals that the caller may overwrite
+    if out is None:
+        out = np.empty(shape, dtype)
+
+    if normals is not None:
+        out[...] = normals
+    elif isinstance(source, np.random.Generator):
+        source.standard_normal(out=out, dtype=out.dtype)
+    else:
+        out[...] = source.normal(size=shape)
+
+    return out
+
+
+def monte_carlo_paths(
+    S_0, T, r, q, sigma, steps, N, mode="full", normals=None, rng=None, dtype=np.float64, out=None
+):
+    # Drift, diffusion, accumulation and exponentiation are applied in place
+    # to the buffer the normals are generated into, which can be passed as
+    # out; float32 halves the memory traffic at a cost in accuracy that
+    # python -m benchmarks --precision reports
     dt = T / steps
-    logS_T = np.log(S_0) + np.cumsum(
-        (
-            (r - q - sigma ** 2 / 2) * dt
-            + sigma * np.sqrt(dt) * np.random.normal(size=(steps, N))
-        ),
-        axis=0,
-    )
-    return np.exp(logS_T)
+    source = np.random if rng is None else rng
 
+    if mode == "full":
+        logS_T = _normals((steps, N), normals, source, dtype, out)
+        logS_T *= sigma * np.sqrt(dt)
+        logS_T += (r - q - sigma ** 2 / 2) * dt
+        np.cumsum(logS_T, axis=0, out=logS_T)
+        logS_T += np.log(S_0)
+    elif mode == "terminal":
+        # The sum of the log increments is exactly normal, so the terminal
+        # price is sampled in a single step
+        logS_T = _normals((1, N), normals, source, dtype, out)
+        logS_T *= sigma * np.sqrt(T)
+        logS_T += np.log(S_0) + (r - q - sigma ** 2 / 2) * T
+    elif mode == "accumulate":
+        drift = (r - q - sigma ** 2 / 2) * dt
+        diffusion = sigma * np.sqrt(dt)
 
-def monte_carlo(option_type, S_0, K, T, r, q, sigma, steps, N):
-    paths_S_T = monte_carlo_paths(S_0, T, r, q, sigma, steps, N)
+        logS_T = np.empty((1, N), dtype) if out is None else out
+        logS_T.fill(np.log(S_0))
+
+        increment = np.empty(N, logS_T.dtype)
+        for step in range(steps):
+            _normals(N, None if normals is None else normals[step], source, dtype, increment)
+            increment *= diffusion
+            increment += drift
+            logS_T += increment
+    else:
+        raise ValueError("Unknown path mode: {}".format(mode))
+
+    return np.exp(logS_T, out=logS_T)
+
+
+def monte_carlo(option_type, S_0, K, T, r, q, sigma, steps, N, mode="terminal"):
+    paths_S_T = monte_carlo_paths(S_0, T, r, q, sigma, steps, N, mode)
 
     if option_type == OptionType.CALL:
         expectedvalue_C_T = np.mean(np.maximum(paths_S_T[-1] - K, 0))
@@ -51,7 +105,6 @@ def greeks_fdm(
         - monte_carlo(option_type, S_0, K, T, r, q, sigma, steps, N)
     ) / delta_sigma
 
-    print(delta_r)
     rho = (
         monte_carlo(option_type, S_0, K, T, r + delta_r, q, sigma, steps, N)
         - monte_carlo(option_type, S_0, K, T, r, q, sigma, steps, N)
@@ -61,18 +114,310 @@ def greeks_fdm(
     return delta, gamma, theta, vega, rho
 
 
-def plot_data(S_0, K, T, r, q, sigma, steps, N):
-    paths_S_T = monte_carlo_paths(S_0, T, r, q, sigma, steps, N)
+def terminal_prices(S_0, T, r, q, sigma, Z):
+    return S_0 * np.exp((r - q - sigma ** 2 / 2) * T + sigma * np.sqrt(T) * Z)
+
+
+def _discounted_payoffs(S_T, K, r, T):
+    discount = np.exp(-r * T)
+
+    return (
+        discount * np.maximum(S_T - K, 0),
+        discount * np.maximum(K - S_T, 0),
+    )
+
+
+def _fdm_samples(S_0, K, T, r, q, sigma, Z, delta_S, delta_T, delta_sigma, delta_r):
+    def payoffs(S_0=S_0, T=T, r=r, sigma=sigma):
+        return _discounted_payoffs(terminal_prices(S_0, T, r, q, sigma, Z), K, r, T)
+
+    base = payoffs()
+    up = payoffs(S_0=S_0 + delta_S)
+    down = payoffs(S_0=S_0 - delta_S)
+    later = payoffs(T=T + delta_T)
+    vol_up = payoffs(sigma=sigma + delta_sigma)
+    rate_up = payoffs(r=r + delta_r)
+
+    return {
+        option_type: np.stack(
+            [
+                base[i],
+                (up[i] - base[i]) / delta_S,
+                (up[i] - 2 * base[i] + down[i]) / (delta_S * delta_S),
+                (later[i] - base[i]) / delta_T,
+                (vol_up[i] - base[i]) / delta_sigma,
+                (rate_up[i] - base[i]) / delta_r,
+            ]
+        )
+        for i, option_type in enumerate((OptionType.CALL, OptionType.PUT))
+    }
+
+
+def _pathwise_samples(S_0, K, T, r, q, sigma, Z):
+    S_T = terminal_prices(S_0, T, r, q, sigma, Z)
+    call_payoff, put_payoff = _discounted_payoffs(S_T, K, r, T)
+    discount = np.exp(-r * T)
+
+    in_the_money = {OptionType.CALL: S_T > K, OptionType.PUT: S_T < K}
+    payoffs = {OptionType.CALL: call_payoff, OptionType.PUT: put_payoff}
+    signs = {OptionType.CALL: 1, OptionType.PUT: -1}
+
+    # Derivatives of S_T with respect to each parameter along a fixed path
+    dS_T_dS_0 = S_T / S_0
+    dS_T_dT = S_T * ((r - q - sigma ** 2 / 2) + sigma * Z / (2 * np.sqrt(T)))
+    dS_T_dsigma = S_T * (np.sqrt(T) * Z - sigma * T)
+
+    result = {}
+    for option_type in (OptionType.CALL, OptionType.PUT):
+        itm = in_the_money[option_type] * (signs[option_type] * discount)
+        payoff = payoffs[option_type]
+
+        # The payoff derivative is a step function, so gamma uses the
+        # likelihood ratio of the pathwise delta
+        result[option_type] = np.stack(
+            [
+                payoff,
+                itm * dS_T_dS_0,
+                itm * dS_T_dS_0 / S_0 * (Z / (sigma * np.sqrt(T)) - 1),
+                itm * dS_T_dT - r * payoff,
+                itm * dS_T_dsigma,
+                (itm * S_T - payoff) * T,
+            ]
+        )
+
+    return result
+
+
+def _likelihood_ratio_samples(S_0, K, T, r, q, sigma, Z):
+    call_payoff, put_payoff = _discounted_payoffs(
+        terminal_prices(S_0, T, r, q, sigma, Z), K, r, T
+    )
+    sigma_sqrt_T = sigma * np.sqrt(T)
+
+    # Score functions of the lognormal terminal density
+    scores = np.stack(
+        np.broadcast_arrays(
+            1,
+            Z / (S_0 * sigma_sqrt_T),
+            (Z ** 2 - 1 - Z * sigma_sqrt_T) / (S_0 ** 2 * sigma_sqrt_T ** 2),
+            Z * (r - q - sigma ** 2 / 2) / sigma_sqrt_T + (Z ** 2 - 1) / (2 * T) - r,
+            (Z ** 2 - 1) / sigma - Z * np.sqrt(T),
+            Z * np.sqrt(T) / sigma - T,
+        )
+    )
+
+    return {OptionType.CALL: call_payoff * scores, OptionType.PUT: put_payoff * scores}
+
 
-    call_payoff = np.maximum(paths_S_T[-1] - K, 0)
-    put_payoff = np.maximum(K - paths_S_T[-1], 0)
+GREEKS_METHODS = ("fdm", "pathwise", "likelihood_ratio")
 
-    data = [
-        (price, call_price, put_price)
-        for price, call_price, put_price in zip(
-            list(paths_S_T[-1]), list(call_payoff), list(put_payoff)
+
+def greek_samples(
+    S_0, K, T, r, q, sigma, Z, method, delta_S, delta_T, delta_sigma, delta_r
+):
+    # Per-path contributions to (price, delta, gamma, theta, vega, rho); the
+    # estimates are their means, so batches can be accumulated and merged
+    if method == "fdm":
+        return _fdm_samples(
+            S_0, K, T, r, q, sigma, Z, delta_S, delta_T, delta_sigma, delta_r
+        )
+    elif method == "pathwise":
+        return _pathwise_samples(S_0, K, T, r, q, sigma, Z)
+    elif method == "likelihood_ratio":
+        return _likelihood_ratio_samples(S_0, K, T, r, q, sigma, Z)
+
+    raise ValueError("Unknown Greeks method: {}".format(method))
+
+
+def greeks_crn(
+    S_0,
+    K,
+    T,
+    r,
+    q,
+    sigma,
+    steps,
+    N,
+    delta_S,
+    delta_sigma,
+    delta_r,
+    method="fdm",
+    Z=None,
+):
+    # A European payoff only depends on the terminal price, which is exactly
+    # lognormal, so one shared draw of N normals reprices every bump and both
+    # option types
+    if Z is None:
+        Z = np.random.normal(size=N)
+
+    samples = greek_samples(
+        S_0, K, T, r, q, sigma, Z, method, delta_S, T / steps, delta_sigma, delta_r
+    )
+
+    return {
+        option_type: tuple(np.mean(values, axis=-1))
+        for option_type, values in samples.items()
+    }
+
+
+def price_estimates(S_0, K, T, r, q, sigma, Z, variance_reduction_method="none"):
+    S_T = terminal_prices(S_0, T, r, q, sigma, Z)
+    call_payoff, put_payoff = _discounted_payoffs(S_T, K, r, T)
+
+    # The discounted terminal price is a control whose mean is known in
+    # closed form; it is strongly correlated with both payoffs
+    control = np.exp(-r * T) * S_T
+    control_mean = S_0 * np.exp(-q * T)
+
+    return {
+        option_type: variance_reduction.estimate(
+            payoff, variance_reduction_method, control, control_mean
+        )
+        for option_type, payoff in (
+            (OptionType.CALL, call_payoff),
+            (OptionType.PUT, put_payoff),
         )
-    ]
+    }
+
+
+def adaptive_greeks(
+    S_0,
+    K,
+    T,
+    r,
+    q,
+    sigma,
+    steps,
+    delta_S,
+    delta_sigma,
+    delta_r,
+    method="pathwise",
+    variance_reduction_method="none",
+    target_error=None,
+    time_budget=None,
+    max_simulations=10 ** 7,
+    batch_size=2 ** 14,
+    confidence=0.95,
+    rng=None,
+    progress=None,
+):
+    start = time.perf_counter()
+    z = scipy.special.ndtri((1 + confidence) / 2)
+
+    stats = {OptionType.CALL: RunningStats(6), OptionType.PUT: RunningStats(6)}
+    betas = {}
+    simulations = 0
+
+    def simulate(size):
+        with metrics.span("monte_carlo.paths"):
+            Z = variance_reduction.standard_normals(
+                size, method=variance_reduction_method, rng=rng
+            )[0]
+            control = np.exp(-r * T) * terminal_prices(S_0, T, r, q, sigma, Z)
+
+        with metrics.span("monte_carlo.greeks"):
+            batch = greek_samples(
+                S_0, K, T, r, q, sigma, Z, method, delta_S, T / steps, delta_sigma, delta_r
+            )
+
+        return batch, control
+
+    if variance_reduction_method == "control_variate":
+        # The control variate coefficients come from a pilot batch that is
+        # left out of the estimate, so that every batch of it is unbiased
+        pilot, control = simulate(min(batch_size, max_simulations))
+        betas = {
+            option_type: variance_reduction.control_variate_coefficient(values, control)
+            for option_type, values in pilot.items()
+        }
+
+    # Batches are drawn, reduced to running moments and discarded, so memory
+    # is bounded by the batch size whatever the number of simulations
+    for size in variance_reduction.batches(max_simulations, batch_size, variance_reduction_method):
+        batch, control = simulate(size)
+
+        with metrics.span("monte_carlo.statistics"):
+            for option_type, values in batch.items():
+                stats[option_type].update(
+                    variance_reduction.samples(
+                        values,
+                        variance_reduction_method,
+                        control,
+                        S_0 * np.exp(-q * T),
+                        betas.get(option_type),
+                    )
+                )
+
+        simulations += size
+        elapsed = time.perf_counter() - start
+
+        if progress is not None:
+            progress(max(simulations / max_simulations, elapsed / time_budget if time_budget else 0))
+
+        price_error = max(stats[option_type].standard_error[0] for option_type in stats)
+        if target_error is not None and z * price_error <= target_error:
+            break
+        if time_budget is not None and elapsed >= time_budget:
+            break
+
+    return {
+        option_type: (tuple(stat.mean), tuple(stat.standard_error))
+        for option_type, stat in stats.items()
+    }, simulations
+
+
+def price_chain(S_0, K, T, r, q, sigma, N, max_chunk_elements=2 ** 20):
+    Z = np.random.normal(size=N)
+
+    params = np.broadcast_arrays(*(np.atleast_1d(p) for p in (S_0, K, T, r, q, sigma)))
+    size = len(params[0])
+    chunk_size = max(1, max_chunk_elements // N)
+
+    call_greeks = np.empty((6, size))
+    put_greeks = np.empty((6, size))
+
+    # Every contract is priced against the same normals; contracts are
+    # processed in chunks to bound the (contracts, N) temporaries
+    for start in range(0, size, chunk_size):
+        chunk = slice(start, start + chunk_size)
+        samples = _pathwise_samples(*(p[chunk, np.newaxis] for p in params), Z)
+
+        call_greeks[:, chunk] = np.mean(samples[OptionType.CALL], axis=-1)
+        put_greeks[:, chunk] = np.mean(samples[OptionType.PUT], axis=-1)
+
+    return call_greeks, put_greeks
+
+
+def plot_data(
+    S_0,
+    K,
+    T,
+    r,
+    q,
+    sigma,
+    steps,
+    N,
+    mode="terminal",
+    rng=None,
+    resolution=101,
+    bins=50,
+    dtype=np.float64,
+):
+    with metrics.span("monte_carlo.plot_paths"):
+        S_T = monte_carlo_paths(S_0, T, r, q, sigma, steps, N, mode, rng=rng, dtype=dtype)[-1]
 
-    return [{"price" : price, "put_price" : put_price, "call_price": call_price} for (price, call_price, put_price) in sorted(data, key=lambda x: x[0])]
+    # A fixed-size summary of the terminal distribution keeps the payload
+    # independent of the number of simulations; payoffs are monotone in the
+    # terminal price, so they are evaluated at its quantiles
+    with metrics.span("monte_carlo.plot_summary"):
+        levels = np.linspace(0, 1, resolution)
+        prices = np.quantile(S_T, levels)
+        counts, edges = np.histogram(S_T, bins=bins)
 
+    return {
+        "quantile": levels.tolist(),
+        "price": prices.tolist(),
+        "call_price": np.maximum(prices - K, 0).tolist(),
+        "put_price": np.maximum(K - prices, 0).tolist(),
+        "histogram": {"edges": edges.tolist(), "counts": counts.tolist()},
+    }
@@ -0,0 +1,189 @@
+import concurrent.futures
+import functools
+import os
+import threading
+
+import numpy as np
+
+from lib import metrics, monte_carlo_calculator, variance_reduction
+from lib.optiontype import OptionType
+from lib.running_stats import RunningStats
+
+BACKENDS = ("thread", "process")
+
+CHUNK_SIZE = 2 ** 16
+
+
+class Pool:
+    executor = None
+    workers = None
+    backend = None
+    lock = threading.Lock()
+
+
+def configure(workers=None, backend=None):
+    # The pool defaults to a single worker so that it does not oversubscribe
+    # the machine next to gunicorn's own worker processes
+    workers = workers or int(os.environ.get("QUANTPRO_MC_WORKERS", 1))
+    backend = backend or os.environ.get("QUANTPRO_MC_BACKEND", "thread")
+
+    if backend not in BACKENDS:
+        raise ValueError("Unknown parallel backend: {}".format(backend))
+
+    with Pool.lock:
+        if Pool.executor is not None:
+            Pool.executor.shutdown(wait=False)
+
+        Pool.workers = workers
+        Pool.backend = backend
+        Pool.executor = None
+
+        # A single worker runs the chunks inline
+        if workers > 1:
+            executor = (
+                concurrent.futures.ThreadPoolExecutor
+                if backend == "thread"
+                else concurrent.futures.ProcessPoolExecutor
+            )
+            Pool.executor = executor(max_workers=workers)
+
+
+def _map(fn, items):
+    if Pool.workers is None:
+        configure()
+
+    if Pool.executor is None:
+        return map(fn, items)
+
+    if Pool.backend == "thread":
+        fn = metrics.propagate(fn)
+
+    return Pool.executor.map(fn, items)
+
+
+def _chunk_samples(
+    seed,
+    size,
+    S_0,
+    K,
+    T,
+    r,
+    q,
+    sigma,
+    delta_S,
+    delta_T,
+    delta_sigma,
+    delta_r,
+    method,
+    variance_reduction_method,
+):
+    # Spans recorded in a process pool stay in the worker processes
+    with metrics.span("monte_carlo.paths"):
+        rng = np.random.default_rng(seed)
+        Z = variance_reduction.standard_normals(
+            size, method=variance_reduction_method, rng=rng
+        )[0]
+        control = np.exp(-r * T) * monte_carlo_calculator.terminal_prices(
+            S_0, T, r, q, sigma, Z
+        )
+
+    with metrics.span("monte_carlo.greeks"):
+        samples = monte_carlo_calculator.greek_samples(
+            S_0, K, T, r, q, sigma, Z, method, delta_S, delta_T, delta_sigma, delta_r
+        )
+
+    return samples, control
+
+
+def _simulate_chunk(seed, size, betas=None, **params):
+    samples, control = _chunk_samples(seed, size, **params)
+
+    with metrics.span("monte_carlo.statistics"):
+        stats = {}
+        for option_type, values in samples.items():
+            stats[option_type] = RunningStats(6)
+            stats[option_type].update(
+                variance_reduction.samples(
+                    values,
+                    params["variance_reduction_method"],
+                    control,
+                    params["S_0"] * np.exp(-params["q"] * params["T"]),
+                    None if betas is None else betas[option_type],
+                )
+            )
+
+    return stats
+
+
+def parallel_greeks(
+    S_0,
+    K,
+    T,
+    r,
+    q,
+    sigma,
+    steps,
+    N,
+    delta_S,
+    delta_sigma,
+    delta_r,
+    method="fdm",
+    variance_reduction_method="none",
+    seed=None,
+    chunk_size=CHUNK_SIZE,
+    progress=None,
+):
+    # Chunk boundaries and their spawned streams only depend on N and the
+    # seed, and partial moments are merged in chunk order, so the result is
+    # the same for any pool size
+    sizes = variance_reduction.batches(N, chunk_size, variance_reduction_method)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes) + 1)
+    seeds, pilot_seed = seeds[:-1], seeds[-1]
+
+    params = dict(
+        S_0=S_0,
+        K=K,
+        T=T,
+        r=r,
+        q=q,
+        sigma=sigma,
+        delta_S=delta_S,
+        delta_T=T / steps,
+        delta_sigma=delta_sigma,
+        delta_r=delta_r,
+        method=method,
+        variance_reduction_method=variance_reduction_method,
+    )
+
+    betas = None
+    if variance_reduction_method == "control_variate":
+        # As in adaptive_greeks, the control variate coefficients come from
+        # a pilot chunk on its own stream that is left out of the estimate
+        pilot, control = _chunk_samples(pilot_seed, min(chunk_size, N), **params)
+        betas = {
+            option_type: variance_reduction.control_variate_coefficient(values, control)
+            for option_type, values in pilot.items()
+        }
+
+    simulate = functools.partial(_simulate_chunk, betas=betas, **params)
+
+    stats = {OptionType.CALL: RunningStats(6), OptionType.PUT: RunningStats(6)}
+    done = 0
+    for size, chunk in zip(sizes, _map(_apply, [(simulate, seed, size) for seed, size in zip(seeds, sizes)])):
+        for option_type, partial in chunk.items():
+            stats[option_type].merge(partial)
+
+        done += size
+        if progress is not None:
+            progress(done / N)
+
+    return {
+        option_type: (tuple(stat.mean), tuple(stat.standard_error))
+        for option_type, stat in stats.items()
+    }
+
+
+def _apply(task):
+    fn, seed, size = task
+
+    return fn(seed, size)
@@ -0,0 +1,213 @@
+import numpy as np
+
+from lib import black_scholes_calculator, variance_reduction
+from lib.optiontype import OptionType
+from lib.running_stats import RunningStats
+
+# Broadie-Glasserman-Kou shift of a discretely monitored barrier, in units of
+# the per-step volatility. Moving the barrier towards the spot by this much
+# makes discrete monitoring approximate continuous monitoring.
+BARRIER_SHIFT = 0.5826
+
+BARRIER_TYPES = ("up-and-out", "up-and-in", "down-and-out", "down-and-in")
+AVERAGING = ("arithmetic", "geometric")
+
+
+def _intrinsic(option_type, S, K):
+    if option_type == OptionType.CALL:
+        return np.maximum(S - K, 0)
+    elif option_type == OptionType.PUT:
+        return np.maximum(K - S, 0)
+
+
+# Payoffs see the simulated prices block by block, as (steps, paths) arrays of
+# consecutive monitoring dates, and only keep per-path state between blocks.
+# control_strike is the strike of the European option used as their control.
+
+
+class AsianPayoff:
+    def __init__(self, option_type, K, averaging="arithmetic"):
+        if averaging not in AVERAGING:
+            raise ValueError("Unknown averaging: {}".format(averaging))
+
+        self.option_type = option_type
+        self.K = K
+        self.control_strike = K
+        self.averaging = averaging
+
+    def start(self, N, S_0, step_volatility):
+        self.total = np.zeros(N)
+        self.count = 0
+
+    def update(self, S):
+        self.total += np.sum(S if self.averaging == "arithmetic" else np.log(S), axis=0)
+        self.count += S.shape[0]
+
+    def payoff(self, S_T):
+        average = self.total / self.count
+        if self.averaging == "geometric":
+            average = np.exp(average)
+
+        return _intrinsic(self.option_type, average, self.K)
+
+
+class BarrierPayoff:
+    def __init__(self, option_type, K, barrier, barrier_type, continuity_correction=True):
+        if barrier_type not in BARRIER_TYPES:
+            raise ValueError("Unknown barrier type: {}".format(barrier_type))
+
+        self.option_type = option_type
+        self.K = K
+        self.control_strike = K
+        self.barrier = barrier
+        self.barrier_type = barrier_type
+        self.continuity_correction = continuity_correction
+
+    def start(self, N, S_0, step_volatility):
+        self.up = self.barrier_type.startswith("up")
+        self.level = self.barrier
+        if self.continuity_correction:
+            shift = BARRIER_SHIFT * step_volatility
+            self.level = self.barrier * np.exp(-shift if self.up else shift)
+
+        self.hit = np.full(N, S_0 >= self.level if self.up else S_0 <= self.level)
+
+    def update(self, S):
+        if self.up:
+            self.hit |= np.max(S, axis=0) >= self.level
+        else:
+            self.hit |= np.min(S, axis=0) <= self.level
+
+    def payoff(self, S_T):
+        knocked_in = self.hit if self.barrier_type.endswith("in") else ~self.hit
+
+        return np.where(knocked_in, _intrinsic(self.option_type, S_T, self.K), 0)
+
+
+class LookbackPayoff:
+    # Without a strike the payoff is the floating strike lookback, S_T less
+    # the minimum for calls and the maximum less S_T for puts
+    def __init__(self, option_type, K=None):
+        self.option_type = option_type
+        self.K = K
+        self.control_strike = K
+
+    def start(self, N, S_0, step_volatility):
+        self.maximum = np.full(N, S_0, dtype=float)
+        self.minimum = np.full(N, S_0, dtype=float)
+        if self.K is None:
+            self.control_strike = S_0
+
+    def update(self, S):
+        np.maximum(self.maximum, np.max(S, axis=0), out=self.maximum)
+        np.minimum(self.minimum, np.min(S, axis=0), out=self.minimum)
+
+    def payoff(self, S_T):
+        if self.K is None:
+            if self.option_type == OptionType.CALL:
+                return S_T - self.minimum
+            elif self.option_type == OptionType.PUT:
+                return self.maximum - S_T
+
+        if self.option_type == OptionType.CALL:
+            return _intrinsic(self.option_type, self.maximum, self.K)
+        elif self.option_type == OptionType.PUT:
+            return _intrinsic(self.option_type, self.minimum, self.K)
+
+
+def price(
+    payoffs,
+    S_0,
+    T,
+    r,
+    q,
+    sigma,
+    steps,
+    N,
+    rng=None,
+    control_variate=True,
+    batch_size=2 ** 14,
+    block_steps=64,
+    progress=None,
+    dtype=np.float64,
+):
+    # Paths are simulated batch by batch, and every batch block by block of
+    # steps into one reused buffer, so memory is bounded by
+    # batch_size * block_steps whatever the number of steps and paths. All
+    # payoffs are priced on the same paths. A float32 buffer halves the
+    # memory traffic; prices and payoff state are still accumulated in
+    # float64.
+    rng = np.random.default_rng() if rng is None else rng
+
+    dt = T / steps
+    drift = (r - q - sigma ** 2 / 2) * dt
+    diffusion = sigma * np.sqrt(dt)
+    discount = np.exp(-r * T)
+
+    stats = [RunningStats() for _ in payoffs]
+    betas = [None] * len(payoffs)
+    buffer = np.empty(min(block_steps, steps) * min(batch_size, N), dtype)
+
+    def simulate(size):
+        # Returns the discounted payoffs of every payoff and those of the
+        # European option on the same terminal prices, its control
+        log_S = np.full(size, np.log(S_0))
+        for payoff in payoffs:
+            payoff.start(size, S_0, diffusion)
+
+        for step in range(0, steps, block_steps):
+            # The buffer is reshaped rather than sliced so the block stays
+            # contiguous for the generator to fill in place
+            block = buffer[:min(block_steps, steps - step) * size].reshape(-1, size)
+
+            rng.standard_normal(out=block, dtype=dtype)
+            block *= diffusion
+            block += drift
+            block[0] += log_S
+            np.cumsum(block, axis=0, out=block)
+            log_S[:] = block[-1]
+
+            S = np.exp(block, out=block)
+            for payoff in payoffs:
+                payoff.update(S)
+
+        S_T = np.exp(log_S)
+
+        return [
+            (
+                discount * payoff.payoff(S_T),
+                discount * _intrinsic(payoff.option_type, S_T, payoff.control_strike),
+            )
+            for payoff in payoffs
+        ]
+
+    if control_variate:
+        # The European option has a closed form mean. Its coefficients come
+        # from a pilot batch that is left out of the estimate, so that every
+        # batch of it is unbiased.
+        betas = [
+            variance_reduction.control_variate_coefficient(values, control)
+            for values, control in simulate(min(batch_size, N))
+        ]
+
+    for start in range(0, N, batch_size):
+        size = min(batch_size, N - start)
+
+        for i, (payoff, (values, control)) in enumerate(zip(payoffs, simulate(size))):
+            if control_variate:
+                values = variance_reduction.samples(
+                    values,
+                    "control_variate",
+                    control,
+                    black_scholes_calculator.black_scholes(
+                        payoff.option_type, sigma, S_0, payoff.control_strike, r, T, q
+                    ),
+                    betas[i],
+                )
+
+            stats[i].update(values)
+
+        if progress is not None:
+            progress((start + size) / N)
+
+    return [(float(stat.mean), float(stat.standard_error)) for stat in stats]
@@ -0,0 +1,75 @@
+import numpy as np
+
+from lib import black_scholes_calculator
+from lib.optiontype import OptionType
+
+LADDERS = ("pnl", "value") + black_scholes_calculator.FIRST_ORDER_GREEKS
+
+
+def _positions(value):
+    return np.asarray(value, dtype=float)[:, np.newaxis, np.newaxis, np.newaxis]
+
+
+def scenarios(
+    option_type, S_0, K, T, sigma, r, q, quantity, spot_shocks, volatility_shocks, rate_shocks
+):
+    # Positions run along the first axis and the spot, volatility and rate
+    # shocks along the next three, so one kernel call reprices every position
+    # in every scenario. Spot shocks are relative, the others are added.
+    S = _positions(S_0) * (1 + np.asarray(spot_shocks, dtype=float)[:, np.newaxis, np.newaxis])
+    shocked_sigma = _positions(sigma) + np.asarray(volatility_shocks, dtype=float)[:, np.newaxis]
+    shocked_r = _positions(r) + np.asarray(rate_shocks, dtype=float)
+
+    call, put = black_scholes_calculator.kernel(
+        shocked_sigma, S, _positions(K), shocked_r, _positions(T), _positions(q)
+    )
+
+    is_call = (np.asarray(option_type) == OptionType.CALL)[:, np.newaxis, np.newaxis, np.newaxis]
+    shape = np.broadcast_shapes(S.shape, shocked_sigma.shape, shocked_r.shape)
+
+    return {
+        name: np.broadcast_to(
+            _positions(quantity) * np.where(is_call, call[name], put[name]), shape
+        )
+        for name in ("price",) + black_scholes_calculator.FIRST_ORDER_GREEKS
+    }
+
+
+def aggregate(values, groups):
+    # Sums (positions, ...) arrays per group with a single matrix product
+    # rather than a Python loop over positions
+    labels, index = np.unique(np.asarray(groups), return_inverse=True)
+    membership = (index == np.arange(len(labels))[:, np.newaxis]).astype(float)
+
+    return labels, {
+        name: (membership @ value.reshape(len(index), -1)).reshape((len(labels),) + value.shape[1:])
+        for name, value in values.items()
+    }
+
+
+def risk(
+    option_type,
+    underlying,
+    S_0,
+    K,
+    T,
+    sigma,
+    r,
+    q,
+    quantity,
+    spot_shocks,
+    volatility_shocks,
+    rate_shocks,
+):
+    # Returns the underlyings and, per underlying, ladders of shape
+    # (spot shocks, volatility shocks, rate shocks): the P&L against the
+    # unshocked book, its value and its first-order Greeks
+    contracts = (option_type, S_0, K, T, sigma, r, q, quantity)
+
+    base = scenarios(*contracts, [0], [0], [0])["price"]
+    ladders = scenarios(*contracts, spot_shocks, volatility_shocks, rate_shocks)
+
+    ladders["value"] = ladders.pop("price")
+    ladders["pnl"] = ladders["value"] - base
+
+    return aggregate(ladders, underlying)
@@ -0,0 +1,40 @@
+import numpy as np
+
+
+class RunningStats:
+    def __init__(self, shape=()):
+        self.count = 0
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+
+    def _combine(self, count, mean, m2):
+        # Chan et al. pairwise update, exact for merging any two partitions
+        total = self.count + count
+        delta = mean - self.mean
+
+        self.mean = self.mean + delta * count / total
+        self.m2 = self.m2 + m2 + delta ** 2 * self.count * count / total
+        self.count = total
+
+    def update(self, values):
+        values = np.asarray(values)
+        count = values.shape[-1]
+        if count == 0:
+            return
+
+        mean = np.mean(values, axis=-1)
+        self._combine(count, mean, np.sum((values - mean[..., np.newaxis]) ** 2, axis=-1))
+
+    def merge(self, other):
+        if other.count:
+            self._combine(other.count, other.mean, other.m2)
+
+        return self
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else np.full_like(self.m2, np.nan)
+
+    @property
+    def standard_error(self):
+        return np.sqrt(self.variance / self.count) if self.count > 1 else self.variance
@@ -0,0 +1,164 @@
+import json
+import struct
+
+import numpy as np
+
+from lib import black_scholes_calculator
+
+QUANTITIES = ("price",) + black_scholes_calculator.FIRST_ORDER_GREEKS
+FIELDS = tuple(
+    "{}_{}".format(side, quantity) for side in ("call", "put") for quantity in QUANTITIES
+)
+
+MAGIC = b"QPSG"
+DTYPE = "<f4"
+
+# Margin on the largest error found at the validation points, which do not
+# cover every point where the error peaks
+ERROR_MARGIN = 1.5
+
+# The validation points split every cell in at least two along each axis,
+# and coarse axes in more parts, so that each axis has at least this many
+REFINED_POINTS = 64
+
+
+def _evaluate(K, r, q, S, sigma, T):
+    call, put = black_scholes_calculator.kernel(sigma, S, K, r, T, q)
+    shape = np.broadcast(S, sigma, T).shape
+
+    return np.stack(
+        [
+            np.broadcast_to(side[quantity], shape)
+            for side in (call, put)
+            for quantity in QUANTITIES
+        ],
+        axis=-1,
+    )
+
+
+def _refine(axis):
+    parts = max(2, -(-REFINED_POINTS // (len(axis) - 1)))
+    fractions = np.arange(parts) / parts
+
+    return np.append((axis[:-1, np.newaxis] + np.diff(axis)[:, np.newaxis] * fractions).ravel(), axis[-1])
+
+
+class Surface:
+    def __init__(self, K, r, q, spots, volatilities, tenors, values, error_estimate=None):
+        self.K = K
+        self.r = r
+        self.q = q
+        self.spots = spots
+        self.volatilities = volatilities
+        self.tenors = tenors
+        # (spots, volatilities, tenors, fields)
+        self.values = values
+        self.error_estimate = error_estimate
+
+        import scipy.interpolate
+
+        self._interpolator = scipy.interpolate.RegularGridInterpolator(
+            (spots, volatilities, tenors), values, bounds_error=False, fill_value=np.nan
+        )
+
+    def interpolate_values(self, S, sigma, T):
+        # Points outside the grid give NaN
+        S, sigma, T = np.broadcast_arrays(*(np.atleast_1d(p) for p in (S, sigma, T)))
+
+        return self._interpolator(np.stack([S, sigma, T], axis=-1))
+
+    def interpolate(self, S, sigma, T):
+        values = self.interpolate_values(S, sigma, T)
+
+        return {field: values[..., i] for i, field in enumerate(FIELDS)}
+
+    def header(self):
+        return {
+            "strikePrice": self.K,
+            "interestRate": self.r,
+            "dividendYield": self.q,
+            "spots": self.spots.tolist(),
+            "volatilities": self.volatilities.tolist(),
+            "tenors": self.tenors.tolist(),
+            "fields": list(FIELDS),
+            "shape": list(self.values.shape),
+            "dtype": DTYPE,
+            "errorEstimate": self.error_estimate,
+        }
+
+    def to_bytes(self):
+        # Magic, little-endian header length, JSON header, then the values
+        # as little-endian float32 in C order
+        header = json.dumps(self.header()).encode("utf-8")
+
+        return (
+            MAGIC
+            + struct.pack("<I", len(header))
+            + header
+            + np.ascontiguousarray(self.values, dtype=DTYPE).tobytes()
+        )
+
+    @classmethod
+    def from_bytes(cls, data):
+        if data[:4] != MAGIC:
+            raise ValueError("Not a pricing surface")
+
+        (length,) = struct.unpack("<I", data[4:8])
+        header = json.loads(data[8:8 + length].decode("utf-8"))
+        values = np.frombuffer(data[8 + length:], dtype=header["dtype"]).reshape(header["shape"])
+
+        return cls(
+            header["strikePrice"],
+            header["interestRate"],
+            header["dividendYield"],
+            np.array(header["spots"]),
+            np.array(header["volatilities"]),
+            np.array(header["tenors"]),
+            values.astype(float),
+            header["errorEstimate"],
+        )
+
+
+def build(K, r, q, spots, volatilities, tenors):
+    spots, volatilities, tenors = (np.asarray(axis, dtype=float) for axis in (spots, volatilities, tenors))
+
+    values = _evaluate(
+        K,
+        r,
+        q,
+        spots[:, np.newaxis, np.newaxis],
+        volatilities[np.newaxis, :, np.newaxis],
+        tenors[np.newaxis, np.newaxis, :],
+    )
+    surface = Surface(K, r, q, spots, volatilities, tenors, values)
+
+    # The error is checked against exact values on a refined grid, which
+    # includes the midpoints of every cell's edges and faces and its centre,
+    # where multilinear interpolation is least accurate along one, two or
+    # three axes. Coarse grids are refined further, since their error peaks
+    # far from those midpoints. It is an estimate, not a bound, which
+    # ERROR_MARGIN allows for. Spots are validated one at a time to bound
+    # memory.
+    sigma, T = np.meshgrid(_refine(volatilities), _refine(tenors), indexing="ij")
+    errors = np.zeros(len(FIELDS))
+    for S in _refine(spots):
+        errors = np.maximum(
+            errors,
+            np.max(
+                np.abs(surface.interpolate_values(S, sigma, T) - _evaluate(K, r, q, S, sigma, T)),
+                axis=(0, 1),
+            ),
+        )
+    surface.error_estimate = dict(zip(FIELDS, (ERROR_MARGIN * errors).tolist()))
+
+    return surface
+
+
+def grid(S_0, points=(41, 25, 17), volatility_range=(0.05, 1.5), tenor_range=(1 / 52, 2)):
+    # Spots span half to one and a half times the current price like the
+    # plot data. Tenors are denser near expiry, where prices move like sqrt(T).
+    spots = np.linspace(S_0 / 2, S_0 * 3 / 2, points[0])
+    volatilities = np.linspace(*volatility_range, points[1])
+    tenors = np.linspace(*np.sqrt(tenor_range), points[2]) ** 2
+
+    return spots, volatilities, tenors
@@ -0,0 +1,134 @@
+import warnings
+
+import numpy as np
+import scipy.special
+
+
+VARIANCE_REDUCTION = (
+    "none",
+    "antithetic",
+    "control_variate",
+    "moment_matching",
+    "sobol",
+    "halton",
+)
+
+QMC_METHODS = ("sobol", "halton")
+
+QMC_REPLICATIONS = 16
+
+# Paths needed for at least two independent samples, and so a standard
+# error: antithetic samples are pairs and QMC samples are replicates
+MIN_SIMULATIONS = {
+    "none": 2,
+    "antithetic": 4,
+    "control_variate": 2,
+    "moment_matching": 2,
+    "sobol": QMC_REPLICATIONS,
+    "halton": QMC_REPLICATIONS,
+}
+
+
+def batches(N, batch_size, method="none"):
+    # Sizes of the batches N paths are simulated in. Each randomized QMC
+    # replicate counts as one sample, so a short last batch, whose
+    # replicates would hold only a few points, is folded into the one before
+    full, remainder = divmod(N, batch_size)
+    if method in QMC_METHODS and full and remainder:
+        return [batch_size] * (full - 1) + [batch_size + remainder]
+
+    return [batch_size] * full + ([remainder] if remainder else [])
+
+
+def largest_batch(N, batch_size, method="none"):
+    if method in QMC_METHODS and N > batch_size:
+        return batch_size + N % batch_size
+
+    return min(N, batch_size)
+
+
+def _qmc_normals(dimensions, N, method, rng=None):
+    # scipy.stats takes longer to import than the rest of the app together,
+    # so it is only loaded once a QMC method is used
+    import scipy.stats.qmc
+
+    engine = scipy.stats.qmc.Sobol if method == "sobol" else scipy.stats.qmc.Halton
+
+    if rng is None:
+        rng = np.random.default_rng(np.random.randint(2 ** 31))
+
+    # Independent scrambles give randomized QMC replicates whose spread
+    # measures the error
+    replicates = []
+    for size in np.diff(np.linspace(0, N, QMC_REPLICATIONS + 1).astype(int)):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            points = engine(
+                dimensions, scramble=True, seed=rng.integers(2 ** 31)
+            ).random(size)
+
+        replicates.append(scipy.special.ndtri(points).T)
+
+    return np.concatenate(replicates, axis=1)
+
+
+def standard_normals(N, dimensions=1, method="none", rng=None):
+    # rng is a numpy Generator; without one the global numpy state is used
+    source = np.random if rng is None else rng
+
+    if method == "antithetic":
+        Z = source.normal(size=(dimensions, (N + 1) // 2))
+        return np.concatenate([Z, -Z], axis=1)[:, :N]
+    elif method == "moment_matching":
+        Z = source.normal(size=(dimensions, N))
+        return (Z - Z.mean(axis=1, keepdims=True)) / Z.std(axis=1, keepdims=True)
+    elif method in QMC_METHODS:
+        return _qmc_normals(dimensions, N, method, rng)
+    elif method in ("none", "control_variate"):
+        return source.normal(size=(dimensions, N))
+
+    raise ValueError("Unknown variance reduction method: {}".format(method))
+
+
+def control_variate_coefficient(values, control):
+    centered_control = control - np.mean(control, axis=-1, keepdims=True)
+    centered_values = values - np.mean(values, axis=-1, keepdims=True)
+
+    return np.sum(centered_values * centered_control, axis=-1, keepdims=True) / np.sum(
+        centered_control ** 2, axis=-1, keepdims=True
+    )
+
+
+def samples(values, method="none", control=None, control_mean=None, beta=None):
+    # Reduces (..., N) per-path values to independent samples whose mean is
+    # the estimator, so their spread gives its standard error
+    N = values.shape[-1]
+
+    if method == "antithetic":
+        # The first half holds the draws and the second half their negations
+        half = (N + 1) // 2
+        return (values[..., :N - half] + values[..., half:]) / 2
+    elif method in QMC_METHODS:
+        bounds = np.linspace(0, N, QMC_REPLICATIONS + 1).astype(int)
+        return np.stack(
+            [
+                np.mean(values[..., a:b], axis=-1)
+                for a, b in zip(bounds[:-1], bounds[1:])
+                if b > a
+            ],
+            axis=-1,
+        )
+    elif method == "control_variate":
+        if beta is None:
+            beta = control_variate_coefficient(values, control)
+        return values - beta * (control - control_mean)
+
+    return values
+
+
+def estimate(values, method="none", control=None, control_mean=None):
+    reduced = samples(values, method, control, control_mean)
+
+    return np.mean(reduced, axis=-1), np.std(reduced, axis=-1, ddof=1) / np.sqrt(
+        reduced.shape[-1]
+    )
@@ -0,0 +1,129 @@
+import numpy as np
+
+TRADING_DAYS = 252
+
+
+def _rolling_mean(x, window):
+    # O(T) moving average along the last axis for any number of series
+    cumsum = np.cumsum(x, axis=-1)
+    cumsum = np.concatenate([np.zeros(x.shape[:-1] + (1,)), cumsum], axis=-1)
+
+    return (cumsum[..., window:] - cumsum[..., :-window]) / window
+
+
+def _rolling_variance(x, window):
+    # Centering on the overall mean first keeps the sum-of-squares form
+    # numerically stable for small daily returns
+    x = x - np.mean(x, axis=-1, keepdims=True)
+
+    mean = _rolling_mean(x, window)
+    mean_of_squares = _rolling_mean(x ** 2, window)
+
+    return np.maximum(mean_of_squares - mean ** 2, 0) * window / (window - 1)
+
+
+def close_to_close(prices, window):
+    returns = np.diff(np.log(prices["Close"]), axis=-1)
+
+    return _rolling_variance(returns, window)
+
+
+def ewma(prices, window):
+    # Imported here so that loading the estimators does not pull in
+    # scipy.signal and its dependencies
+    import scipy.signal
+
+    returns = np.diff(np.log(prices["Close"]), axis=-1)
+
+    # RiskMetrics recursion with the decay matched to the window's span,
+    # seeded with the sample variance of the first window
+    decay = 1 - 2 / (window + 1)
+    seed = np.mean(returns[..., :window] ** 2, axis=-1)
+
+    variance, _ = scipy.signal.lfilter(
+        [1 - decay],
+        [1, -decay],
+        returns[..., window:] ** 2,
+        axis=-1,
+        zi=(decay * seed)[..., np.newaxis],
+    )
+
+    return np.concatenate([seed[..., np.newaxis], variance], axis=-1)
+
+
+def parkinson(prices, window):
+    log_high_low = np.log(prices["High"] / prices["Low"])[..., 1:]
+
+    return _rolling_mean(log_high_low ** 2, window) / (4 * np.log(2))
+
+
+def garman_klass(prices, window):
+    log_high_low = np.log(prices["High"] / prices["Low"])[..., 1:]
+    log_close_open = np.log(prices["Close"] / prices["Open"])[..., 1:]
+
+    return _rolling_mean(
+        0.5 * log_high_low ** 2 - (2 * np.log(2) - 1) * log_close_open ** 2, window
+    )
+
+
+def yang_zhang(prices, window):
+    open_, high, low, close = (
+        prices["Open"][..., 1:],
+        prices["High"][..., 1:],
+        prices["Low"][..., 1:],
+        prices["Close"][..., 1:],
+    )
+
+    overnight = np.log(open_ / prices["Close"][..., :-1])
+    open_to_close = np.log(close / open_)
+    rogers_satchell = np.log(high / close) * np.log(high / open_) + np.log(
+        low / close
+    ) * np.log(low / open_)
+
+    k = 0.34 / (1.34 + (window + 1) / (window - 1))
+
+    return (
+        _rolling_variance(overnight, window)
+        + k * _rolling_variance(open_to_close, window)
+        + (1 - k) * _rolling_mean(rogers_satchell, window)
+    )
+
+
+ESTIMATORS = {
+    "close_to_close": close_to_close,
+    "ewma": ewma,
+    "parkinson": parkinson,
+    "garman_klass": garman_klass,
+    "yang_zhang": yang_zhang,
+}
+
+
+def _as_arrays(prices):
+    return {
+        column: np.asarray(values, dtype=float)
+        for column, values in prices.items()
+        if column in ("Open", "High", "Low", "Close")
+    }
+
+
+def rolling_volatility(prices, window, estimator="close_to_close", annualize=False):
+    prices = _as_arrays(prices)
+
+    if window < 2 or window >= prices["Close"].shape[-1]:
+        raise ValueError(
+            "The window must be between 2 and the number of returns in the history"
+        )
+
+    volatility = np.sqrt(ESTIMATORS[estimator](prices, window))
+
+    return volatility * np.sqrt(TRADING_DAYS) if annualize else volatility
+
+
+def term_structure(prices, windows, estimator="close_to_close", annualize=False):
+    return np.stack(
+        [
+            rolling_volatility(prices, window, estimator, annualize)[..., -1]
+            for window in windows
+        ],
+        axis=-1,
+    )
@@ -0,0 +1,164 @@
+import concurrent.futures
+import os
+import threading
+
+from lib import metrics
+from lib.cache import SingleFlight, create_store
+from marketdata.sources import FakeSource, HTTPSource, YahooSource
+
+
+SOURCES = {"yahoo": YahooSource, "fake": FakeSource, "http": HTTPSource}
+
+
+class UpstreamTimeout(Exception):
+    pass
+
+
+class MarketDataService:
+    def __init__(
+        self, source, store, history_ttl=300, info_ttl=3600, concurrency=8, timeout=10
+    ):
+        self.source = source
+        self.store = store
+        self.history_ttl = history_ttl
+        self.info_ttl = info_ttl
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _cached(self, key, ttl, fetch):
+        value = self.store.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if value is not None:
+            return value
+
+        def load():
+            # Another request may have filled the cache while this one was
+            # waiting to become the leader
+            value = self.store.get(key)
+            if value is None:
+                value = fetch()
+                self.store.set(key, value, ttl)
+
+            return value
+
+        return self._flight.do(key, load)
+
+    def _upstream(self, kind, fetch, *args):
+        with metrics.span("market_data.{}".format(kind)):
+            return fetch(*args)
+
+    def history(self, ticker, period):
+        return self._cached(
+            "history:{}:{}".format(ticker, period),
+            self.history_ttl,
+            lambda: self._upstream("history", self.source.history, ticker, period),
+        )
+
+    def info(self, ticker):
+        return self._cached(
+            "info:{}".format(ticker),
+            self.info_ttl,
+            lambda: self._upstream("info", self.source.info, ticker),
+        )
+
+    def _submit(self, fn, *args):
+        # The pool is created on first use so that it is not inherited by
+        # forked gunicorn workers
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.concurrency
+                )
+
+        return self._executor.submit(metrics.propagate(fn), *args)
+
+    def fetch_all(self, calls):
+        # Runs (fn, *args) calls concurrently on at most concurrency threads.
+        # Waiting is bounded by the timeout, so a stuck upstream call fails
+        # the request instead of holding the worker; the call itself keeps
+        # running in the pool and still fills the cache when it returns.
+        futures = [self._submit(*call) for call in calls]
+        done, not_done = concurrent.futures.wait(futures, self.timeout)
+        if not_done:
+            raise UpstreamTimeout(
+                "Market data did not respond within {} seconds".format(self.timeout)
+            )
+
+        return futures
+
+    def fetch(self, fn, *args):
+        return self.fetch_all([(fn,) + args])[0].result()
+
+    def _quote(self, history, info):
+        last_close = history["Close"][-1]
+        dividend_rate = info.get("trailingAnnualDividendRate") or 0
+
+        return {"close": last_close, "dividendYield": dividend_rate / last_close}
+
+    def quote(self, ticker):
+        # History and info are independent round trips, so they overlap
+        history, info = self.fetch_all(
+            [(self.history, ticker, "1d"), (self.info, ticker)]
+        )
+
+        return self._quote(history.result(), info.result())
+
+    def quotes(self, tickers, period=None):
+        # The close comes from the last day of the requested history, so
+        # asking for the history costs no extra round trip
+        futures = self.fetch_all(
+            [(self.history, ticker, period or "1d") for ticker in tickers]
+            + [(self.info, ticker) for ticker in tickers]
+        )
+
+        quotes = {}
+        errors = {}
+        for ticker, history, info in zip(
+            tickers, futures[: len(tickers)], futures[len(tickers):]
+        ):
+            try:
+                quotes[ticker] = self._quote(history.result(), info.result())
+            except Exception as e:
+                errors[ticker] = str(e) or e.__class__.__name__
+                continue
+
+            if period is not None:
+                quotes[ticker]["history"] = {
+                    "Date": history.result()["Date"],
+                    "Close": history.result()["Close"],
+                }
+
+        return quotes, errors
+
+
+def from_environment(environ=os.environ):
+    name = environ.get("QUANTPRO_MARKET_DATA_SOURCE", "yahoo")
+    concurrency = int(environ.get("QUANTPRO_MARKET_DATA_CONCURRENCY", 8))
+    if name == "http":
+        source = HTTPSource(environ["QUANTPRO_MARKET_DATA_URL"], pool_size=concurrency)
+    else:
+        source = SOURCES[name]()
+
+    store = create_store(
+        environ.get("QUANTPRO_MARKET_DATA_CACHE"),
+        int(environ.get("QUANTPRO_MARKET_DATA_CACHE_SIZE", 1024)),
+    )
+
+    return MarketDataService(
+        source,
+        store,
+        history_ttl=int(environ.get("QUANTPRO_MARKET_DATA_HISTORY_TTL", 300)),
+        info_ttl=int(environ.get("QUANTPRO_MARKET_DATA_INFO_TTL", 3600)),
+        concurrency=concurrency,
+        timeout=float(environ.get("QUANTPRO_MARKET_DATA_TIMEOUT", 10)),
+    )
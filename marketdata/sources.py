@@ -0,0 +1,125 @@
+import datetime
+import re
+import threading
+import urllib.parse
+import zlib
+
+import numpy as np
+
+
+HISTORY_COLUMNS = ("Open", "High", "Low", "Close", "Volume", "Dividends")
+
+
+class YahooSource:
+    def history(self, ticker, period):
+        import yfinance as yf
+
+        hist = yf.Ticker(ticker).history(period=period)
+
+        data = {column: hist[column].tolist() for column in HISTORY_COLUMNS if column in hist}
+        data["Date"] = [date.isoformat() for date in hist.index]
+
+        return data
+
+    def info(self, ticker):
+        import yfinance as yf
+
+        return {
+            key: value
+            for key, value in yf.Ticker(ticker).info.items()
+            if isinstance(value, (str, int, float, bool)) or value is None
+        }
+
+
+class HTTPSource:
+    # Reads from a market data service serving /history/<ticker>?period=...
+    # and /info/<ticker> as JSON, such as marketdata.stub. A single session
+    # keeps a pool of connections open to it.
+    def __init__(self, base_url, timeout=10, pool_size=8):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._session = None
+        self._lock = threading.Lock()
+
+    def _get(self, path, **params):
+        import requests
+
+        with self._lock:
+            if self._session is None:
+                adapter = requests.adapters.HTTPAdapter(pool_maxsize=self.pool_size)
+                self._session = requests.Session()
+                self._session.mount("http://", adapter)
+                self._session.mount("https://", adapter)
+
+        response = self._session.get(self.base_url + path, params=params, timeout=self.timeout)
+        response.raise_for_status()
+
+        return response.json()
+
+    def history(self, ticker, period):
+        return self._get("/history/" + urllib.parse.quote(ticker, safe=""), period=period)
+
+    def info(self, ticker):
+        return self._get("/info/" + urllib.parse.quote(ticker, safe=""))
+
+
+def _period_days(period):
+    match = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+    if match is None:
+        raise ValueError("Unsupported period: {}".format(period))
+
+    count, unit = int(match.group(1)), match.group(2)
+
+    return count * {"d": 1, "wk": 5, "mo": 21, "y": 252}[unit]
+
+
+class FakeSource:
+    def __init__(self, start_price=100.0, volatility=0.3, dividend_yield=0.01, today=None):
+        self.start_price = start_price
+        self.volatility = volatility
+        self.dividend_yield = dividend_yield
+        self.today = today or datetime.date(2021, 1, 29)
+
+    def _rng(self, ticker):
+        return np.random.default_rng(zlib.crc32(ticker.encode("utf-8")))
+
+    def history(self, ticker, period):
+        # Every period is a suffix of the same deterministic series, so the
+        # fake data stays consistent across requests for one ticker
+        size = 10 * 252
+        days = min(_period_days(period), size)
+        rng = self._rng(ticker)
+        daily_sigma = self.volatility / np.sqrt(252)
+
+        overnight = rng.normal(-daily_sigma ** 2 / 8, daily_sigma / 2, size=size)
+        intraday = rng.normal(-daily_sigma ** 2 * 3 / 8, daily_sigma * np.sqrt(3) / 2, size=size)
+
+        close = self.start_price * np.exp(np.cumsum(overnight + intraday))
+        open_ = close * np.exp(-intraday)
+        high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, daily_sigma / 4, size=size)))
+        low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, daily_sigma / 4, size=size)))
+        volume = rng.integers(10 ** 5, 10 ** 7, size=size)
+
+        dates = np.busday_offset(np.datetime64(self.today), np.arange(-size + 1, 1), roll="backward")
+
+        data = {
+            "Open": open_[-days:].tolist(),
+            "High": high[-days:].tolist(),
+            "Low": low[-days:].tolist(),
+            "Close": close[-days:].tolist(),
+            "Volume": volume[-days:].tolist(),
+            "Dividends": [0.0] * days,
+        }
+        data["Date"] = [str(date) for date in dates[-days:]]
+
+        return data
+
+    def info(self, ticker):
+        last_close = self.history(ticker, "1d")["Close"][-1]
+
+        return {
+            "symbol": ticker,
+            "currency": "USD",
+            "trailingAnnualDividendRate": self.dividend_yield * last_close,
+        }
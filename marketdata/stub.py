@@ -0,0 +1,82 @@
+import argparse
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from marketdata.sources import FakeSource
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 lets clients keep their connections open between requests
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        parts = [urllib.parse.unquote(part) for part in url.path.strip("/").split("/")]
+        params = urllib.parse.parse_qs(url.query)
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        try:
+            if len(parts) == 2 and parts[0] == "history":
+                body = self.server.source.history(parts[1], params.get("period", ["1mo"])[0])
+            elif len(parts) == 2 and parts[0] == "info":
+                body = self.server.source.info(parts[1])
+            else:
+                return self._send(404, {"message": "Not found"})
+        except ValueError as e:
+            return self._send(400, {"message": str(e)})
+
+        self._send(200, body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    # Serves a source over HTTP for HTTPSource, with optional latency to
+    # mimic a remote provider in tests and offline development
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), source=None, latency=0):
+        super().__init__(address, StubHandler)
+        self.source = source or FakeSource()
+        self.latency = latency
+
+    @property
+    def url(self):
+        return "http://{}:{}".format(*self.server_address[:2])
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve fake market data over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0, help="seconds added to every response")
+
+    args = parser.parse_args()
+
+    server = StubServer((args.host, args.port), latency=args.latency)
+    print("Serving fake market data on {}".format(server.url))
+    server.serve_forever()
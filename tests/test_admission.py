@@ -0,0 +1,139 @@
+import sqlite3
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from lib import admission, cost
+from lib.cost import Cost
+
+
+def test_check_limits():
+    controller = admission.AdmissionController(max_work=1000, max_memory=2 ** 20)
+
+    assert controller.check(Cost(1000, 2 ** 20)) is None
+    assert "path steps" in controller.check(Cost(1001, 0))
+    assert "MB" in controller.check(Cost(0, 2 ** 21))
+
+
+def test_synchronous_requests_fit_the_worker_timeout():
+    controller = admission.from_environment({"QUANTPRO_WORKER_TIMEOUT": "30"})
+
+    # Half of the worker timeout at 30ns per path step
+    assert 5 * 10 ** 8 == pytest.approx(controller.max_sync_work)
+    assert "outside a job" in controller.check(Cost(10 ** 9, 0))
+    assert controller.check(Cost(10 ** 9, 0), job=True) is None
+
+
+def test_cost_model():
+    assert cost.monte_carlo(2000).work == 2 * cost.monte_carlo(1000).work
+    assert cost.monte_carlo(10 ** 6, "pathwise").work < cost.monte_carlo(10 ** 6, "fdm").work
+    assert cost.monte_carlo(10 ** 6, variance_reduction_method="control_variate").work == cost.monte_carlo(10 ** 6 + 2 ** 16).work
+    assert cost.monte_carlo(3 * 2 ** 16 + 100).memory < cost.monte_carlo(
+        3 * 2 ** 16 + 100, variance_reduction_method="sobol"
+    ).memory
+
+    # Path-dependent paths are streamed, so memory is bounded
+    assert cost.path_dependent(10 ** 7, 10 ** 4).memory == cost.path_dependent(10 ** 5, 10 ** 3).memory
+    assert 10 ** 11 == cost.path_dependent(10 ** 7, 10 ** 4).work
+    assert (10 ** 5 + 2 ** 14) * 10 ** 3 == cost.path_dependent(10 ** 5, 10 ** 3, control_variate=True).work
+
+
+def test_admit_tracks_work_in_flight():
+    controller = admission.AdmissionController(budget=100)
+
+    with controller.admit("test", [(Cost(60, 0), "full")]) as value:
+        assert "full" == value
+        assert 60 == controller.in_flight
+
+    assert 0 == controller.in_flight
+    assert 1 == controller.outcomes["test", "admitted"]
+
+
+def test_admit_downgrades_and_rejects():
+    controller = admission.AdmissionController(budget=100, timeout=0.01)
+    options = [(Cost(60, 0), "full"), (Cost(30, 0), "half"), (Cost(20, 0), "tenth")]
+
+    with controller.admit("test", [(Cost(60, 0), None)]):
+        with controller.admit("test", options) as value:
+            assert "half" == value
+
+            with pytest.raises(admission.Overloaded) as e:
+                with controller.admit("test", options):
+                    pass
+
+    assert 1 == e.value.retry_after
+    assert 1 == controller.outcomes["test", "downgraded"]
+    assert 1 == controller.outcomes["test", "rejected"]
+    assert 0 == controller.in_flight
+
+
+def test_admit_queues_until_released():
+    controller = admission.AdmissionController(budget=100, timeout=10)
+    running = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with controller.admit("test", [(Cost(100, 0), None)]):
+            running.set()
+            release.wait(10)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    running.wait(10)
+
+    threading.Timer(0.05, release.set).start()
+    with controller.admit("test", [(Cost(50, 0), "full"), (Cost(10, 0), "tenth")]) as value:
+        assert "full" == value
+
+    thread.join()
+    assert 1 == controller.outcomes["test", "queued"]
+
+
+def test_endpoint_concurrency():
+    controller = admission.AdmissionController(concurrency=1, timeout=0.01)
+
+    with controller.admit("slow", [(Cost(1, 0), None)]):
+        with pytest.raises(admission.Overloaded):
+            with controller.admit("slow", [(Cost(1, 0), None)]):
+                pass
+
+        with controller.admit("other", [(Cost(1, 0), None)]):
+            pass
+
+
+def test_sqlite_ledger_shares_the_budget(tmp_path):
+    path = str(tmp_path / "admission.db")
+    first = admission.from_environment({"QUANTPRO_ADMISSION_STORE": path})
+    second = admission.from_environment({"QUANTPRO_ADMISSION_STORE": path})
+    first.budget = second.budget = 100
+    second.timeout = 0.01
+
+    with first.admit("test", [(Cost(60, 0), None)]):
+        assert 60 == second.in_flight
+
+        with pytest.raises(admission.Overloaded):
+            with second.admit("test", [(Cost(60, 0), None)]):
+                pass
+
+        with second.admit("test", [(Cost(60, 0), "full"), (Cost(30, 0), "half")]) as value:
+            assert "half" == value
+            assert 90 == first.in_flight
+
+    assert 0 == second.in_flight
+
+
+def test_sqlite_ledger_drops_leases_of_dead_processes(tmp_path):
+    ledger = admission.SQLiteLedger(str(tmp_path / "admission.db"))
+
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    with sqlite3.connect(ledger.path) as connection:
+        connection.execute(
+            "INSERT INTO leases (pid, endpoint, work) VALUES (?, 'test', 100)", (process.pid,)
+        )
+
+    assert 100 == ledger.in_flight()
+    assert ledger.acquire("test", 60, 100, 4) is not None
+    assert 60 == ledger.in_flight()
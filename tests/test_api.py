@@ -1,16 +1,28 @@
+import gzip
 import os
+import subprocess
+import sys
 import tempfile
 
+import numpy as np
 import pytest
 import json
 
 from flaskr import quantpro
+from lib import admission
+from lib.cost import Cost
+from lib.surface import Surface
 
 @pytest.fixture
-def client():
-    quantpro.server.config['TESTING'] = True
+def app():
+    app = quantpro.create_app({"QUANTPRO_MARKET_DATA_SOURCE": "fake", "QUANTPRO_JOB_STORE": "memory", "QUANTPRO_ADMISSION_STORE": "memory"})
+    app.config['TESTING'] = True
 
-    with quantpro.server.test_client() as client:
+    return app
+
+@pytest.fixture
+def client(app):
+    with app.test_client() as client:
         yield client
 
 def test_black_scholes_bad_request_1(client):
@@ -56,6 +68,7 @@ def test_black_scholes_request(client):
                         "dividendYield": 0.56})
 
     assert set(("call", "put", "plot_data")) == set(rv.get_json().keys())
+    assert set(("price", "delta", "gamma", "theta", "vega", "rho", "vanna", "volga", "charm")) == set(rv.get_json()["call"])
 
 def test_monte_carlo_bad_request(client):
     rv = client.post('/option/calculator/monte-carlo', 
@@ -98,3 +111,604 @@ def test_monte_carlo_request(client):
     assert "message" not in data
 
     assert set(("call", "put", "plot_data")) == set(data.keys())
+
+def test_monte_carlo_request_pathwise_greeks(client):
+    rv = client.post('/option/calculator/monte-carlo', 
+                     data = {
+                        "strikePrice" : 160.2,
+                        "volatility" : 0.75,
+                        "interestRate" : 5,
+                        "underlyingPrice": 148.19,
+                        "tenor": 1,
+                        "dividendYield": 0.56,
+                        "deltaPrice": 0.001, 
+                        "numSimulations": 1000,
+                        "timeSteps": 10,
+                        "deltaInterestRate": 0.001,
+                        "deltaVolatility": 0.001,
+                        "greeksMethod": "pathwise",
+                        "varianceReduction": "antithetic"})
+
+    data = rv.get_json()
+
+    assert "message" not in data
+
+    assert set(("price", "standardError", "delta", "gamma", "theta", "vega", "rho")) == set(data["call"].keys())
+
+def test_batch_black_scholes_request(client):
+    rv = client.post('/option/calculator/batch',
+                     json = {
+                        "optionType": ["call", "put", "call"],
+                        "underlyingPrice": 148.19,
+                        "strikePrice": [140, 150, 160.2],
+                        "volatility": 45,
+                        "interestRate": 5,
+                        "tenor": [0.25, 0.5, 1],
+                        "dividendYield": 0.56})
+
+    data = rv.get_json()
+
+    assert "200 OK" == rv.status
+
+    assert set(("price", "delta", "gamma", "theta", "vega", "rho")) == set(data.keys())
+    assert all(3 == len(column) for column in data.values())
+
+    single = client.post('/option/calculator/black-scholes',
+                         data = {
+                            "strikePrice" : 150,
+                            "volatility" : 45,
+                            "interestRate" : 5,
+                            "underlyingPrice": 148.19,
+                            "tenor": 0.5,
+                            "dividendYield": 0.56}).get_json()
+
+    assert pytest.approx(single["put"]["price"]) == data["price"][1]
+    assert pytest.approx(single["put"]["delta"]) == data["delta"][1]
+
+def test_batch_monte_carlo_request(client):
+    rv = client.post('/option/calculator/batch',
+                     json = {
+                        "method": "monte-carlo",
+                        "optionType": ["call", "put"],
+                        "underlyingPrice": 148.19,
+                        "strikePrice": [140, 150],
+                        "volatility": 45,
+                        "interestRate": 5,
+                        "tenor": 1,
+                        "dividendYield": 0.56,
+                        "numSimulations": 1000})
+
+    data = rv.get_json()
+
+    assert "200 OK" == rv.status
+    assert 2 == len(data["price"])
+
+def test_batch_methods_agree(client):
+    contracts = {
+        "optionType": ["call", "put"],
+        "underlyingPrice": 148.19,
+        "strikePrice": 160.2,
+        "volatility": 45,
+        "interestRate": 5,
+        "tenor": 1,
+        "dividendYield": 0.56,
+        "numSimulations": 400000}
+
+    np.random.seed(42)
+    exact = client.post('/option/calculator/batch', json = contracts).get_json()
+    simulated = client.post('/option/calculator/batch', json = dict(contracts, method = "monte-carlo")).get_json()
+
+    # Both methods quote theta per calendar day and vega and rho per 1%
+    for greek in ("price", "delta", "gamma", "theta", "vega", "rho"):
+        assert pytest.approx(exact[greek], rel = 0.03, abs = 1e-3) == simulated[greek]
+
+def test_batch_bad_request(client):
+    rv = client.post('/option/calculator/batch',
+                     json = {
+                        "optionType": ["call", "straddle"],
+                        "underlyingPrice": 148.19,
+                        "strikePrice": [140, 150, 160],
+                        "volatility": 45,
+                        "interestRate": 5,
+                        "tenor": 1,
+                        "dividendYield": 0.56})
+
+    assert "400 BAD REQUEST" == rv.status
+    assert set(["optionType"]) == set(rv.get_json()["message"].keys())
+
+    rv = client.post('/option/calculator/batch',
+                     json = {
+                        "optionType": ["call", "put"],
+                        "underlyingPrice": 148.19,
+                        "strikePrice": [140, 150, 160],
+                        "volatility": 45,
+                        "interestRate": 5,
+                        "tenor": 1,
+                        "dividendYield": 0.56})
+
+    assert "400 BAD REQUEST" == rv.status
+    assert set(["optionType"]) == set(rv.get_json()["message"].keys())
+
+def test_ticker_data(client):
+    data = client.get('/symbol/AAPL').get_json()
+
+    assert set(("close", "dividendYield")) == set(data.keys())
+    assert pytest.approx(0.01) == data["dividendYield"]
+
+def test_volatility(client):
+    data = client.get('/symbol/volatility/AAPL').get_json()
+
+    assert data["volatility"] > 0
+
+def test_volatility_term_structure(client):
+    rv = client.get('/symbol/volatility/AAPL?estimator=parkinson&window=10&windows=5&windows=20&annualize=true')
+
+    data = rv.get_json()
+
+    assert "200 OK" == rv.status
+    assert "parkinson" == data["estimator"]
+    assert [5, 20] == [point["window"] for point in data["termStructure"]]
+
+    rv = client.get('/symbol/volatility/AAPL?estimator=unknown')
+
+    assert "400 BAD REQUEST" == rv.status
+
+def test_implied_volatility_request(client):
+    quotes = client.post('/option/calculator/batch',
+                         json = {
+                            "optionType": ["call", "put"],
+                            "underlyingPrice": 148.19,
+                            "strikePrice": [140, 160.2],
+                            "volatility": [30, 45],
+                            "interestRate": 5,
+                            "tenor": 1,
+                            "dividendYield": 0.56}).get_json()
+
+    rv = client.post('/option/calculator/implied-volatility',
+                     json = {
+                        "optionType": ["call", "put", "call"],
+                        "optionPrice": quotes["price"] + [200],
+                        "underlyingPrice": 148.19,
+                        "strikePrice": [140, 160.2, 140],
+                        "interestRate": 5,
+                        "tenor": 1,
+                        "dividendYield": 0.56})
+
+    data = rv.get_json()
+
+    assert "200 OK" == rv.status
+    assert pytest.approx([30, 45]) == data["volatility"][:2]
+    assert data["volatility"][2] is None
+
+def test_all_tickers_etag_and_gzip(client):
+    rv = client.get('/symbols', headers={"Accept-Encoding": "gzip"})
+
+    assert "200 OK" == rv.status
+    assert "gzip" == rv.headers["Content-Encoding"]
+    assert json.loads(gzip.decompress(rv.data))
+
+    etag = rv.headers["ETag"]
+
+    rv = client.get('/symbols', headers={"If-None-Match": etag})
+
+    assert 304 == rv.status_code
+
+def test_ticker_search(client):
+    data = client.get('/symbols/search?q=apple&pageSize=5').get_json()
+
+    assert "AAPL" in [ticker["symbol"] for ticker in data["results"]]
+    assert 5 >= len(data["results"])
+    assert data["total"] >= len(data["results"])
+
+def test_monte_carlo_adaptive_request(client):
+    rv = client.post('/option/calculator/monte-carlo',
+                     data = {
+                        "strikePrice" : 160.2,
+                        "volatility" : 45,
+                        "interestRate" : 5,
+                        "underlyingPrice": 148.19,
+                        "tenor": 1,
+                        "dividendYield": 0.56,
+                        "deltaPrice": 0.5,
+                        "numSimulations": 1000000,
+                        "timeSteps": 10,
+                        "deltaInterestRate": 0.001,
+                        "deltaVolatility": 0.001,
+                        "targetError": 0.5})
+
+    data = rv.get_json()
+
+    assert "200 OK" == rv.status
+    assert data["simulations"] < 1000000
+    assert 1.96 * data["call"]["standardError"] <= 0.5
+
+def test_monte_carlo_seed_is_reproducible(client):
+    request = {
+        "strikePrice" : 160.2,
+        "volatility" : 45,
+        "interestRate" : 5,
+        "underlyingPrice": 148.19,
+        "tenor": 1,
+        "dividendYield": 0.56,
+        "deltaPrice": 0.5,
+        "numSimulations": 5000,
+        "timeSteps": 10,
+        "deltaInterestRate": 0.001,
+        "deltaVolatility": 0.001,
+        "seed": 7}
+
+    first = client.post('/option/calculator/monte-carlo', data = request).get_json()
+    second = client.post('/option/calculator/monte-carlo', data = request).get_json()
+
+    assert first == second
+
+def test_black_scholes_results_are_cached(client):
+    request = {
+        "strikePrice" : 160.2,
+        "volatility" : 0.75,
+        "interestRate" : 5,
+        "underlyingPrice": 148.19,
+        "tenor": 1,
+        "dividendYield": 0.56}
+
+    first = client.post('/option/calculator/black-scholes', data = request).get_json()
+    second = client.post('/option/calculator/black-scholes', data = dict(request, interestRate="5.0")).get_json()
+
+    assert first == second
+    assert 1 == client.application.extensions["quantpro"].results.hits
+    assert 1 == client.application.extensions["quantpro"].results.misses
+
+def test_monte_carlo_request_msgpack(client):
+    msgpack = pytest.importorskip("msgpack")
+
+    rv = client.post('/option/calculator/monte-carlo',
+                     headers = {"Accept": "application/msgpack"},
+                     data = {
+                        "strikePrice" : 160.2,
+                        "volatility" : 45,
+                        "interestRate" : 5,
+                        "underlyingPrice": 148.19,
+                        "tenor": 1,
+                        "dividendYield": 0.56,
+                        "deltaPrice": 0.5,
+                        "numSimulations": 50000,
+                        "timeSteps": 10,
+                        "deltaInterestRate": 0.001,
+                        "deltaVolatility": 0.001})
+
+    assert "application/msgpack" == rv.headers["Content-Type"]
+
+    data = msgpack.unpackb(rv.data)
+
+    assert 101 == len(data["plot_data"]["price"])
+
+def test_compressed_response(client):
+    rv = client.post('/option/calculator/black-scholes',
+                     headers = {"Accept-Encoding": "gzip"},
+                     data = {
+                        "strikePrice" : 160.2,
+                        "volatility" : 45,
+                        "interestRate" : 5,
+                        "underlyingPrice": 148.19,
+                        "tenor": 1,
+                        "dividendYield": 0.56})
+
+    assert "gzip" == rv.headers["Content-Encoding"]
+    assert "Accept-Encoding" in rv.headers["Vary"]
+
+    data = json.loads(gzip.decompress(rv.data))
+
+    assert pytest.approx(24.2413, 1e-4) == data["call"]["price"]
+
+def test_profile_and_metrics(client):
+    rv = client.post('/option/calculator/black-scholes?profile=1',
+                     data = {
+                        "strikePrice" : 160.2,
+                        "volatility" : 45,
+                        "interestRate" : 5,
+                        "underlyingPrice": 148.19,
+                        "tenor": 1,
+                        "dividendYield": 0.56})
+
+    data = json.loads(rv.data.decode("utf-8"))
+
+    assert {"black_scholes.kernel", "black_scholes.plot"} == set(data["profile"]["spans"])
+    assert data["profile"]["peakMemory"] > 0
+    assert "serialize;dur=" in rv.headers["Server-Timing"]
+
+    rv = client.get('/metrics')
+    text = rv.data.decode("utf-8")
+
+    assert 'quantpro_span_seconds_count{span="black_scholes.kernel"}' in text
+    assert 'quantpro_request_seconds_count{endpoint="/option/calculator/black-scholes",method="POST",status="200"}' in text
+    assert "quantpro_result_cache_misses_total 1" in text
+
+def test_quotes_request(client):
+    rv = client.get('/symbols/quotes?tickers=aapl,MSFT&tickers=AAPL&period=5d')
+
+    data = json.loads(rv.data.decode("utf-8"))
+
+    assert {"AAPL", "MSFT"} == set(data["quotes"])
+    assert 5 == len(data["quotes"]["AAPL"]["history"]["Close"])
+    assert {} == data["errors"]
+
+    rv = client.get('/symbols/quotes?tickers=,')
+
+    assert 400 == rv.status_code
+
+def test_pricing_surface(client):
+    grid = "underlyingPrice=148.19&strikePrice=160.2&interestRate=5&dividendYield=0.56&spotPoints=21&volatilityPoints=11&tenorPoints=9"
+
+    rv = client.get('/option/calculator/surface?' + grid)
+
+    assert "application/octet-stream" == rv.headers["Content-Type"]
+    assert (21, 11, 9, 12) == Surface.from_bytes(rv.data).values.shape
+    assert 304 == client.get('/option/calculator/surface?' + grid, headers={"If-None-Match": rv.headers["ETag"]}).status_code
+
+    rv = client.get('/option/calculator/surface/query?' + grid + "&spot=150&spot=500&volatility=45&tenor=1")
+    data = json.loads(rv.data.decode("utf-8"))
+
+    single = client.post('/option/calculator/black-scholes',
+                         data = {
+                            "strikePrice" : 160.2,
+                            "volatility" : 45,
+                            "interestRate" : 5,
+                            "underlyingPrice": 150,
+                            "tenor": 1,
+                            "dividendYield": 0.56}).get_json()
+
+    assert pytest.approx(single["call"]["price"], abs=data["errorEstimate"]["call_price"]) == data["call"]["price"][0]
+    assert data["call"]["price"][1] is None
+
+    rv = client.get('/option/calculator/surface?' + grid + "&minTenor=3")
+
+    assert 400 == rv.status_code
+
+def test_app_factory_and_warm_up():
+    # Heavy modules are only imported when first used, or by warm_up
+    code = (
+        "import sys; from flaskr import quantpro; "
+        "lazy = ('scipy.stats', 'scipy.signal', 'scipy.interpolate', 'yfinance'); "
+        "assert not [m for m in lazy if m in sys.modules]; "
+        "quantpro.warm_up(); "
+        "assert quantpro.tickersdb.TickersDatabase.all_tickers; "
+        "assert 'scipy.stats' in sys.modules"
+    )
+
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=os.path.dirname(os.path.dirname(__file__)))
+
+    # Every app has services of its own and leaves the others alone
+    server = quantpro.server.extensions["quantpro"]
+    environ = {"QUANTPRO_MARKET_DATA_SOURCE": "fake", "QUANTPRO_JOB_STORE": "memory", "QUANTPRO_ADMISSION_STORE": "memory"}
+    first, second = quantpro.create_app(environ), quantpro.create_app(environ)
+
+    assert first.extensions["quantpro"] is not second.extensions["quantpro"]
+    assert server is quantpro.server.extensions["quantpro"]
+    assert 200 == first.test_client().get('/symbol/AAPL').status_code
+
+    # Jobs are kept in the app's instance folder rather than a shared location
+    assert os.path.join(quantpro.server.instance_path, "jobs.db") == quantpro.server.extensions["quantpro"].job_queue.store.path
+
+def test_path_dependent_request(client):
+    data = {
+        "payoff": "barrier",
+        "optionType": "call",
+        "strikePrice": 160.2,
+        "barrier": 200,
+        "barrierType": "up-and-out",
+        "volatility": 45,
+        "interestRate": 5,
+        "underlyingPrice": 148.19,
+        "tenor": 1,
+        "dividendYield": 0.56,
+        "timeSteps": 100,
+        "numSimulations": 10000,
+        "seed": 42}
+
+    rv = client.post('/option/calculator/path-dependent', data = data)
+    result = json.loads(rv.data.decode("utf-8"))
+
+    assert 0 < result["price"] < result["europeanPrice"]
+    assert result["standardError"] > 0
+
+    single = client.post('/option/calculator/path-dependent', data = dict(data, precision = "single")).get_json()
+    assert abs(single["price"] - result["price"]) < 4 * result["standardError"]
+
+    del data["barrierType"]
+    rv = client.post('/option/calculator/path-dependent', data = data)
+
+    assert 400 == rv.status_code
+
+def test_path_dependent_job(client):
+    data = {
+        "payoff": "asian",
+        "optionType": "call",
+        "strikePrice": 160.2,
+        "volatility": 45,
+        "interestRate": 5,
+        "underlyingPrice": 148.19,
+        "tenor": 1,
+        "dividendYield": 0.56,
+        "timeSteps": 50,
+        "numSimulations": 10000,
+        "seed": 42}
+
+    rv = client.post('/jobs/path-dependent', data = data)
+    job = rv.get_json()
+
+    assert 202 == rv.status_code
+    assert rv.headers["Location"].endswith("/jobs/" + job["id"])
+
+    events = client.get('/jobs/{}/events'.format(job["id"])).get_data(as_text=True)
+    assert "event: succeeded" in events
+
+    job = client.get('/jobs/' + job["id"]).get_json()
+    expected = client.post('/option/calculator/path-dependent', data = data).get_json()
+
+    assert "succeeded" == job["status"]
+    assert 1.0 == job["progress"]
+    assert expected == job["result"]
+
+def test_job_errors(client):
+    assert 404 == client.post('/jobs/black-scholes', data = {}).status_code
+    assert 400 == client.post('/jobs/monte-carlo', data = {"volatility": 45}).status_code
+    assert 404 == client.get('/jobs/missing').status_code
+    assert 404 == client.delete('/jobs/missing').status_code
+
+def _monte_carlo_request(**overrides):
+    return {
+        "strikePrice": 160.2,
+        "volatility": 45,
+        "interestRate": 5,
+        "underlyingPrice": 148.19,
+        "tenor": 1,
+        "dividendYield": 0.56,
+        "timeSteps": 100,
+        "numSimulations": 10000,
+        "deltaPrice": 0.5,
+        "deltaVolatility": 0.01,
+        "deltaInterestRate": 0.001,
+        "seed": 42,
+        **overrides}
+
+@pytest.mark.parametrize("method,minimum", [("none", 2), ("antithetic", 4), ("control_variate", 2), ("sobol", 16)])
+def test_monte_carlo_rejects_too_few_simulations(client, method, minimum):
+    rv = client.post('/option/calculator/monte-carlo', data = _monte_carlo_request(numSimulations = minimum - 1, varianceReduction = method))
+
+    assert 400 == rv.status_code
+    assert "numSimulations" in rv.get_json()["message"]
+
+    rv = client.post('/option/calculator/monte-carlo', data = _monte_carlo_request(numSimulations = minimum, varianceReduction = method))
+
+    assert 200 == rv.status_code
+    assert rv.get_json()["call"]["standardError"] is not None
+
+def test_admission_rejects_oversized_requests(client):
+    rv = client.post('/option/calculator/monte-carlo', data = _monte_carlo_request(numSimulations = 10 ** 9))
+
+    assert 400 == rv.status_code
+    assert "numSimulations" in rv.get_json()["message"]
+
+    rv = client.post('/jobs/path-dependent', data = {
+        "payoff": "lookback",
+        "optionType": "call",
+        "volatility": 45,
+        "interestRate": 5,
+        "underlyingPrice": 148.19,
+        "tenor": 1,
+        "dividendYield": 0.56,
+        "timeSteps": 10000,
+        "numSimulations": 10000000})
+
+    assert 400 == rv.status_code
+
+def test_long_requests_must_be_jobs(app, client, monkeypatch):
+    controller = admission.AdmissionController(max_work=10 ** 6, max_sync_work=10 ** 5)
+    monkeypatch.setattr(app.extensions["quantpro"], "admission_control", controller)
+
+    data = {
+        "payoff": "lookback",
+        "optionType": "call",
+        "volatility": 45,
+        "interestRate": 5,
+        "underlyingPrice": 148.19,
+        "tenor": 1,
+        "dividendYield": 0.56,
+        "timeSteps": 100,
+        "numSimulations": 5000}
+
+    rv = client.post('/option/calculator/path-dependent', data = data)
+
+    assert 400 == rv.status_code
+    assert "outside a job" in rv.get_json()["message"]["numSimulations"]
+    assert 202 == client.post('/jobs/path-dependent', data = data).status_code
+
+def test_admission_downgrades_and_rejects(app, client, monkeypatch):
+    controller = admission.AdmissionController(budget=100000, timeout=0.01)
+    monkeypatch.setattr(app.extensions["quantpro"], "admission_control", controller)
+
+    # fdm costs 12 path steps per path and the control variate adds as
+    # many pilot paths, so only a quarter of the paths fit
+    with controller.admit("test", [(Cost(40000, 0), None)]):
+        result = client.post('/option/calculator/monte-carlo', data = _monte_carlo_request()).get_json()
+
+    assert {"numSimulations": 2500, "varianceReduction": "control_variate"} == result["downgrade"]
+    assert result["call"]["price"] > 0
+
+    with controller.admit("test", [(Cost(99000, 0), None)]):
+        rv = client.post('/option/calculator/monte-carlo', data = _monte_carlo_request())
+
+    assert 429 == rv.status_code
+    assert "1" == rv.headers["Retry-After"]
+    assert "message" in rv.get_json()
+
+    result = client.post('/option/calculator/monte-carlo', data = _monte_carlo_request()).get_json()
+    assert "downgrade" not in result
+
+def test_cached_results_skip_admission(app, client, monkeypatch):
+    controller = admission.AdmissionController(budget=100000, timeout=0.01)
+    monkeypatch.setattr(app.extensions["quantpro"], "admission_control", controller)
+
+    expected = client.post('/option/calculator/monte-carlo', data = _monte_carlo_request()).get_json()
+
+    with controller.admit("test", [(Cost(100000, 0), None)]):
+        rv = client.post('/option/calculator/monte-carlo', data = _monte_carlo_request())
+
+    assert 200 == rv.status_code
+    assert expected == rv.get_json()
+    assert 0 == controller.outcomes["monte-carlo", "rejected"]
+
+def test_portfolio_risk(client):
+    book = {
+        "optionType": ["call", "put", "call"],
+        "underlying": ["AAPL", "AAPL", "MSFT"],
+        "underlyingPrice": [148.19, 148.19, 300],
+        "strikePrice": [160.2, 140, 310],
+        "volatility": 45,
+        "interestRate": 5,
+        "tenor": [1, 0.5, 0.25],
+        "dividendYield": 0.56,
+        "quantity": [10, -5, 3]}
+
+    rv = client.post('/portfolio/risk', json = book)
+    data = rv.get_json()
+
+    assert 200 == rv.status_code
+    assert ["AAPL", "MSFT"] == sorted(data["underlyings"])
+    assert 21 == len(data["spotShocks"]) == len(data["total"]["pnl"])
+    assert 11 == len(data["total"]["pnl"][0])
+    assert [0] == data["rateShocks"]
+    assert 0 == pytest.approx(data["total"]["pnl"][10][5][0], abs=1e-9)
+
+    rv = client.post('/portfolio/risk', json = dict(book, volatilityShocks = [-50, 0], spotShocks = [-100]))
+
+    assert 400 == rv.status_code
+    assert {"volatilityShocks", "spotShocks"} == set(rv.get_json()["message"])
+
+def test_portfolio_risk_is_costed(app, client, monkeypatch):
+    book = {
+        "optionType": "call",
+        "underlying": "AAPL",
+        "underlyingPrice": 148.19,
+        "strikePrice": 160.2,
+        "volatility": 45,
+        "interestRate": 5,
+        "tenor": 1,
+        "dividendYield": 0.56,
+        "quantity": [1] * 1000}
+
+    # A thousand positions over the default 21x11 grid keep about 46MB
+    monkeypatch.setattr(app.extensions["quantpro"], "admission_control", admission.AdmissionController(max_memory=32 * 2 ** 20))
+    rv = client.post('/portfolio/risk', json = book)
+
+    assert 400 == rv.status_code
+    assert "MB" in rv.get_json()["message"]["spotShocks"]
+
+    controller = admission.AdmissionController(budget=10 ** 6, timeout=0.01)
+    monkeypatch.setattr(app.extensions["quantpro"], "admission_control", controller)
+
+    with controller.admit("test", [(Cost(10 ** 6, 0), None)]):
+        rv = client.post('/portfolio/risk', json = book)
+
+    assert 429 == rv.status_code
+    assert 200 == client.post('/portfolio/risk', json = book).status_code
@@ -0,0 +1,23 @@
+from benchmarks import harness, precision
+
+
+def test_measure():
+    result = harness.measure(lambda: sum(range(100)), repeat=3)
+
+    assert 3 == result["repeat"]
+    assert 0 < result["min"] <= result["median"]
+
+
+def test_compare_reports_regressions():
+    baseline = {"fast": {"median": 1.0}, "slow": {"median": 1.0}, "removed": {"median": 1.0}}
+    current = {"fast": {"median": 1.05}, "slow": {"median": 1.5}, "added": {"median": 9.0}}
+
+    assert [("slow", 1.0, 1.5, 1.5)] == harness.compare(baseline, current, threshold=0.1)
+
+
+def test_precision_report():
+    row = precision.compare(10, 1000, repeat=1)
+
+    assert 0.5 == row["memoryRatio"]
+    assert row["maxRelativeError"] < 1e-5
+    assert row["priceDifference"] < 1e-3 * row["standardError"]
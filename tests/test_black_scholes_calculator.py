@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 
 from lib import black_scholes_calculator
@@ -89,3 +90,74 @@ def test_greeks_calculation():
         tenor,
         dividend_yield,
     )
+
+
+def test_vectorized_call_put():
+    interest_rate = 0.05
+    strike_price = 160.2
+    dividend_yield = 0.0056
+    underlying_price = np.array([120.0, 148.19, 190.0])
+    volatility = np.array([[0.2], [0.45]])
+    tenor = 0.5
+
+    calls, puts = black_scholes_calculator.black_scholes_call_put(
+        volatility, underlying_price, strike_price, interest_rate, tenor, dividend_yield
+    )
+    call_greeks, put_greeks = black_scholes_calculator.greeks_call_put(
+        volatility, underlying_price, strike_price, interest_rate, tenor, dividend_yield
+    )
+
+    assert (2, 3) == calls.shape == puts.shape
+
+    for i, sigma in enumerate(volatility[:, 0]):
+        for j, S_0 in enumerate(underlying_price):
+            params = (sigma, S_0, strike_price, interest_rate, tenor, dividend_yield)
+
+            assert pytest.approx(black_scholes_calculator.black_scholes(OptionType.CALL, *params)) == calls[i, j]
+            assert pytest.approx(black_scholes_calculator.black_scholes(OptionType.PUT, *params)) == puts[i, j]
+            assert pytest.approx(black_scholes_calculator.greeks(OptionType.CALL, *params)) == [g[i, j] for g in call_greeks]
+            assert pytest.approx(black_scholes_calculator.greeks(OptionType.PUT, *params)) == [g[i, j] for g in put_greeks]
+
+    # Put-call parity holds element-wise
+    assert pytest.approx(
+        underlying_price * np.exp(-dividend_yield * tenor) - strike_price * np.exp(-interest_rate * tenor)
+    ) == (calls - puts)[0]
+
+
+def test_plot_options_columns():
+    plot = black_scholes_calculator.plot_options(0.45, 148.19, 160.2, 0.05, 1, 0.0056)
+
+    assert 201 == len(plot["price"]) == len(plot["call_price"]) == len(plot["put_price"])
+    assert pytest.approx(148.19 / 2) == plot["price"][0]
+    assert pytest.approx(
+        black_scholes_calculator.black_scholes(OptionType.PUT, 0.45, plot["price"][50], 160.2, 0.05, 1, 0.0056)
+    ) == plot["put_price"][50]
+
+
+@pytest.mark.parametrize("option_type", ["call", "put"])
+def test_kernel_second_order_greeks(option_type):
+    sigma = np.array([0.2, 0.45])
+    params = (148.19, 160.2, 0.05, 0.75, 0.0056)
+    h = 1e-5
+
+    def kernel(sigma=sigma, T=0.75):
+        S_0, K, r, _, q = params
+        call, put = black_scholes_calculator.kernel(sigma, S_0, K, r, T, q)
+
+        return call if option_type == "call" else put
+
+    result = kernel()
+    prices = black_scholes_calculator.black_scholes_call_put(sigma, *params)
+
+    assert pytest.approx(prices[0 if option_type == "call" else 1]) == result["price"]
+
+    # Per 1% volatility move and per calendar day, like vega and theta
+    assert pytest.approx(
+        (kernel(sigma + h)["delta"] - kernel(sigma - h)["delta"]) / (2 * h) / 100, rel=1e-5
+    ) == result["vanna"]
+    assert pytest.approx(
+        (kernel(sigma + h)["vega"] - kernel(sigma - h)["vega"]) / (2 * h) / 100, rel=1e-5
+    ) == result["volga"]
+    assert pytest.approx(
+        -(kernel(T=0.75 + h)["delta"] - kernel(T=0.75 - h)["delta"]) / (2 * h) / 365, rel=1e-5
+    ) == result["charm"]
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from lib import black_scholes_calculator, implied_volatility
+from lib.optiontype import OptionType
+
+
+def test_implied_volatility_round_trip():
+    rng = np.random.default_rng(7)
+    size = 5000
+
+    S_0 = 148.19
+    K = rng.uniform(60, 300, size)
+    T = rng.uniform(0.05, 3, size)
+    sigma = rng.uniform(0.05, 1.5, size)
+    r = 0.05
+    q = 0.0056
+    option_type = np.where(rng.random(size) < 0.5, OptionType.CALL, OptionType.PUT)
+
+    calls, puts = black_scholes_calculator.black_scholes_call_put(sigma, S_0, K, r, T, q)
+    prices = np.where(option_type == OptionType.CALL, calls, puts)
+
+    solved, iterations = implied_volatility.implied_volatility(
+        option_type, prices, S_0, K, r, T, q
+    )
+
+    # Options with almost no time value cannot pin down the volatility, but
+    # everything that solves must reprice
+    ok = ~np.isnan(solved)
+    identifiable = black_scholes_calculator.greeks_call_put(sigma, S_0, K, r, T, q)[0][3] > 1e-4
+
+    assert np.all(ok[identifiable])
+    assert pytest.approx(sigma[identifiable], abs=1e-8) == solved[identifiable]
+
+    calls, puts = black_scholes_calculator.black_scholes_call_put(solved[ok], S_0, K[ok], r, T[ok], q)
+
+    assert pytest.approx(prices[ok], abs=1e-7) == np.where(option_type[ok] == OptionType.CALL, calls, puts)
+    assert iterations < 50
+
+
+def test_implied_volatility_scalar():
+    price = black_scholes_calculator.black_scholes(OptionType.PUT, 0.3, 100, 110, 0.02, 0.5, 0.01)
+
+    solved, _ = implied_volatility.implied_volatility(OptionType.PUT, price, 100, 110, 0.02, 0.5, 0.01)
+
+    assert pytest.approx(0.3, abs=1e-8) == solved
+
+
+def test_implied_volatility_violating_arbitrage_bounds():
+    solved, _ = implied_volatility.implied_volatility(
+        [OptionType.CALL, OptionType.CALL], [0.5, 120], 100, 90, 0.02, 1, 0
+    )
+
+    # Below intrinsic value and above the underlying price
+    assert np.all(np.isnan(solved))
@@ -0,0 +1,138 @@
+import threading
+import time
+
+import pytest
+
+from lib import jobs
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return jobs.MemoryJobStore()
+
+    return jobs.SQLiteJobStore(str(tmp_path / "jobs.db"))
+
+
+def wait(queue, job_id):
+    for job in queue.events(job_id, interval=0.01, timeout=10):
+        pass
+
+    return job
+
+
+def test_job_succeeds(store):
+    queue = jobs.JobQueue(store)
+
+    def work(progress):
+        progress(0.5)
+        return {"price": 1.5}
+
+    job = wait(queue, queue.submit("test", work))
+
+    assert "succeeded" == job["status"]
+    assert 1.0 == job["progress"]
+    assert {"price": 1.5} == job["result"]
+
+
+def test_job_fails(store):
+    queue = jobs.JobQueue(store)
+
+    def work(progress):
+        raise ValueError("bad input")
+
+    job = wait(queue, queue.submit("test", work))
+
+    assert "failed" == job["status"]
+    assert "bad input" == job["error"]
+
+
+def test_job_cancel(store):
+    queue = jobs.JobQueue(store, workers=1)
+    started = threading.Event()
+
+    def work(progress):
+        started.set()
+        while True:
+            progress(0.1)
+            time.sleep(0.01)
+
+    running = queue.submit("test", work)
+    queued = queue.submit("test", work)
+    started.wait(10)
+
+    assert "cancelled" == queue.cancel(queued)["status"]
+    assert queue.cancel(running)["cancelRequested"]
+    assert "cancelled" == wait(queue, running)["status"]
+    assert queue.cancel("missing") is None
+
+
+def test_queue_full(store):
+    queue = jobs.JobQueue(store, workers=1, max_pending=1)
+    release = threading.Event()
+
+    queue.submit("test", lambda progress: release.wait(10))
+    with pytest.raises(jobs.QueueFull):
+        queue.submit("test", lambda progress: None)
+
+    release.set()
+
+
+def test_purge(store):
+    for i in range(4):
+        store.create(str(i), "test")
+    store.update("0", status="succeeded")
+    store.update("1", status="failed")
+
+    store.purge(0, 1000)
+
+    assert store.get("0") is None and store.get("1") is None
+    assert "queued" == store.get("2")["status"]
+
+    store.update("2", status="succeeded")
+    store.purge(3600, 1)
+
+    assert store.get("2") is None
+    assert store.get("3") is not None
+
+
+def test_stale_jobs_fail(store):
+    # A job left running by a process that died is no longer updated
+    store.create("orphan", "test")
+    store.update("orphan", status="running")
+    queue = jobs.JobQueue(store, max_pending=1, stale_after=0.05)
+
+    time.sleep(0.1)
+    job = queue.get("orphan")
+
+    assert "failed" == job["status"]
+    assert jobs.STALE_ERROR == job["error"]
+
+    # It no longer counts towards the pending jobs
+    wait(queue, queue.submit("test", lambda progress: None))
+
+
+def test_heartbeat_keeps_live_jobs(store):
+    queue = jobs.JobQueue(store, stale_after=0.2)
+    release = threading.Event()
+
+    job_id = queue.submit("test", lambda progress: release.wait(10))
+    time.sleep(0.5)
+
+    assert "running" == queue.get(job_id)["status"]
+
+    release.set()
+    assert "succeeded" == wait(queue, job_id)["status"]
+
+
+def test_from_environment_shares_jobs(tmp_path):
+    path = str(tmp_path / "jobs.db")
+
+    first = jobs.from_environment({"QUANTPRO_JOB_STORE": path})
+    second = jobs.from_environment({"QUANTPRO_JOB_STORE": path})
+    job_id = first.submit("test", lambda progress: 1.0)
+
+    assert 1.0 == wait(second, job_id)["result"]
+    assert isinstance(jobs.from_environment({"QUANTPRO_JOB_STORE": "memory"}).store, jobs.MemoryJobStore)
+    assert isinstance(jobs.from_environment({}).store, jobs.MemoryJobStore)
+    assert path == jobs.from_environment({}, path).store.path
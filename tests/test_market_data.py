@@ -0,0 +1,166 @@
+import threading
+import time
+
+import pytest
+
+from lib.cache import MemoryStore, SQLiteStore, SingleFlight
+from marketdata.service import MarketDataService, UpstreamTimeout
+from marketdata.sources import FakeSource, HTTPSource
+from marketdata.stub import StubServer
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryStore(max_entries=2, ttl=60)
+
+    return SQLiteStore(str(tmp_path / "cache.db"), max_entries=2, ttl=60)
+
+
+def test_store_lru_eviction(store):
+    store.set("a", {"value": 1})
+    store.set("b", {"value": 2})
+
+    # Reading "a" makes "b" the least recently used entry
+    time.sleep(0.01)
+    assert {"value": 1} == store.get("a")
+
+    time.sleep(0.01)
+    store.set("c", {"value": 3})
+
+    assert store.get("b") is None
+    assert {"value": 1} == store.get("a")
+    assert {"value": 3} == store.get("c")
+    assert 2 == len(store)
+
+
+def test_store_ttl(store):
+    store.set("a", [1, 2, 3], ttl=-1)
+
+    assert store.get("a") is None
+
+
+def test_sqlite_store_is_shared(tmp_path):
+    path = str(tmp_path / "cache.db")
+
+    SQLiteStore(path).set("history:AAPL:1d", {"Close": [1.0]})
+
+    assert {"Close": [1.0]} == SQLiteStore(path).get("history:AAPL:1d")
+
+
+def test_single_flight_coalesces_calls():
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        release.wait()
+        return 42
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(flight.do("AAPL", fetch)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert [42] * 5 == results
+    assert 1 == len(calls)
+
+
+class CountingSource(FakeSource):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def history(self, ticker, period):
+        self.calls += 1
+        return super().history(ticker, period)
+
+
+def test_service_caches_history():
+    source = CountingSource()
+    market_data = MarketDataService(source, MemoryStore())
+
+    first = market_data.history("AAPL", "60d")
+    second = market_data.history("AAPL", "60d")
+
+    assert first == second
+    assert 60 == len(first["Close"])
+    assert 1 == source.calls
+
+
+def test_fake_source_is_deterministic():
+    source = FakeSource()
+
+    assert source.history("MSFT", "60d")["Close"][-5:] == source.history("MSFT", "5d")["Close"]
+    assert source.history("MSFT", "5d") != source.history("AAPL", "5d")
+
+
+@pytest.fixture
+def stub_server():
+    server = StubServer(latency=0.1).start()
+    yield server
+    server.stop()
+
+
+def test_http_source_matches_stubbed_source(stub_server):
+    source = HTTPSource(stub_server.url)
+
+    assert FakeSource().history("AAPL", "5d") == source.history("AAPL", "5d")
+    assert FakeSource().info("BRK.B") == source.info("BRK.B")
+
+
+def test_quotes_are_fetched_concurrently(stub_server):
+    market_data = MarketDataService(HTTPSource(stub_server.url), MemoryStore(), concurrency=10)
+    tickers = ["AAPL", "MSFT", "GOOG", "AMZN", "TSLA"]
+
+    start = time.perf_counter()
+    quotes, errors = market_data.quotes(tickers, "5d")
+    elapsed = time.perf_counter() - start
+
+    # Ten sequential round trips would take at least a second
+    assert elapsed < 0.6
+    assert not errors
+    assert set(tickers) == set(quotes)
+    assert quotes["AAPL"]["close"] == quotes["AAPL"]["history"]["Close"][-1]
+    assert market_data.quote("MSFT") == {
+        key: value for key, value in quotes["MSFT"].items() if key != "history"
+    }
+
+
+def test_quotes_report_errors_per_ticker():
+    class FailingSource(FakeSource):
+        def history(self, ticker, period):
+            if ticker == "BAD":
+                raise KeyError(ticker)
+            return super().history(ticker, period)
+
+    quotes, errors = MarketDataService(FailingSource(), MemoryStore()).quotes(["AAPL", "BAD"])
+
+    assert ["AAPL"] == list(quotes)
+    assert ["BAD"] == list(errors)
+
+
+def test_blocked_upstream_times_out():
+    release = threading.Event()
+
+    class BlockedSource(FakeSource):
+        def info(self, ticker):
+            release.wait()
+            return super().info(ticker)
+
+    market_data = MarketDataService(BlockedSource(), MemoryStore(), timeout=0.1)
+
+    try:
+        with pytest.raises(UpstreamTimeout):
+            market_data.quote("AAPL")
+    finally:
+        release.set()
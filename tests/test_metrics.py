@@ -0,0 +1,71 @@
+import concurrent.futures
+import json
+import os
+
+from lib import metrics
+
+
+def test_render_histograms_and_counters():
+    registry = metrics.Registry()
+
+    registry.observe("latency_seconds", 0.003, span="paths")
+    registry.observe("latency_seconds", 20, span="paths")
+    registry.increment("requests_total", endpoint='/a"b')
+    registry.register_collector(lambda: [("cache_hits_total", "counter", {}, 7)])
+
+    lines = registry.render().splitlines()
+
+    assert "# TYPE latency_seconds histogram" in lines
+    assert 'latency_seconds_bucket{span="paths",le="0.0025"} 0' in lines
+    assert 'latency_seconds_bucket{span="paths",le="0.005"} 1' in lines
+    assert 'latency_seconds_bucket{span="paths",le="+Inf"} 2' in lines
+    assert 'latency_seconds_count{span="paths"} 2' in lines
+    assert 'requests_total{endpoint="/a\\"b"} 1' in lines
+    assert "cache_hits_total 7" in lines
+
+
+def test_spans_report_to_the_active_profile():
+    def work(*args):
+        with metrics.span("work"):
+            pass
+
+    work()
+
+    with metrics.profile() as profile:
+        work()
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            list(executor.map(metrics.propagate(work), range(3)))
+
+    work()
+
+    assert {"work"} == set(profile.breakdown())
+    assert 4 == profile.breakdown()["work"]["calls"]
+
+
+def test_render_adds_up_processes(tmp_path):
+    registry = metrics.Registry(str(tmp_path))
+    registry.observe("latency_seconds", 0.003, span="paths")
+    registry.increment("requests_total", endpoint="/a")
+    registry.register_collector(lambda: [("peak_rss_bytes", "gauge", {}, 10)])
+
+    # A worker that exited, with an unused pid, and one that is alive
+    other = metrics.Registry(str(tmp_path))
+    other.observe("latency_seconds", 20, span="paths")
+    other.increment("requests_total", 2, endpoint="/a")
+    other.register_collector(lambda: [("peak_rss_bytes", "gauge", {}, 20)])
+    for pid in (2 ** 22 + 1, os.getppid()):
+        with open(os.path.join(str(tmp_path), "{}.json".format(pid)), "w") as f:
+            json.dump(other.snapshot(), f)
+
+    lines = registry.render().splitlines()
+
+    assert 'latency_seconds_count{span="paths"} 3' in lines
+    assert 'latency_seconds_bucket{span="paths",le="0.005"} 1' in lines
+    assert 'requests_total{endpoint="/a"} 5' in lines
+    assert 'peak_rss_bytes{pid="%d"} 10' % os.getpid() in lines
+    assert 'peak_rss_bytes{pid="%d"} 20' % os.getppid() in lines
+    assert 1 == sum(line.startswith("# TYPE peak_rss_bytes") for line in lines)
+    assert 2 == sum(line.startswith("peak_rss_bytes") for line in lines)
+
+    registry.flush()
+    assert os.path.exists(os.path.join(str(tmp_path), "{}.json".format(os.getpid())))
@@ -1,4 +1,8 @@
-from lib import monte_carlo_calculator
+import numpy as np
+import pytest
+
+from lib import black_scholes_calculator, monte_carlo_calculator
+from lib.optiontype import OptionType
 
 def monte_carlo_paths(S_0, T, r, q, sigma, steps, N):
     dt = T / steps
@@ -20,5 +24,174 @@ def test_monte_carlo_paths():
     steps = 100
     N = 10000
 
-    #assert [[0]] == monte_carlo_calculator.monte_carlo_paths(S_0, T, r, q, sigma, steps, N)
+    np.random.seed(42)
+
+    full_paths = monte_carlo_calculator.monte_carlo_paths(S_0, T, r, q, sigma, steps, N)
+
+    assert (steps, N) == full_paths.shape
+
+    for mode in ("terminal", "accumulate"):
+        paths = monte_carlo_calculator.monte_carlo_paths(S_0, T, r, q, sigma, steps, N, mode)
+
+        assert (1, N) == paths.shape
+
+        # E[S_T] = S_0 * exp((r - q) * T) in every mode
+        assert pytest.approx(S_0 * np.exp((r - q) * T), rel=0.02) == np.mean(paths[-1])
+        assert pytest.approx(np.mean(full_paths[-1]), rel=0.03) == np.mean(paths[-1])
+
+
+@pytest.mark.parametrize("mode", monte_carlo_calculator.PATH_MODES)
+def test_monte_carlo_paths_single_precision(mode):
+    steps = 50
+    N = 10000
+    normals = np.random.default_rng(42).standard_normal((1 if mode == "terminal" else steps, N))
+    original = normals.copy()
+
+    reference = monte_carlo_calculator.monte_carlo_paths(148.19, 1, 0.05, 0.0056, 0.4676, steps, N, mode, normals=normals)
+    out = np.empty(reference.shape, np.float32)
+    reduced = monte_carlo_calculator.monte_carlo_paths(148.19, 1, 0.05, 0.0056, 0.4676, steps, N, mode, normals=normals, out=out)
+
+    # The kernel runs in the buffer and leaves the caller's normals alone
+    assert reduced is out
+    assert np.array_equal(original, normals)
+    assert np.allclose(reduced, reference, rtol=1e-5)
+
+    paths = monte_carlo_calculator.monte_carlo_paths(
+        148.19, 1, 0.05, 0.0056, 0.4676, steps, N, mode, rng=np.random.default_rng(42), dtype=np.float32
+    )
+
+    assert np.float32 == paths.dtype
+    assert pytest.approx(148.19 * np.exp((0.05 - 0.0056) * 1), rel=0.02) == np.mean(paths[-1])
+
+
+@pytest.mark.parametrize("method", monte_carlo_calculator.GREEKS_METHODS)
+def test_greeks_crn(method):
+    S_0 = 148.19
+    K = 160.2
+    T = 1
+    r = 0.05
+    q = 0.0056
+    sigma = 0.4676
+
+    np.random.seed(42)
+
+    greeks = monte_carlo_calculator.greeks_crn(
+        S_0, K, T, r, q, sigma, 100, 400000, 0.5, 0.001, 0.001, method
+    )
+
+    for option_type in (OptionType.CALL, OptionType.PUT):
+        price, delta, gamma, theta, vega, rho = greeks[option_type]
+        bs_delta, bs_gamma, bs_theta, bs_vega, bs_rho = black_scholes_calculator.greeks(
+            option_type, sigma, S_0, K, r, T, q
+        )
+
+        assert pytest.approx(
+            black_scholes_calculator.black_scholes(option_type, sigma, S_0, K, r, T, q),
+            rel=0.02,
+        ) == price
+        assert pytest.approx(bs_delta, abs=0.01) == delta
+        assert pytest.approx(bs_gamma, rel=0.1) == gamma
+        assert pytest.approx(-bs_theta * 365, rel=0.1) == theta
+        assert pytest.approx(bs_vega * 100, rel=0.05) == vega
+        assert pytest.approx(bs_rho * 100, rel=0.05) == rho
+
+
+def test_price_chain():
+    S_0 = 148.19
+    K = np.array([120.0, 148.19, 160.2, 200.0])
+    T = np.array([0.25, 0.5, 1.0, 2.0])
+    r = 0.05
+    q = 0.0056
+    sigma = 0.4676
+
+    np.random.seed(42)
+
+    call_greeks, put_greeks = monte_carlo_calculator.price_chain(
+        S_0, K, T, r, q, sigma, 200000, max_chunk_elements=400000
+    )
+
+    assert (6, 4) == call_greeks.shape == put_greeks.shape
+
+    calls, puts = black_scholes_calculator.black_scholes_call_put(sigma, S_0, K, r, T, q)
+
+    assert pytest.approx(calls, rel=0.03) == call_greeks[0]
+    assert pytest.approx(puts, rel=0.03) == put_greeks[0]
+
+
+@pytest.mark.parametrize("variance_reduction_method", ["none", "control_variate", "sobol"])
+def test_adaptive_greeks_stops_at_target_error(variance_reduction_method):
+    S_0 = 148.19
+    K = 160.2
+    T = 1
+    r = 0.05
+    q = 0.0056
+    sigma = 0.4676
+
+    np.random.seed(42)
+
+    estimates, simulations = monte_carlo_calculator.adaptive_greeks(
+        S_0, K, T, r, q, sigma, 100, 0.5, 0.001, 0.001,
+        variance_reduction_method=variance_reduction_method,
+        target_error=0.1,
+        batch_size=4096,
+    )
+
+    assert simulations < 10 ** 7
+    assert 0 == simulations % 4096
+
+    for option_type in (OptionType.CALL, OptionType.PUT):
+        values, standard_errors = estimates[option_type]
+
+        assert 1.96 * standard_errors[0] <= 0.1
+        assert pytest.approx(
+            black_scholes_calculator.black_scholes(option_type, sigma, S_0, K, r, T, q), abs=0.25
+        ) == values[0]
+
+
+def test_adaptive_greeks_respects_simulation_cap():
+    np.random.seed(42)
+
+    _, simulations = monte_carlo_calculator.adaptive_greeks(
+        148.19, 160.2, 1, 0.05, 0.0056, 0.4676, 100, 0.5, 0.001, 0.001,
+        target_error=1e-9,
+        max_simulations=10000,
+        batch_size=4096,
+    )
+
+    assert 10000 == simulations
+
+
+def test_adaptive_greeks_with_a_partial_qmc_batch():
+    S_0 = 148.19
+    K = 160.2
+    T = 1
+    r = 0.05
+    q = 0.0056
+    sigma = 0.4676
+
+    estimates, simulations = monte_carlo_calculator.adaptive_greeks(
+        S_0, K, T, r, q, sigma, 100, 0.5, 0.001, 0.001,
+        variance_reduction_method="sobol",
+        max_simulations=4 * 4096 + 50,
+        batch_size=4096,
+        rng=np.random.default_rng(1),
+    )
+
+    values, standard_errors = estimates[OptionType.CALL]
+    expected = black_scholes_calculator.black_scholes(OptionType.CALL, sigma, S_0, K, r, T, q)
+
+    assert 4 * 4096 + 50 == simulations
+    assert standard_errors[0] < 0.05
+    assert abs(values[0] - expected) < 4 * standard_errors[0]
+
+
+def test_plot_data_size_does_not_depend_on_simulations():
+    np.random.seed(42)
+
+    small = monte_carlo_calculator.plot_data(148.19, 160.2, 1, 0.05, 0.0056, 0.4676, 10, 1000)
+    large = monte_carlo_calculator.plot_data(148.19, 160.2, 1, 0.05, 0.0056, 0.4676, 10, 200000)
 
+    assert len(small["price"]) == len(large["price"]) == 101
+    assert sum(large["histogram"]["counts"]) == 200000
+    assert sorted(large["price"]) == large["price"]
+    assert pytest.approx(np.maximum(np.array(large["price"]) - 160.2, 0)) == large["call_price"]
@@ -0,0 +1,95 @@
+import pytest
+
+from lib import black_scholes_calculator, parallel
+from lib.optiontype import OptionType
+
+S_0 = 148.19
+K = 160.2
+T = 1
+r = 0.05
+q = 0.0056
+sigma = 0.4676
+
+
+@pytest.fixture(autouse=True)
+def reset_pool():
+    yield
+    parallel.configure(1, "thread")
+
+
+def _greeks(method="pathwise", variance_reduction_method="none", N=200000):
+    return parallel.parallel_greeks(
+        S_0, K, T, r, q, sigma, 100, N, 0.5, 0.001, 0.001,
+        method, variance_reduction_method, seed=1234, chunk_size=2 ** 14,
+    )
+
+
+@pytest.mark.parametrize("workers,backend", [(2, "thread"), (4, "thread"), (3, "process")])
+def test_results_do_not_depend_on_pool_size(workers, backend):
+    parallel.configure(1, "thread")
+    expected = _greeks(variance_reduction_method="antithetic")
+
+    parallel.configure(workers, backend)
+
+    assert expected == _greeks(variance_reduction_method="antithetic")
+
+
+def test_control_variate_coefficients_come_from_a_pilot_chunk():
+    parallel.configure(1, "thread")
+    expected = _greeks(variance_reduction_method="control_variate")
+
+    parallel.configure(3, "process")
+    estimates = _greeks(variance_reduction_method="control_variate")
+
+    assert expected == estimates
+
+    for option_type in (OptionType.CALL, OptionType.PUT):
+        values, standard_errors = estimates[option_type]
+        price = black_scholes_calculator.black_scholes(option_type, sigma, S_0, K, r, T, q)
+
+        assert abs(values[0] - price) < 4 * standard_errors[0]
+
+
+def test_seed_changes_results():
+    first = _greeks()
+    second = parallel.parallel_greeks(
+        S_0, K, T, r, q, sigma, 100, 200000, 0.5, 0.001, 0.001, "pathwise", seed=4321
+    )
+
+    assert first != second
+
+
+def test_merged_estimate_matches_black_scholes():
+    parallel.configure(2, "thread")
+
+    estimates = _greeks(N=400000)
+
+    for option_type in (OptionType.CALL, OptionType.PUT):
+        values, standard_errors = estimates[option_type]
+        expected = black_scholes_calculator.black_scholes(option_type, sigma, S_0, K, r, T, q)
+
+        assert abs(values[0] - expected) < 4 * standard_errors[0]
+        assert pytest.approx(
+            black_scholes_calculator.greeks(option_type, sigma, S_0, K, r, T, q)[0], abs=0.01
+        ) == values[1]
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        parallel.configure(2, "gpu")
+
+
+@pytest.mark.parametrize("seed", [1, 2])
+def test_qmc_with_a_partial_chunk(seed):
+    # A short last chunk is folded into the one before it, so its QMC
+    # replicates hold as many points as the others
+    estimates = parallel.parallel_greeks(
+        S_0, K, T, r, q, sigma, 100, 3 * 2 ** 14 + 100, 0.5, 0.001, 0.001,
+        "pathwise", "sobol", seed=seed, chunk_size=2 ** 14,
+    )
+
+    values, standard_errors = estimates[OptionType.CALL]
+    expected = black_scholes_calculator.black_scholes(OptionType.CALL, sigma, S_0, K, r, T, q)
+
+    assert standard_errors[0] < 0.05
+    assert abs(values[0] - expected) < 4 * standard_errors[0]
@@ -0,0 +1,123 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+import scipy.special
+
+from lib import black_scholes_calculator, path_dependent
+from lib.optiontype import OptionType
+
+S_0 = 100
+K = 100
+T = 1
+r = 0.05
+q = 0.01
+sigma = 0.3
+
+
+def geometric_asian_call(steps):
+    # Closed form for the discretely monitored geometric average
+    dt = T / steps
+    mean = np.log(S_0) + (r - q - sigma ** 2 / 2) * dt * (steps + 1) / 2
+    variance = sigma ** 2 * dt * (steps + 1) * (2 * steps + 1) / (6 * steps)
+
+    d1 = (mean - np.log(K) + variance) / np.sqrt(variance)
+    d2 = d1 - np.sqrt(variance)
+
+    return np.exp(-r * T) * (
+        np.exp(mean + variance / 2) * scipy.special.ndtr(d1) - K * scipy.special.ndtr(d2)
+    )
+
+
+@pytest.mark.parametrize("control_variate", [True, False])
+def test_geometric_asian(control_variate):
+    steps = 50
+
+    [(price, standard_error)] = path_dependent.price(
+        [path_dependent.AsianPayoff(OptionType.CALL, K, "geometric")],
+        S_0, T, r, q, sigma, steps, 50000,
+        rng=np.random.default_rng(42),
+        control_variate=control_variate,
+    )
+
+    assert abs(price - geometric_asian_call(steps)) < 4 * standard_error
+
+
+def test_single_precision():
+    payoff = path_dependent.AsianPayoff(OptionType.CALL, K, "geometric")
+
+    [(price, standard_error)] = path_dependent.price(
+        [payoff], S_0, T, r, q, sigma, 50, 50000, rng=np.random.default_rng(42), dtype=np.float32
+    )
+
+    assert abs(price - geometric_asian_call(50)) < 4 * standard_error
+
+
+def down_and_out_call(H):
+    # Continuously monitored closed form for a barrier below the strike
+    lam = (r - q + sigma ** 2 / 2) / sigma ** 2
+    y = np.log(H ** 2 / (S_0 * K)) / (sigma * np.sqrt(T)) + lam * sigma * np.sqrt(T)
+
+    knocked_in = S_0 * np.exp(-q * T) * (H / S_0) ** (2 * lam) * scipy.special.ndtr(y) - K * np.exp(
+        -r * T
+    ) * (H / S_0) ** (2 * lam - 2) * scipy.special.ndtr(y - sigma * np.sqrt(T))
+
+    return black_scholes_calculator.black_scholes(OptionType.CALL, sigma, S_0, K, r, T, q) - knocked_in
+
+
+def test_barrier_continuity_correction():
+    expected = down_and_out_call(80)
+
+    [(corrected, corrected_error), (discrete, _)] = [
+        path_dependent.price(
+            [path_dependent.BarrierPayoff(OptionType.CALL, K, 80, "down-and-out", continuity_correction)],
+            S_0, T, r, q, sigma, 12, 100000,
+            rng=np.random.default_rng(1),
+        )[0]
+        for continuity_correction in (True, False)
+    ]
+
+    # Monitoring only 12 dates misses crossings, which the shifted barrier
+    # makes up for
+    assert abs(corrected - expected) < 4 * corrected_error
+    assert discrete - expected > 10 * corrected_error
+
+
+def test_barrier_parity_and_bounds():
+    european = black_scholes_calculator.black_scholes(OptionType.PUT, sigma, S_0, K, r, T, q)
+    payoffs = [
+        path_dependent.BarrierPayoff(OptionType.PUT, K, 80, "down-and-out"),
+        path_dependent.BarrierPayoff(OptionType.PUT, K, 80, "down-and-in"),
+        path_dependent.LookbackPayoff(OptionType.PUT, K),
+        path_dependent.LookbackPayoff(OptionType.CALL),
+    ]
+
+    (out, _), (knocked_in, _), (lookback, _), (floating, floating_error) = path_dependent.price(
+        payoffs, S_0, T, r, q, sigma, 100, 20000, rng=np.random.default_rng(7), block_steps=16
+    )
+
+    # In and out options add up to the European option on the same paths,
+    # whose control variate adjusted mean is exact
+    assert pytest.approx(european) == out + knocked_in
+    assert 0 < out < european
+    assert lookback > european
+    assert floating > 0
+
+
+def test_memory_does_not_grow_with_steps():
+    tracemalloc.start()
+    try:
+        path_dependent.price(
+            [
+                path_dependent.BarrierPayoff(OptionType.CALL, K, 130, "up-and-out"),
+                path_dependent.AsianPayoff(OptionType.CALL, K),
+            ],
+            S_0, T, r, q, sigma, 1000, 4096,
+            rng=np.random.default_rng(0),
+        )
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # A (steps, N) matrix of paths would take 32 MB
+    assert peak < 1000 * 4096 * 8 / 8
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from lib import black_scholes_calculator, portfolio
+from lib.optiontype import OptionType
+
+
+def book():
+    return (
+        np.array([OptionType.CALL, OptionType.PUT, OptionType.CALL]),
+        np.array(["AAPL", "AAPL", "MSFT"]),
+        np.array([148.19, 148.19, 300.0]),
+        np.array([160.2, 140.0, 310.0]),
+        np.array([1.0, 0.5, 0.25]),
+        np.array([0.45, 0.4, 0.3]),
+        np.array([0.05, 0.05, 0.05]),
+        np.array([0.0056, 0.0056, 0.0]),
+        np.array([10.0, -5.0, 3.0]),
+    )
+
+
+def test_scenarios_reprice_every_position():
+    option_type, underlying, S_0, K, T, sigma, r, q, quantity = book()
+    spot_shocks = [-0.1, 0, 0.1]
+    volatility_shocks = [-0.05, 0, 0.05]
+    rate_shocks = [0, 0.01]
+
+    values = portfolio.scenarios(
+        option_type, S_0, K, T, sigma, r, q, quantity, spot_shocks, volatility_shocks, rate_shocks
+    )
+
+    assert (3, 3, 3, 2) == values["price"].shape
+
+    for i in range(3):
+        expected = quantity[i] * black_scholes_calculator.black_scholes(
+            option_type[i], sigma[i] + 0.05, S_0[i] * 0.9, K[i], r[i] + 0.01, T[i], q[i]
+        )
+        assert pytest.approx(expected) == values["price"][i, 0, 2, 1]
+
+
+def test_risk_aggregates_by_underlying():
+    option_type, underlying, S_0, K, T, sigma, r, q, quantity = book()
+
+    values = portfolio.scenarios(option_type, S_0, K, T, sigma, r, q, quantity, [-0.1, 0, 0.1], [0, 0.05], [0])
+    underlyings, ladders = portfolio.risk(
+        option_type, underlying, S_0, K, T, sigma, r, q, quantity, [-0.1, 0, 0.1], [0, 0.05], [0]
+    )
+
+    assert ["AAPL", "MSFT"] == underlyings.tolist()
+    assert set(portfolio.LADDERS) == set(ladders)
+    assert pytest.approx(values["price"][:2].sum(axis=0)) == ladders["value"][0]
+    assert pytest.approx(values["delta"][2]) == ladders["delta"][1]
+
+    # The unshocked scenario has no P&L
+    assert pytest.approx(0, abs=1e-9) == ladders["pnl"][:, 1, 0, 0]
+    assert ladders["pnl"][0, 2, 0, 0] > 0
+
+
+def test_offsetting_positions_have_no_risk():
+    option_type, underlying, S_0, K, T, sigma, r, q, quantity = book()
+    both = lambda values: np.concatenate([values, values])
+
+    underlyings, ladders = portfolio.risk(
+        both(option_type), both(underlying), both(S_0), both(K), both(T), both(sigma), both(r), both(q),
+        np.concatenate([quantity, -quantity]),
+        [-0.2, 0.2], [-0.1, 0.1], [-0.01, 0.01],
+    )
+
+    for name in portfolio.LADDERS:
+        assert pytest.approx(0, abs=1e-9) == ladders[name]
@@ -0,0 +1,61 @@
+from lib.cache import MemoryStore, SQLiteStore
+from flaskr.result_cache import ResultCache
+
+
+def test_keys_are_quantized():
+    cache = ResultCache(MemoryStore())
+
+    assert cache.key("black-scholes", {"tenor": 1, "strikePrice": 160.2}) == cache.key(
+        "black-scholes", {"strikePrice": 160.2 + 1e-13, "tenor": 1.0}
+    )
+    assert cache.key("black-scholes", {"tenor": 1}) != cache.key("monte-carlo", {"tenor": 1})
+    assert cache.key("monte-carlo", {"seed": 1}) != cache.key("monte-carlo", {"seed": 2})
+
+
+def test_get_or_compute_counts_hits_and_misses():
+    cache = ResultCache(MemoryStore())
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"price": 1.5}
+
+    for _ in range(3):
+        assert {"price": 1.5} == cache.get_or_compute("black-scholes", {"tenor": 1}, compute)
+
+    assert 1 == len(calls)
+    assert (2, 1) == (cache.hits, cache.misses)
+    assert 2 / 3 == cache.hit_rate
+
+
+def test_memory_cap_evicts_least_recently_used():
+    store = MemoryStore(max_bytes=100)
+
+    store.set("a", "x" * 40)
+    store.set("b", "x" * 40)
+    store.get("a")
+    store.set("c", "x" * 40)
+
+    assert store.get("b") is None
+    assert store.get("a") is not None
+    assert store.size <= 100
+
+
+def test_sqlite_memory_cap(tmp_path):
+    store = SQLiteStore(str(tmp_path / "results.db"), max_bytes=100)
+
+    for key in "abcd":
+        store.set(key, "x" * 40)
+
+    assert 2 == len(store)
+    assert store.get("d") is not None
+
+
+def test_get_only_counts_hits():
+    cache = ResultCache(MemoryStore())
+
+    assert cache.get("black-scholes", {"tenor": 1}) is None
+    cache.get_or_compute("black-scholes", {"tenor": 1}, lambda: {"price": 1.5})
+
+    assert {"price": 1.5} == cache.get("black-scholes", {"tenor": 1})
+    assert (1, 1) == (cache.hits, cache.misses)
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from lib.running_stats import RunningStats
+
+
+def test_batched_updates_match_numpy():
+    rng = np.random.default_rng(3)
+    values = rng.normal(5, 2, size=(3, 10000))
+
+    stats = RunningStats(3)
+    for batch in np.array_split(values, 7, axis=1):
+        stats.update(batch)
+
+    assert 10000 == stats.count
+    assert pytest.approx(values.mean(axis=1)) == stats.mean
+    assert pytest.approx(values.var(axis=1, ddof=1)) == stats.variance
+    assert pytest.approx(values.std(axis=1, ddof=1) / 100) == stats.standard_error
+
+
+def test_merge_is_exact():
+    rng = np.random.default_rng(3)
+    values = rng.normal(size=1001)
+
+    left, right = RunningStats(), RunningStats()
+    left.update(values[:300])
+    right.update(values[300:])
+
+    merged = RunningStats().merge(left).merge(right)
+
+    assert 1001 == merged.count
+    assert pytest.approx(values.mean()) == merged.mean
+    assert pytest.approx(values.var(ddof=1)) == merged.variance
@@ -0,0 +1,36 @@
+import gzip
+import json
+
+import numpy as np
+from werkzeug.datastructures import Accept
+
+from flaskr import serialization
+from lib import compression
+
+
+def test_dumps_numpy():
+    data = {
+        "array": np.linspace(0, 1, 5),
+        "scalar": np.float64(0.1),
+        "integer": np.int64(3),
+        "nested": [np.arange(3), {"value": np.float32(0.5)}],
+    }
+
+    assert {
+        "array": [0, 0.25, 0.5, 0.75, 1],
+        "scalar": 0.1,
+        "integer": 3,
+        "nested": [[0, 1, 2], {"value": 0.5}],
+    } == json.loads(serialization.dumps(data))
+
+
+def test_negotiate():
+    assert "gzip" == compression.negotiate(Accept([("gzip", 1), ("deflate", 1)]))
+    assert compression.negotiate(Accept([("deflate", 1)])) is None
+    assert compression.negotiate(Accept([("gzip", 0)])) is None
+
+
+def test_compress_round_trip():
+    data = b"x" * 4096
+
+    assert data == gzip.decompress(compression.compress(data, "gzip"))
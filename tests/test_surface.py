@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from lib import black_scholes_calculator, surface
+
+
+@pytest.mark.parametrize(
+    "K,points",
+    [
+        (100, (41, 25, 17)),
+        (148.19, (41, 25, 17)),
+        (160.2, (41, 25, 17)),
+        (250, (41, 25, 17)),
+        (90, (9, 7, 5)),
+        (90, (3, 3, 3)),
+    ],
+)
+def test_interpolation_is_within_the_estimated_error(K, points):
+    spots, volatilities, tenors = surface.grid(148.19, points)
+    grid = surface.build(K, 0.05, 0.0056, spots, volatilities, tenors)
+
+    # Grid nodes are exact
+    call, put = black_scholes_calculator.kernel(volatilities[1], spots[2], K, 0.05, tenors[1], 0.0056)
+    nodes = grid.interpolate(spots[2], volatilities[1], tenors[1])
+
+    assert pytest.approx(call["price"]) == nodes["call_price"][0]
+    assert pytest.approx(put["delta"]) == nodes["put_delta"][0]
+
+    rng = np.random.default_rng(42)
+    S = rng.uniform(spots[0], spots[-1], 200000)
+    sigma = rng.uniform(volatilities[0], volatilities[-1], 200000)
+    T = rng.uniform(tenors[0], tenors[-1], 200000)
+
+    call, put = black_scholes_calculator.kernel(sigma, S, K, 0.05, T, 0.0056)
+    values = grid.interpolate(S, sigma, T)
+
+    for side, exact in (("call", call), ("put", put)):
+        for quantity in surface.QUANTITIES:
+            field = "{}_{}".format(side, quantity)
+            assert np.max(np.abs(values[field] - exact[quantity])) <= grid.error_estimate[field]
+
+    assert np.isnan(grid.interpolate(spots[-1] + 1, 0.3, 1)["call_price"][0])
+
+
+def test_binary_round_trip():
+    grid = surface.build(100, 0.01, 0.02, *surface.grid(100, (5, 4, 3)))
+    data = grid.to_bytes()
+
+    restored = surface.Surface.from_bytes(data)
+
+    assert data.startswith(surface.MAGIC)
+    assert (5, 4, 3, len(surface.FIELDS)) == restored.values.shape
+    assert np.allclose(grid.values, restored.values, rtol=1e-6, atol=1e-6)
+    assert grid.error_estimate == restored.error_estimate
@@ -0,0 +1,48 @@
+import gzip
+import json
+
+from tickers import tickersdb
+
+
+def test_get_ticker():
+    assert "Apple Inc." == tickersdb.get_ticker("aapl")["name"]
+    assert tickersdb.get_ticker("NOT-A-TICKER") is None
+
+
+def test_get_tickers_by_currency():
+    tickers = tickersdb.get_tickers_by_currency("gbp")
+
+    assert tickers
+    assert all("GBP" == ticker["currency"] for ticker in tickers)
+
+
+def test_search_ranks_exact_symbol_first():
+    total, results = tickersdb.search_tickers("AAPL")
+
+    assert total >= 1
+    assert "AAPL" == results[0]["symbol"]
+
+
+def test_search_name_prefix_and_substring():
+    _, prefix_results = tickersdb.search_tickers("appl")
+    _, substring_results = tickersdb.search_tickers("pple")
+
+    assert "AAPL" in [ticker["symbol"] for ticker in prefix_results]
+    assert "AAPL" in [ticker["symbol"] for ticker in substring_results]
+
+
+def test_search_pagination_and_currency():
+    total, first_page = tickersdb.search_tickers("", currency="USD", offset=0, limit=10)
+    _, second_page = tickersdb.search_tickers("", currency="USD", offset=10, limit=10)
+
+    assert total == len(tickersdb.get_tickers_by_currency("USD"))
+    assert 10 == len(first_page) == len(second_page)
+    assert not set(t["symbol"] for t in first_page) & set(t["symbol"] for t in second_page)
+
+
+def test_serialized_dump():
+    serialized, compressed, etag = tickersdb.get_all_tickers_serialized()
+
+    assert tickersdb.get_all_tickers() == json.loads(serialized)
+    assert serialized == gzip.decompress(compressed["gzip"])
+    assert etag
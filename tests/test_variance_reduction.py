@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from lib import black_scholes_calculator, monte_carlo_calculator, variance_reduction
+from lib.optiontype import OptionType
+
+S_0 = 148.19
+K = 160.2
+T = 1
+r = 0.05
+q = 0.0056
+sigma = 0.4676
+
+
+@pytest.mark.parametrize("method", variance_reduction.VARIANCE_REDUCTION)
+def test_price_estimates_match_black_scholes(method):
+    np.random.seed(42)
+
+    Z = variance_reduction.standard_normals(65536, method=method)[0]
+    estimates = monte_carlo_calculator.price_estimates(S_0, K, T, r, q, sigma, Z, method)
+
+    for option_type in (OptionType.CALL, OptionType.PUT):
+        price, standard_error = estimates[option_type]
+        expected = black_scholes_calculator.black_scholes(option_type, sigma, S_0, K, r, T, q)
+
+        assert standard_error > 0
+        assert abs(price - expected) < 4 * standard_error
+
+
+@pytest.mark.parametrize("method", ["antithetic", "control_variate", "sobol", "halton"])
+def test_variance_reduction_lowers_standard_error(method):
+    np.random.seed(42)
+
+    plain = monte_carlo_calculator.price_estimates(
+        S_0, K, T, r, q, sigma, variance_reduction.standard_normals(65536)[0]
+    )
+    reduced = monte_carlo_calculator.price_estimates(
+        S_0, K, T, r, q, sigma, variance_reduction.standard_normals(65536, method=method)[0], method
+    )
+
+    assert reduced[OptionType.CALL][1] < plain[OptionType.CALL][1]
+
+
+def test_moment_matching():
+    np.random.seed(42)
+
+    Z = variance_reduction.standard_normals(1000, dimensions=3, method="moment_matching")
+
+    assert pytest.approx(np.zeros(3), abs=1e-12) == Z.mean(axis=1)
+    assert pytest.approx(np.ones(3)) == Z.std(axis=1)
+
+
+def test_qmc_paths():
+    np.random.seed(42)
+
+    steps = 16
+    Z = variance_reduction.standard_normals(32768, dimensions=steps, method="sobol")
+    paths = monte_carlo_calculator.monte_carlo_paths(S_0, T, r, q, sigma, steps, Z.shape[1], normals=Z)
+
+    assert pytest.approx(S_0 * np.exp((r - q) * T), rel=0.005) == np.mean(paths[-1])
+
+
+def test_batches():
+    assert [4, 4, 2] == variance_reduction.batches(10, 4)
+    assert [4, 6] == variance_reduction.batches(10, 4, "sobol")
+    assert [3] == variance_reduction.batches(3, 4, "halton")
+    assert [4, 4] == variance_reduction.batches(8, 4, "sobol")
+    assert 6 == variance_reduction.largest_batch(10, 4, "sobol")
+    assert 4 == variance_reduction.largest_batch(10, 4)
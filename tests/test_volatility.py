@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from lib import volatility
+from marketdata.sources import FakeSource
+
+
+@pytest.fixture
+def history():
+    return FakeSource(volatility=0.3).history("AAPL", "2y")
+
+
+def test_close_to_close_matches_sample_std(history):
+    close = np.array(history["Close"])
+    returns = np.diff(np.log(close))
+    window = 20
+
+    rolling = volatility.rolling_volatility(history, window)
+
+    assert len(returns) - window + 1 == len(rolling)
+
+    expected = [np.std(returns[i:i + window], ddof=1) for i in range(len(returns) - window + 1)]
+
+    assert pytest.approx(expected, rel=1e-6) == rolling
+
+
+@pytest.mark.parametrize("estimator", volatility.ESTIMATORS)
+def test_estimators_recover_volatility(history, estimator):
+    rolling = volatility.rolling_volatility(history, 60, estimator, annualize=True)
+
+    assert len(history["Close"]) - 60 == len(rolling)
+    assert pytest.approx(0.3, rel=0.35) == np.mean(rolling)
+
+
+def test_many_tickers_term_structure():
+    source = FakeSource()
+    tickers = ["AAPL", "MSFT", "GOOG"]
+    histories = [source.history(ticker, "1y") for ticker in tickers]
+    prices = {
+        column: np.stack([history[column] for history in histories])
+        for column in ("Open", "High", "Low", "Close")
+    }
+    windows = [5, 10, 20, 60]
+
+    structure = volatility.term_structure(prices, windows, "yang_zhang")
+
+    assert (3, 4) == structure.shape
+
+    for i, history in enumerate(histories):
+        for j, window in enumerate(windows):
+            assert pytest.approx(
+                volatility.rolling_volatility(history, window, "yang_zhang")[-1]
+            ) == structure[i, j]
+
+
+def test_window_longer_than_history(history):
+    with pytest.raises(ValueError):
+        volatility.rolling_volatility(history, len(history["Close"]))
@@ -1,16 +1,134 @@
+import bisect
+import hashlib
 import json
+import re
+from collections import defaultdict
+
+from lib import compression
 
 class TickersDatabase:
     all_tickers = None
 
+    by_symbol = None
+    by_currency = None
+
+    prefix_keys = None
+    prefix_indices = None
+    trigrams = None
+
+    serialized = None
+    compressed = None
+    etag = None
+
+def _words(text):
+    return [word for word in re.split(r"[^0-9a-z]+", text.lower()) if word]
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def _build_indexes(tickers):
+    TickersDatabase.by_symbol = {ticker["symbol"].upper(): ticker for ticker in tickers}
+
+    TickersDatabase.by_currency = defaultdict(list)
+    for ticker in tickers:
+        TickersDatabase.by_currency[ticker["currency"].upper()].append(ticker)
+
+    # Sorted (key, index) pairs support prefix lookups on the symbol and on
+    # every word of the name with a binary search
+    prefix_entries = sorted(
+        (key, i)
+        for i, ticker in enumerate(tickers)
+        for key in {ticker["symbol"].lower()} | set(_words(ticker["name"]))
+    )
+    TickersDatabase.prefix_keys = [key for key, _ in prefix_entries]
+    TickersDatabase.prefix_indices = [i for _, i in prefix_entries]
+
+    TickersDatabase.trigrams = defaultdict(set)
+    for i, ticker in enumerate(tickers):
+        for trigram in _trigrams(ticker["symbol"].lower()) | _trigrams(ticker["name"].lower()):
+            TickersDatabase.trigrams[trigram].add(i)
+
+    TickersDatabase.serialized = json.dumps(tickers).encode("utf-8")
+    # The dump never changes, so it is compressed once at the highest levels
+    TickersDatabase.compressed = {
+        encoding: compression.compress(
+            TickersDatabase.serialized, encoding, 11 if encoding == "br" else 9
+        )
+        for encoding in compression.ENCODINGS
+    }
+    TickersDatabase.etag = hashlib.sha1(TickersDatabase.serialized).hexdigest()
+
 def load_tickers_data():
     if TickersDatabase.all_tickers is not None:
         return
 
     with open("data/tickers.json") as f:
-        TickersDatabase.all_tickers = json.load(f)
+        tickers = json.load(f)
+
+    _build_indexes(tickers)
+
+    TickersDatabase.all_tickers = tickers
 
 def get_all_tickers():
     load_tickers_data()
 
-    return TickersDatabase.all_tickers
\ No newline at end of file
+    return TickersDatabase.all_tickers
+
+def get_all_tickers_serialized():
+    load_tickers_data()
+
+    return TickersDatabase.serialized, TickersDatabase.compressed, TickersDatabase.etag
+
+def get_ticker(symbol):
+    load_tickers_data()
+
+    return TickersDatabase.by_symbol.get(symbol.upper())
+
+def get_tickers_by_currency(currency):
+    load_tickers_data()
+
+    return TickersDatabase.by_currency.get(currency.upper(), [])
+
+def _prefix_matches(prefix):
+    keys = TickersDatabase.prefix_keys
+    start = bisect.bisect_left(keys, prefix)
+    end = bisect.bisect_left(keys, prefix + "\uffff", start)
+
+    return set(TickersDatabase.prefix_indices[start:end])
+
+def _substring_matches(query):
+    postings = [TickersDatabase.trigrams.get(trigram, set()) for trigram in _trigrams(query)]
+    candidates = set.intersection(*postings) if postings else set()
+
+    return {
+        i
+        for i in candidates
+        if query in TickersDatabase.all_tickers[i]["symbol"].lower()
+        or query in TickersDatabase.all_tickers[i]["name"].lower()
+    }
+
+def search_tickers(query, currency=None, offset=0, limit=20):
+    load_tickers_data()
+
+    query = query.strip().lower()
+    tickers = TickersDatabase.all_tickers
+
+    symbol_match = TickersDatabase.by_symbol.get(query.upper())
+    prefix_matches = _prefix_matches(query) if query else set(range(len(tickers)))
+    substring_matches = _substring_matches(query) if len(query) >= 3 else set()
+
+    def rank(i):
+        if tickers[i] is symbol_match:
+            return 0
+        if tickers[i]["symbol"].lower().startswith(query):
+            return 1
+        if i in prefix_matches:
+            return 2
+        return 3
+
+    matches = sorted(prefix_matches | substring_matches, key=lambda i: (rank(i), i))
+
+    if currency is not None:
+        matches = [i for i in matches if tickers[i]["currency"].upper() == currency.upper()]
+
+    return len(matches), [tickers[i] for i in matches[offset:offset + limit]]